@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, Request
+from fastapi.responses import FileResponse
 from typing import Optional
 
 from app.admin import service as admin_service
+from app.profiling import service as profiling_service
 from app.user import utils as user_utils
 
 
 router = APIRouter()
 
 @router.get("/users")
-async def list_all_users(
+def list_all_users(
     request: Request,    
     current_user: dict = Depends(user_utils.require_admin)
     ) -> dict:
@@ -16,7 +18,7 @@ async def list_all_users(
 
 
 @router.get("/users/by-email/{email}")
-async def get_user_by_email(
+def get_user_by_email(
     request: Request,    
     email: str,
     current_user: dict = Depends(user_utils.require_admin),
@@ -25,9 +27,25 @@ async def get_user_by_email(
 
 
 @router.get("/users/by-username/{username}")
-async def get_user_by_username(
+def get_user_by_username(
     request: Request,
     username: str,
     current_user: dict = Depends(user_utils.require_admin),
     ) -> dict:
     return admin_service.get_user_by_username(username, request)
+
+
+@router.get("/profiles")
+async def list_profiles(
+    current_user: dict = Depends(user_utils.require_admin),
+    ) -> dict:
+    return {"profiles": profiling_service.list_captures()}
+
+
+@router.get("/profiles/{name}")
+async def download_profile(
+    name: str,
+    current_user: dict = Depends(user_utils.require_admin),
+    ):
+    path = profiling_service.get_capture_path(name)
+    return FileResponse(path, media_type="text/plain", filename=name)
@@ -43,10 +43,10 @@ def get_all_users_cognito_userpool(request: Request) -> dict:
             UserPoolId=USERPOOL_ID,
         )
 
-        logger.info(f"Retrieved {len(response['Users'])} users from Cognito User Pool.")
+        logger.info("Retrieved %s users from Cognito User Pool.", len(response['Users']))
         return response
     except ClientError as e:
-        logger.error(f"Error fetching users from Cognito User Pool: {str(e)}")
+        logger.error("Error fetching users from Cognito User Pool: %s", e)
         handle_cognito_error(e)
 
 
@@ -58,7 +58,7 @@ def get_user_by_email(
     Retrieves a user from the Cognito User Pool by their email address.
     """
     try:
-        logger.info(f"Fetching user by email: {email}")
+        logger.info("Fetching user by email: %s", email)
         cognito_client = admin_utils.get_admin_cognito_client(request)
         response = cognito_client.list_users(
             UserPoolId=USERPOOL_ID,
@@ -66,10 +66,10 @@ def get_user_by_email(
         )
 
         if not response['Users']:
-            logger.warning(f"User with email {email} not found.")
+            logger.warning("User with email %s not found.", email)
             raise HTTPException(status_code=404, detail="User not found.")
 
-        logger.info(f"User with email {email} found.")
+        logger.info("User with email %s found.", email)
         return response['Users'][0]
     except ClientError as e:
         handle_cognito_error(e)
@@ -83,7 +83,7 @@ def get_user_by_username(
     Retrieves a user from the Cognito User Pool by their username.
     """
     try:
-        logger.info(f"Fetching user by username: {username}")
+        logger.info("Fetching user by username: %s", username)
         cognito_client = admin_utils.get_admin_cognito_client(request)
         response = cognito_client.list_users(
             UserPoolId=USERPOOL_ID,
@@ -91,12 +91,12 @@ def get_user_by_username(
         )
 
         if not response['Users']:
-            logger.warning(f"User with username {username} not found.")
+            logger.warning("User with username %s not found.", username)
             raise HTTPException(status_code=404, detail="User not found.")
 
-        logger.info(f"User with username {username} found.")
+        logger.info("User with username %s found.", username)
         return response['Users'][0]
     except ClientError as e:
-        logger.error(f"Error fetching user by username {username}: {str(e)}")
+        logger.error("Error fetching user by username %s: %s", username, e)
         handle_cognito_error(e)
 
@@ -1,18 +1,23 @@
-import boto3
+import time
+import datetime
 
 from fastapi import Request, HTTPException
+from jose import jwt
 
-from app.config import ADMIN_IDENTITYPOOL_ID, USERPOOL_ID, REGION
+from app import clients
+from app.cache import TTLCache
+from app.singleflight import SingleFlight
+from app.user.utils import token_key
+from app.config import ADMIN_IDENTITYPOOL_ID, USERPOOL_ID, REGION, CREDENTIALS_REFRESH_MARGIN
 
 
-def get_admin_cognito_client(request: Request):
+# token hash -> admin identity credentials, so repeat requests reuse one session and its clients
+_admin_credentials_cache = TTLCache("admin_credentials", ttl=3600, shared=True)
+_admin_exchange_flight = SingleFlight("admin_identity_exchange")
 
-    id_token = request.cookies.get("id_token")
 
-    if not id_token:
-        raise HTTPException(status_code=401, detail="Authentication token missing.")
-
-    identity_client = boto3.client('cognito-identity', region_name=REGION)
+def _exchange_admin_credentials(id_token: str, cache_key: str) -> dict:
+    identity_client = clients.get_client("cognito-identity", REGION)
 
     USER_POOL_PROVIDER = f"cognito-idp.{REGION}.amazonaws.com/{USERPOOL_ID}"
 
@@ -35,14 +40,26 @@ def get_admin_cognito_client(request: Request):
     )
 
     creds = creds_response['Credentials']
+    cached = {name: creds[name] for name in ("AccessKeyId", "SecretKey", "SessionToken")}
+    # Refresh ahead of the credentials' expiry, and never outlive the token that was exchanged
+    now = datetime.datetime.now(datetime.timezone.utc)
+    ttl = (creds['Expiration'] - now).total_seconds() - CREDENTIALS_REFRESH_MARGIN
+    ttl = min(ttl, jwt.get_unverified_claims(id_token)["exp"] - time.time())
+    _admin_credentials_cache.set(cache_key, cached, ttl)
+    return cached
 
-    # Use temporary credentials to create Cognito client
-    cognito_client = boto3.client(
-        'cognito-idp',
-        region_name=REGION,
-        aws_access_key_id=creds['AccessKeyId'],
-        aws_secret_access_key=creds['SecretKey'],
-        aws_session_token=creds['SessionToken'],
-    )
 
-    return cognito_client
+def get_admin_cognito_client(request: Request):
+
+    id_token = request.cookies.get("id_token")
+
+    if not id_token:
+        raise HTTPException(status_code=401, detail="Authentication token missing.")
+
+    cache_key = token_key(id_token)
+    creds = _admin_credentials_cache.get(cache_key)
+    if creds is None:
+        creds = _admin_exchange_flight.do(cache_key, _exchange_admin_credentials, id_token, cache_key)
+
+    # Use temporary credentials to create Cognito client, reused while they are valid
+    return clients.get_identity_session(creds).client("cognito-idp", REGION)
@@ -4,8 +4,10 @@ from typing import Annotated
 from app.user import utils as user_utils
 from app.asset import service as asset_service
 from app.models import AssetBase, Asset
+from app.responses.encoding import FastJSONResponse, projector
 
 router = APIRouter()
+_project = projector(Asset)
 
 @router.post("/")
 def add_asset(
@@ -16,7 +18,8 @@ def add_asset(
 
 @router.get("/", response_model=list[Asset])
 def get_all_assets(user=Depends(user_utils.get_current_user_id)):
-    return asset_service.list_assets_per_user(user)
+    # Items come from our own table, so they are trimmed to the model instead of validated again
+    return FastJSONResponse(_project(asset_service.list_assets_per_user(user)))
 
 @router.get("/{asset_id}")
 def get_one_asset(
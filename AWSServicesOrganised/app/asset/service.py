@@ -1,4 +1,3 @@
-import boto3
 import uuid
 import datetime
 import logging
@@ -6,12 +5,34 @@ import logging
 from fastapi import Depends, HTTPException
 from decimal import Decimal
 
+from app import aws_policy
 from app.models import AssetBase
 from app.user import utils as user_utils
-from app.config import REGION, DynamoDB_ASSET_DETAILS_TABLE
+from app.singleflight import SingleFlight
+from app.storage import codec
+from app.storage import repository as storage
+from app.config import REGION, EXPORT_PAGE_SIZE
 
 
 logger = logging.getLogger(__name__)
+# Identical list queries in flight at the same time (e.g. /asset/ and /portfolio/) share one Query
+_list_flight = SingleFlight("asset_list")
+
+
+def new_asset_item(asset: AssetBase, current_user: dict, identity_id: str, asset_id: str = None) -> dict:
+    """
+    Builds the DynamoDB item for a new asset of the user.
+    """
+    return {
+        "asset_id": asset_id or str(uuid.uuid4()),
+        "username": current_user["username"],
+        "category": asset.category,
+        "title": asset.title,
+        "asset_value": Decimal(str(asset.asset_value)),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "sub": current_user["sub"],
+        "identity_id": identity_id
+    }
 
 
 def create_asset(
@@ -22,31 +43,42 @@ def create_asset(
     Creates a new asset in DynamoDB with the provided asset details.
     """
     try:
-        logger.info(f"Creating asset for user: {current_user.get('username')}")
+        logger.info("Creating asset for user: %s", current_user.get('username'))
         asset_id = str(uuid.uuid4()) 
-        session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
+        session, identity_id = user_utils.get_user_session(current_user, with_identity_id=True)
         dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_ASSET_DETAILS_TABLE)
-
-        item = {
-            "asset_id": asset_id,
-            "username": current_user["username"],
-            "category": asset.category,
-            "title": asset.title,
-            "asset_value": Decimal(str(asset.asset_value)),
-            "created_at": datetime.datetime.utcnow().isoformat(),
-            "sub": current_user["sub"],
-            "identity_id": identity_id
-        }
-        table.put_item(Item=item)
-        logger.info(f"Asset created successfully with ID: {asset_id}")
+
+        storage.put_item(dynamodb, "asset", new_asset_item(asset, current_user, identity_id, asset_id))
+        logger.info("Asset created successfully with ID: %s", asset_id)
     except Exception as e:
-        logger.error(f"Error creating asset: {str(e)}")
+        logger.error("Error creating asset: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))    
-    logger.info(f"Asset created successfully for user: {current_user.get('username')}")
+    logger.info("Asset created successfully for user: %s", current_user.get('username'))
     return {"Asset created successfully"}
 
 
+def _query_assets(current_user: dict) -> list:
+    session, _ = user_utils.get_user_session(current_user)
+    client = session.client('dynamodb', region_name=REGION)
+    return list(storage.query_raw(client, "asset", current_user))
+
+
+def list_raw_assets_per_user(current_user: dict) -> list:
+    """
+    Lists the user's assets as raw DynamoDB attribute values, shared with identical queries in flight.
+    """
+    return _list_flight.do(current_user['username'], _query_assets, current_user)
+
+
+def iter_assets_per_user(current_user: dict, page_size: int = EXPORT_PAGE_SIZE):
+    """
+    Yields every asset of the user, one DynamoDB page at a time, so callers never hold the whole set.
+    """
+    session, _ = user_utils.get_user_session(current_user)
+    yield from storage.query_items(session.client('dynamodb', region_name=REGION), "asset", current_user, page_size)
+
+
 def list_assets_per_user(
         current_user: dict = Depends(user_utils.get_current_user_id)
     ):
@@ -54,19 +86,13 @@ def list_assets_per_user(
     Lists all assets for a given user.
     """
     try:
-        logger.info(f"Listing assets for user: {current_user.get('username')}")
-        session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
-        dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_ASSET_DETAILS_TABLE)
-
-        response = table.query(
-            IndexName='UserSubIndex',
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('username').eq(current_user['username'])
-        )
-        logger.info(f"Assets listed successfully for user: {current_user.get('username')}")
-        return response.get('Items', [])
+        logger.info("Listing assets for user: %s", current_user.get('username'))
+        items = [codec.decode_item(item) for item in list_raw_assets_per_user(current_user)]
+        logger.info("Assets listed successfully for user: %s", current_user.get('username'))
+        return items
     except Exception as e:
-        logger.error(f"Error listing assets: {str(e)}")
+        logger.error("Error listing assets: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -78,23 +104,20 @@ def get_asset_by_id(
     Retrieves a specific asset by its ID.
     """
     try:
-        logger.info(f"Fetching asset with ID: {asset_id} for user: {current_user.get('username')}")
-        session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
-        dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_ASSET_DETAILS_TABLE)
-
-        response = table.get_item(
-            Key={
-                "asset_id": asset_id
-            }
-        )
-        
-        if 'Item' not in response:
+        logger.info("Fetching asset with ID: %s for user: %s", asset_id, current_user.get('username'))
+        session, _ = user_utils.get_user_session(current_user)
+        client = session.client('dynamodb', region_name=REGION)
+
+        item = storage.get_item(client, "asset", current_user, asset_id)
+        if item is None:
             raise HTTPException(status_code=404, detail="Asset not found")
-        logger.info(f"Asset with ID: {asset_id} fetched successfully for user: {current_user.get('username')}")
-        return response['Item']
+        logger.info("Asset with ID: %s fetched successfully for user: %s", asset_id, current_user.get('username'))
+        return item
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching asset by ID: {str(e)}")
+        logger.error("Error fetching asset by ID: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -106,19 +129,15 @@ def delete_asset(
     Deletes a specific asset by its ID.
     """
     try:
-        logger.info(f"Deleting asset with ID: {asset_id} for user: {current_user.get('username')}")
-        session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
+        logger.info("Deleting asset with ID: %s for user: %s", asset_id, current_user.get('username'))
+        session, _ = user_utils.get_user_session(current_user)
         dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_ASSET_DETAILS_TABLE)
-        response = table.delete_item(
-            Key={
-                "asset_id": asset_id
-            }
-        )
-        logger.info(f"Asset with ID: {asset_id} deleted successfully for user: {current_user.get('username')}")
+        storage.delete_item(dynamodb, "asset", current_user, asset_id)
+        logger.info("Asset with ID: %s deleted successfully for user: %s", asset_id, current_user.get('username'))
         return {"message": "Asset deleted successfully"}
     except Exception as e:
-        logger.error(f"Error deleting asset: {str(e)}")
+        logger.error("Error deleting asset: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -129,24 +148,15 @@ def delete_all_assets(
     Deletes all assets for a given user.
     """
     try:
-        logger.info(f"Deleting all assets for user: {current_user.get('username')}")
-        session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
+        logger.info("Deleting all assets for user: %s", current_user.get('username'))
+        session, _ = user_utils.get_user_session(current_user)
         dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_ASSET_DETAILS_TABLE)
-
-        response = table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr('username').eq(current_user['username'])
-        )
-        
-        for item in response.get('Items', []):
-            table.delete_item(
-                Key={
-                    "asset_id": item['asset_id'],
-                    "username": current_user["username"]
-                }
-            )
-        logger.info(f"All assets deleted successfully for user: {current_user.get('username')}")
+
+        ids = [item['asset_id']['S'] for item in storage.query_raw(session.client('dynamodb', region_name=REGION), "asset", current_user)]
+        storage.delete_items(dynamodb, "asset", current_user, ids)
+        logger.info("All assets deleted successfully for user: %s", current_user.get('username'))
         return {"message": "All assets deleted successfully"}
     except Exception as e:
-        logger.error(f"Error deleting all assets: {str(e)}")
+        logger.error("Error deleting all assets: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -7,24 +7,25 @@ from app.user import utils as user_utils
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Plain def: the boto3 calls (and their pacing, back-off and bulkhead waits) run in the threadpool, not on the event loop
 
 
 @router.post("/signup", response_model=dict)
-async def signup(user: UserSignUp) -> dict:
-    return await service.signup_user(user)
+def signup(user: UserSignUp) -> dict:
+    return service.signup_user(user)
 
 
 @router.post("/confirm", response_model=dict)
-async def confirm(user: UserConfirm) -> dict:
-    return await service.confirm_user(user)
+def confirm(user: UserConfirm) -> dict:
+    return service.confirm_user(user)
 
 
 @router.post("/signin", response_model=dict)
-async def signin(user: UserSignIn, response: Response) -> dict:
-    return await service.signin_user(user, response)
+def signin(user: UserSignIn, response: Response) -> dict:
+    return service.signin_user(user, response)
 
 
 @router.post("/logout", response_model=dict)
-async def logout(current_user: dict = Depends(user_utils.get_current_user_id),
+def logout(current_user: dict = Depends(user_utils.get_current_user_id),
 ) -> dict:
-    return await service.logout_user(current_user)
+    return service.logout_user(current_user)
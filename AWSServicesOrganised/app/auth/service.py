@@ -1,12 +1,9 @@
-import boto3
-import jwt
-import httpx
 import logging
 
 from botocore.exceptions import ClientError
 from fastapi import HTTPException, Response, Depends
-from jwt.exceptions import ExpiredSignatureError, PyJWTError
 
+from app import clients, aws_policy
 from app.models import UserSignUp, UserConfirm, UserSignIn, Token
 from app.auth import utils as auth_utils
 from app.config import CLIENT_ID, REGION, USERPOOL_ID
@@ -14,7 +11,20 @@ from app.user import utils as user_utils
 
 
 logger = logging.getLogger(__name__)
-cognito_client = boto3.client("cognito-idp", region_name=REGION)
+
+
+def get_cognito_client():
+    """
+    Returns the pooled Cognito IDP client, created on first use.
+    """
+    return clients.get_client("cognito-idp", REGION)
+
+
+def __getattr__(name: str):
+    # Keeps `auth_service.cognito_client` working without building the client at import time
+    if name == "cognito_client":
+        return get_cognito_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def handle_client_error(e: ClientError):
@@ -32,25 +42,25 @@ def handle_client_error(e: ClientError):
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred. Please try again later.")
 
 
-async def signup_user(user: UserSignUp) -> dict:
+def signup_user(user: UserSignUp) -> dict:
     """
     Signs up a new user in the Cognito User Pool.
     """
     try:
-        logger.info(f"Signing up user: {user.username}")
+        logger.info("Signing up user: %s", user.username)
 
         # Check if the user already exists
-        existing_users = cognito_client.list_users(
+        existing_users = get_cognito_client().list_users(
             UserPoolId=USERPOOL_ID,
             Filter=f'email = "{user.email}"'
         )
         if existing_users['Users']:
-            logger.warning(f"User with email {user.email} already exists!")
+            logger.warning("User with email %s already exists!", user.email)
             raise HTTPException(status_code=400, detail="User with this email already exists.")
 
-        secret_hash = await auth_utils.generate_secret_hash(user.username)
-        logger.info(f"Generated secret hash for user: {user.username}")
-        response = cognito_client.sign_up(
+        secret_hash = auth_utils.generate_secret_hash(user.username)
+        logger.info("Generated secret hash for user: %s", user.username)
+        response = get_cognito_client().sign_up(
             ClientId=CLIENT_ID,
             Username=user.username,
             Password=user.password,
@@ -62,38 +72,39 @@ async def signup_user(user: UserSignUp) -> dict:
         )
         return {"message": "User signed up successfully."}
     except ClientError as e:
-        logger.error(f"Error signing up user {user.username}: {str(e)}")
+        logger.error("Error signing up user %s: %s", user.username, e)
         handle_client_error(e)
 
 
-async def confirm_user(user: UserConfirm) -> dict:
+def confirm_user(user: UserConfirm) -> dict:
     """
     Confirms a user's sign-up in the Cognito User Pool.
     """
     try:
-        logger.info(f"Confirming user: {user.username}")
-        secret_hash = await auth_utils.generate_secret_hash(user.username)
-        return cognito_client.confirm_sign_up(
+        logger.info("Confirming user: %s", user.username)
+        secret_hash = auth_utils.generate_secret_hash(user.username)
+        return get_cognito_client().confirm_sign_up(
             ClientId=CLIENT_ID,
             Username=user.username,
             ConfirmationCode=user.confirmation_code,
             SecretHash=secret_hash,
         )
-        logger.info(f"User {user.username} confirmed successfully.")
+        logger.info("User %s confirmed successfully.", user.username)
         return {"message": "User confirmed successfully."}
     except Exception as e:
-        logger.error(f"Error confirming user {user.username}: {str(e)}")
+        logger.error("Error confirming user %s: %s", user.username, e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=400, detail=str(e))
 
 
-async def signin_user(user: UserSignIn, res: Response) -> dict:
+def signin_user(user: UserSignIn, res: Response) -> dict:
     """
     Signs in a user and returns authentication tokens.
     """
     try:
-        logger.info(f"Signing in user: {user.username}")
-        secret_hash = await auth_utils.generate_secret_hash(user.username)
-        response = cognito_client.initiate_auth(
+        logger.info("Signing in user: %s", user.username)
+        secret_hash = auth_utils.generate_secret_hash(user.username)
+        response = get_cognito_client().initiate_auth(
             AuthFlow='USER_PASSWORD_AUTH',
             ClientId=CLIENT_ID,
             AuthParameters={
@@ -120,30 +131,32 @@ async def signin_user(user: UserSignIn, res: Response) -> dict:
             httponly=False,
             secure=False
         )
-        logger.info(f"User {user.username} signed in successfully.")
+        logger.info("User %s signed in successfully.", user.username)
         return {"message": "User signed in successfully."}
-    except cognito_client.exceptions.NotAuthorizedException:
-        logger.error(f"Incorrect username or password for user: {user.username}")
+    except get_cognito_client().exceptions.NotAuthorizedException:
+        logger.error("Incorrect username or password for user: %s", user.username)
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     except Exception as e:
-        logger.error(f"Error signing in user {user.username}: {str(e)}")
+        logger.error("Error signing in user %s: %s", user.username, e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=400, detail=str(e))
 
 
-async def logout_user(
+def logout_user(
     current_user: dict = Depends(user_utils.get_current_user_id),
 ) -> dict:
     """
     Logs out a user.
     """
     try:
-        logger.info(f"Logging out user: {current_user['username']}")
-        cognito_client.global_sign_out(accessToken=current_user['access_token'])
-        logger.info(f"User {current_user['username']} logged out successfully.")
+        logger.info("Logging out user: %s", current_user['username'])
+        get_cognito_client().global_sign_out(accessToken=current_user['access_token'])
+        logger.info("User %s logged out successfully.", current_user['username'])
         return {"message": "User successfully logged out."}
-    except cognito_client.exceptions.NotAuthorizedException:
-        logger.error(f"User {current_user['username']} is not authorized to log out.")
+    except get_cognito_client().exceptions.NotAuthorizedException:
+        logger.error("User %s is not authorized to log out.", current_user['username'])
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     except Exception as e:
-        logger.error(f"Error logging out user {current_user['username']}: {str(e)}")
+        logger.error("Error logging out user %s: %s", current_user['username'], e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -5,7 +5,7 @@ import hmac
 from app.config import CLIENT_ID, CLIENT_SECRET
 
 
-async def generate_secret_hash(username: str) -> str:
+def generate_secret_hash(username: str) -> str:
     """
     Generates a secret hash for the given username using the CLIENT_ID and CLIENT_SECRET.
     """
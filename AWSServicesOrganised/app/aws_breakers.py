@@ -0,0 +1,256 @@
+"""
+Isolation between the AWS services the API depends on: Cognito IDP,
+Cognito Identity, DynamoDB and S3 each get tight timeouts, a bulkhead
+bounding the threads that may wait on them at once, and a circuit breaker.
+
+After AWS_CIRCUIT_FAILURE_THRESHOLD consecutive failures (connection
+errors, timeouts or 5xx answers) a dependency's circuit opens and its calls
+fail at once with DependencyUnavailable instead of tying up a worker until
+a timeout. After AWS_CIRCUIT_RESET_TIMEOUT one trial call is let through;
+its outcome closes or reopens the circuit. Breakers and bulkheads are per
+process and shared by every client of the dependency, pooled or
+per-identity.
+
+Like app.aws_policy these are botocore event hooks, registered with
+install() on every pooled client and on the base session.
+"""
+import math
+import time
+import logging
+import threading
+
+from botocore.exceptions import ConnectionError as BotoConnectionError, HTTPClientError
+from fastapi import HTTPException
+
+from app.config import (AWS_CONNECT_TIMEOUT, AWS_READ_TIMEOUTS, AWS_CONNECTION_RETRIES, AWS_BULKHEADS, AWS_BULKHEAD_WAIT,
+                        AWS_CIRCUIT_FAILURE_THRESHOLD, AWS_CIRCUIT_RESET_TIMEOUT)
+from app.aws_policy import parse_rate_limits
+from app.metrics.registry import Counter, Gauge
+
+
+logger = logging.getLogger(__name__)
+
+# Dependency name (as passed to boto3.client) by botocore service id, which is what event names carry
+DEPENDENCIES = {
+    "cognito-identity-provider": "cognito-idp",
+    "cognito-identity": "cognito-identity",
+    "dynamodb": "dynamodb",
+    "s3": "s3",
+}
+# Seconds to wait for a response. S3 moves profile pictures, so it gets longer. Override with AWS_READ_TIMEOUTS.
+DEFAULT_READ_TIMEOUTS = {
+    "cognito-idp": 3,
+    "cognito-identity": 3,
+    "dynamodb": 3,
+    "s3": 10,
+}
+# Calls in flight per dependency. Cognito stays well below the request threadpool (40 threads),
+# so a slow Cognito can't take every thread; DynamoDB also serves batch writes and jobs. Override with AWS_BULKHEADS.
+DEFAULT_BULKHEADS = {
+    "cognito-idp": 16,
+    "cognito-identity": 16,
+    "dynamodb": 64,
+    "s3": 8,
+}
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+AWS_DEPENDENCY_REJECTIONS = Counter(
+    "app_aws_dependency_rejections_total",
+    "AWS calls failed fast because the dependency's circuit was open or its bulkhead full.",
+    ("dependency", "reason"),
+)
+AWS_CIRCUIT_TRANSITIONS = Counter(
+    "app_aws_circuit_transitions_total",
+    "State changes of the per-dependency circuit breakers.",
+    ("dependency", "state"),
+)
+
+_CONTEXT_KEY = "app_dependency"
+
+
+class DependencyUnavailable(Exception):
+    """
+    Raised instead of making an AWS call when its dependency's circuit is
+    open or its bulkhead has no free slot.
+    """
+
+    def __init__(self, dependency: str, reason: str, retry_after: float):
+        super().__init__(f"{dependency} is unavailable ({reason.replace('_', ' ')})")
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. allow() is asked before each call
+    and every allowed call must report back with record(success).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = AWS_CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = AWS_CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        self.state = state
+        AWS_CIRCUIT_TRANSITIONS.inc((self.name, state))
+        log = logger.info if state == CLOSED else logger.warning
+        log("Circuit for %s is now %s", self.name, state)
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead. Once the reset timeout has passed, one trial call is allowed.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            # A trial that never reported back (e.g. its hooks were skipped) is replaced after the reset timeout
+            if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+                return False
+            self._trial_started = now
+            return True
+
+    def record(self, success: bool):
+        with self._lock:
+            if success:
+                self.failures = 0
+                if self.state == HALF_OPEN:
+                    self._trial_started = None
+                    self._set_state(CLOSED)
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._trial_started = None
+                self._set_state(OPEN)
+
+    def retry_after(self) -> float:
+        """
+        Seconds until the next trial call, for Retry-After.
+        """
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+class Bulkhead:
+    """
+    Bounds the calls in flight to one dependency. Callers wait at most
+    `wait` seconds for a slot.
+    """
+
+    def __init__(self, limit: int, wait: float = AWS_BULKHEAD_WAIT):
+        self.limit = limit
+        self.wait = wait
+        self.in_use = 0
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        if not self._slots.acquire(timeout=self.wait):
+            return False
+        with self._lock:
+            self.in_use += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+
+READ_TIMEOUTS = {**DEFAULT_READ_TIMEOUTS, **parse_rate_limits(AWS_READ_TIMEOUTS)}
+BULKHEAD_LIMITS = {**DEFAULT_BULKHEADS, **parse_rate_limits(AWS_BULKHEADS)}
+_breakers = {name: CircuitBreaker(name) for name in DEFAULT_BULKHEADS}
+_bulkheads = {name: Bulkhead(int(limit)) for name, limit in BULKHEAD_LIMITS.items() if name in _breakers}
+
+Gauge("app_aws_circuit_state", "Circuit state per AWS dependency: 0 closed, 1 half open, 2 open.", ("dependency",),
+      lambda: {(name, ): _STATE_VALUES[breaker.state] for name, breaker in _breakers.items()})
+Gauge("app_aws_bulkhead_in_use", "AWS calls in flight per dependency, out of its bulkhead limit.", ("dependency",),
+      lambda: {(name, ): bulkhead.in_use for name, bulkhead in _bulkheads.items()})
+
+
+def client_config(service_name: str) -> dict:
+    """
+    botocore Config arguments with the dependency's timeouts, for building its clients.
+    """
+    return {
+        "connect_timeout": AWS_CONNECT_TIMEOUT,
+        "read_timeout": READ_TIMEOUTS.get(service_name, max(DEFAULT_READ_TIMEOUTS.values())),
+        "retries": {"max_attempts": AWS_CONNECTION_RETRIES},
+    }
+
+
+def _dependency_from_event(event_name: str) -> str:
+    return DEPENDENCIES.get(event_name.split(".", 2)[1])
+
+
+def _before_call(event_name, context, **kwargs):
+    name = _dependency_from_event(event_name)
+    if name is None:
+        return
+    breaker = _breakers[name]
+    bulkhead = _bulkheads.get(name)
+    if bulkhead is not None and not bulkhead.acquire():
+        AWS_DEPENDENCY_REJECTIONS.inc((name, "bulkhead_full"))
+        raise DependencyUnavailable(name, "bulkhead_full", 1)
+    if not breaker.allow():
+        if bulkhead is not None:
+            bulkhead.release()
+        AWS_DEPENDENCY_REJECTIONS.inc((name, "circuit_open"))
+        raise DependencyUnavailable(name, "circuit_open", breaker.retry_after())
+    context[_CONTEXT_KEY] = name
+
+
+def _finish(context: dict, success: bool):
+    name = context.pop(_CONTEXT_KEY, None)
+    if name is None:
+        return
+    _breakers[name].record(success)
+    bulkhead = _bulkheads.get(name)
+    if bulkhead is not None:
+        bulkhead.release()
+
+
+def _after_call(http_response, context, **kwargs):
+    # Error answers below 500 (validation, throttling, not found) mean the service is up
+    _finish(context, http_response.status_code < 500)
+
+
+def _after_call_error(exception, context, **kwargs):
+    _finish(context, not isinstance(exception, (BotoConnectionError, HTTPClientError)))
+
+
+def install(events):
+    """
+    Registers the bulkhead and breaker hooks on a botocore event emitter, such
+    as boto3.Session().events or client.meta.events. Idempotent per emitter.
+    """
+    # First, so that a call failing fast never reaches the other hooks or the network
+    events.register_first("before-call.*.*", _before_call, unique_id="app-breakers-before")
+    events.register("after-call.*.*", _after_call, unique_id="app-breakers-after")
+    events.register("after-call-error.*.*", _after_call_error, unique_id="app-breakers-error")
+    return events
+
+
+def raise_if_unavailable(e: Exception):
+    """
+    Turns a dependency that failed fast, timed out or could not be reached into a 503.
+    """
+    if isinstance(e, DependencyUnavailable):
+        raise HTTPException(status_code=503, detail="A required service is temporarily unavailable. Please try again shortly.",
+                            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+    if isinstance(e, (BotoConnectionError, HTTPClientError)):
+        raise HTTPException(status_code=503, detail="A required service is not responding. Please try again shortly.",
+                            headers={"Retry-After": "1"})
@@ -0,0 +1,188 @@
+"""
+Shared policy for outgoing AWS calls: per-operation token-bucket pacing sized
+to the account's quotas, and decorrelated-jitter retries for throttling errors.
+
+Both are botocore event hooks, registered with install() next to the metrics
+hooks on every pooled client and per-request session.
+"""
+import time
+import random
+import threading
+import logging
+
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+
+from app.config import AWS_RATE_LIMITS, AWS_RATE_LIMIT_SHARE, AWS_THROTTLE_MAX_ATTEMPTS, AWS_RETRY_BASE, AWS_RETRY_CAP
+from app.metrics.registry import Counter, Histogram
+
+
+logger = logging.getLogger(__name__)
+
+# Requests per second per operation, from the default Cognito quotas. DynamoDB on-demand tables are
+# throttled on capacity rather than request rate, so they rely on retries only. Override with AWS_RATE_LIMITS.
+DEFAULT_RATE_LIMITS = {
+    "cognito-identity-provider:InitiateAuth": 120,
+    "cognito-identity-provider:SignUp": 50,
+    "cognito-identity-provider:ConfirmSignUp": 50,
+    "cognito-identity-provider:ListUsers": 30,
+    "cognito-identity-provider:AdminListGroupsForUser": 120,
+    "cognito-identity:GetId": 100,
+    "cognito-identity:GetCredentialsForIdentity": 100,
+}
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "LimitExceededException",
+    "SlowDown",
+}
+
+AWS_PACING_SECONDS = Histogram(
+    "app_aws_pacing_wait_seconds",
+    "Time AWS calls waited for a token from their operation's rate limiter.",
+    ("service", "operation"),
+)
+AWS_THROTTLE_RETRIES = Counter(
+    "app_aws_throttle_retries_total",
+    "Retries scheduled after a throttling error.",
+    ("service", "operation"),
+)
+AWS_THROTTLE_EXHAUSTED = Counter(
+    "app_aws_throttle_exhausted_total",
+    "Calls that were still throttled after the last retry.",
+    ("service", "operation"),
+)
+
+_SLEEP_KEY = "app_retry_sleep"
+
+
+class TokenBucket:
+    """
+    Paces callers to `rate` per second with bursts up to `capacity`. Callers
+    reserve a token and sleep until it is theirs, so waiting is first come,
+    first served.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token and returns how long the caller must wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+def parse_rate_limits(spec: str) -> dict:
+    """
+    Parses "service:Operation=rate,..." into a dict.
+    """
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, rate = part.partition("=")
+        limits[name.strip()] = float(rate)
+    return limits
+
+
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **parse_rate_limits(AWS_RATE_LIMITS)}
+# Quotas are per account, so each process gets its share (app.server sets it to 1 / workers)
+_buckets = {
+    tuple(name.split(":", 1)): TokenBucket(rate * AWS_RATE_LIMIT_SHARE)
+    for name, rate in RATE_LIMITS.items() if rate > 0
+}
+
+
+def _labels_from_event(event_name: str) -> tuple:
+    _, service, operation = event_name.split(".", 2)
+    return service, operation
+
+
+def _before_send(event_name, **kwargs):
+    # Fires once per attempt, so retries are paced too
+    labels = _labels_from_event(event_name)
+    bucket = _buckets.get(labels)
+    if bucket is not None:
+        waited = bucket.acquire()
+        if waited:
+            AWS_PACING_SECONDS.observe(labels, waited)
+
+
+def is_throttling_error(code: str) -> bool:
+    return code in THROTTLING_ERROR_CODES
+
+
+def retry_delay(previous: float) -> float:
+    """
+    Decorrelated jitter: a random delay between the base and three times the previous one, capped.
+    """
+    return min(AWS_RETRY_CAP, random.uniform(AWS_RETRY_BASE, max(previous, AWS_RETRY_BASE) * 3))
+
+
+def _needs_retry(response, attempts, operation, request_dict, **kwargs):
+    if response is None:
+        return None
+    http_response, parsed = response
+    code = parsed.get("Error", {}).get("Code")
+    if not is_throttling_error(code) and http_response.status_code != 429:
+        # Anything else is left to botocore's own retry handler
+        return None
+
+    labels = (operation.service_model.service_id.hyphenize(), operation.name)
+    if attempts >= AWS_THROTTLE_MAX_ATTEMPTS:
+        AWS_THROTTLE_EXHAUSTED.inc(labels)
+        logger.warning("%s.%s still throttled after %s attempts", labels[0], labels[1], attempts)
+        # False stops botocore from retrying any further
+        return False
+
+    context = request_dict["context"]
+    delay = retry_delay(context.get(_SLEEP_KEY, 0.0))
+    context[_SLEEP_KEY] = delay
+    AWS_THROTTLE_RETRIES.inc(labels)
+    return delay
+
+
+def install(events):
+    """
+    Registers pacing and throttling retries on a botocore event emitter, such
+    as boto3.Session().events or client.meta.events. Idempotent per emitter.
+    """
+    events.register("before-send.*.*", _before_send, unique_id="app-policy-pacing")
+    # First so that its answer wins over botocore's default retry handler
+    events.register_first("needs-retry.*.*", _needs_retry, unique_id="app-policy-retry")
+    return events
+
+
+def raise_if_throttled(e: Exception):
+    """
+    Turns a throttling error that outlasted the retries into a 429 instead of
+    a generic 500, and an unavailable dependency into a 503.
+    """
+    # app.aws_breakers builds on this module, so it is imported here rather than at the top
+    from app.aws_breakers import raise_if_unavailable
+
+    raise_if_unavailable(e)
+    if isinstance(e, HTTPException) and e.status_code == 429:
+        raise e
+    if isinstance(e, ClientError) and is_throttling_error(e.response.get("Error", {}).get("Code")):
+        raise HTTPException(status_code=429, detail="Too many requests. Please try again in a moment.", headers={"Retry-After": "1"})
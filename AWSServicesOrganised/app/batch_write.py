@@ -0,0 +1,134 @@
+"""
+DynamoDB BatchWriteItem helpers: write_batch() sends up to 25 puts and
+retries whatever DynamoDB leaves unprocessed, and BatchWriter pipelines
+batches so a caller can keep producing items while earlier batches are
+still being written.
+"""
+import time
+import logging
+import contextvars
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from app import aws_policy
+from app.config import AWS_THROTTLE_MAX_ATTEMPTS
+
+
+logger = logging.getLogger(__name__)
+
+# DynamoDB's limit per BatchWriteItem call
+MAX_BATCH_SIZE = 25
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="batch-write")
+
+
+class UnprocessedItemsError(Exception):
+    """
+    Raised when DynamoDB still left items unprocessed after the last retry.
+    `items` holds the caller's items that were not written; the rest of the
+    batch was.
+    """
+
+    def __init__(self, message: str, items: list):
+        super().__init__(message)
+        self.items = items
+
+
+def write_batch(dynamodb, table_name: str, items: list):
+    """
+    Puts up to 25 items with one BatchWriteItem through a boto3 DynamoDB
+    resource, retrying unprocessed items with decorrelated jitter. Raises
+    UnprocessedItemsError naming the items DynamoDB never accepted.
+    """
+    request_items = {table_name: [{"PutRequest": {"Item": item}} for item in items]}
+    delay = 0.0
+    for attempt in range(1, AWS_THROTTLE_MAX_ATTEMPTS + 1):
+        response = dynamodb.batch_write_item(RequestItems=request_items)
+        request_items = response.get("UnprocessedItems") or {}
+        if not request_items:
+            return
+        if attempt < AWS_THROTTLE_MAX_ATTEMPTS:
+            # Unprocessed items mean the table is throttling us, even though the call succeeded
+            delay = aws_policy.retry_delay(delay)
+            time.sleep(delay)
+    # DynamoDB hands back copies, so match them to the caller's own items
+    unprocessed = [request["PutRequest"]["Item"] for request in request_items.get(table_name, [])]
+    left = [item for item in items if item in unprocessed]
+    raise UnprocessedItemsError(f"{len(left)} items were still unprocessed after {AWS_THROTTLE_MAX_ATTEMPTS} attempts", left)
+
+
+class BatchWriter:
+    """
+    Groups puts into batches of 25 and writes them on a shared pool, with at
+    most `concurrency` batches in flight. Each put carries a tag (e.g. a row
+    number) so failures can be reported per item. Not thread-safe; use one
+    writer per producer.
+    """
+
+    def __init__(self, dynamodb, concurrency: int = 4):
+        self.dynamodb = dynamodb
+        self.concurrency = concurrency
+        self.written = 0
+        self._buffers = {}
+        self._in_flight = deque()
+
+    def put(self, table_name: str, item: dict, tag: Any = None) -> list:
+        """
+        Queues an item and returns (tag, error) for items of batches that failed meanwhile.
+        """
+        buffer = self._buffers.setdefault(table_name, [])
+        buffer.append((tag, item))
+        if len(buffer) < MAX_BATCH_SIZE:
+            return []
+        self._buffers[table_name] = []
+        return self._submit(table_name, buffer)
+
+    def _submit(self, table_name: str, batch: list) -> list:
+        failures = []
+        # Backpressure: wait for the oldest batch before starting one more
+        while len(self._in_flight) >= self.concurrency:
+            failures += self._collect(self._in_flight.popleft())
+        items = [item for _, item in batch]
+        future = _executor.submit(contextvars.copy_context().run, write_batch, self.dynamodb, table_name, items)
+        self._in_flight.append((future, batch))
+        return failures
+
+    def _collect(self, entry: tuple) -> list:
+        future, batch = entry
+        try:
+            future.result()
+        except UnprocessedItemsError as e:
+            # The rest of the batch was written; reporting it as failed would get it written twice
+            logger.error("Batch write of %s items left %s unprocessed: %s", len(batch), len(e.items), e)
+            failed = [(tag, str(e)) for tag, item in batch if any(item is left for left in e.items)]
+            self.written += len(batch) - len(failed)
+            return failed
+        except Exception as e:
+            logger.error("Batch write of %s items failed: %s", len(batch), e)
+            return [(tag, str(e)) for tag, _ in batch]
+        self.written += len(batch)
+        return []
+
+    def completed(self) -> list:
+        """
+        Returns failures of batches that have already finished, without waiting.
+        """
+        failures = []
+        while self._in_flight and self._in_flight[0][0].done():
+            failures += self._collect(self._in_flight.popleft())
+        return failures
+
+    def flush(self) -> list:
+        """
+        Writes what is still buffered and waits for every batch, returning failures.
+        """
+        failures = []
+        for table_name, buffer in self._buffers.items():
+            if buffer:
+                failures += self._submit(table_name, buffer)
+        self._buffers = {}
+        while self._in_flight:
+            failures += self._collect(self._in_flight.popleft())
+        return failures
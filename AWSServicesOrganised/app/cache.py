@@ -0,0 +1,128 @@
+import time
+import threading
+
+from typing import Any, Hashable, Optional
+
+
+_registry = {}
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache where every entry expires after a TTL.
+
+    With shared=True, local misses fall back to the host-wide cache daemon
+    (see app.shared_cache) and writes go to both, so every worker benefits
+    from entries another worker filled. Keys of shared caches must be strings
+    and values picklable.
+
+    A worker serves its own copy of a shared entry without asking the daemon,
+    so a write on another worker is only seen once that copy expires.
+    local_ttl caps how long the copy is kept while a daemon is configured;
+    0 reads every entry through the daemon, for caches that are written
+    through on updates and must never serve the old value.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 10000, shared: bool = False, local_ttl: Optional[float] = None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.shared = shared
+        self.local_ttl = local_ttl
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self._data = {}
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def _shared_client(self):
+        if not self.shared:
+            return None
+        from app import shared_cache
+        return shared_cache.get_client()
+
+    def get_with_ttl(self, key: Hashable) -> Optional[tuple]:
+        """
+        Returns (value, remaining ttl in seconds), or None on a miss.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                remaining = expires_at - time.monotonic()
+                if remaining > 0:
+                    self.hits += 1
+                    return value, remaining
+                del self._data[key]
+
+        client = self._shared_client()
+        found = client.get(f"{self.name}:{key}") if client is not None else None
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += 1
+        value, remaining = found
+        self._set_local(key, value, remaining)
+        return value, remaining
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        found = self.get_with_ttl(key)
+        return None if found is None else found[0]
+
+    def get_local(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns this process's own copy of an entry, never asking the daemon.
+        Not counted as a hit or miss.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def _set_local(self, key: Hashable, value: Any, ttl: float):
+        if self.local_ttl is not None and self._shared_client() is not None:
+            ttl = min(ttl, self.local_ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                # Evict the entry inserted first, dicts keep insertion order
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (value, time.monotonic() + ttl)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._set_local(key, value, ttl)
+        client = self._shared_client()
+        if client is not None:
+            client.set(f"{self.name}:{key}", value, ttl)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+        client = self._shared_client()
+        if client is not None:
+            client.pop(f"{self.name}:{key}")
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.shared_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def all_caches() -> dict:
+    """
+    Returns every cache created in this process, keyed by name.
+    """
+    return dict(_registry)
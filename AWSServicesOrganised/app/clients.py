@@ -0,0 +1,184 @@
+import threading
+
+from app.config import REGION, DATA_ACCESS_MODE
+from app import aws_policy, aws_breakers
+from app.cache import TTLCache
+from app.metrics import aws as aws_metrics
+
+
+IDENTITY, POOLED = "identity", "pooled"
+MAX_POOL_CONNECTIONS = 50
+# Per-identity clients keep their own connection pool, so they get a smaller one
+IDENTITY_POOL_CONNECTIONS = 10
+
+_clients = {}
+_lock = threading.Lock()
+_base_session = None
+_service_session = None
+_resource_classes = {}
+# Temporary credentials last an hour at most; a refresh brings a new access key and so a new entry
+_identity_sessions = TTLCache("identity_sessions", 3600, maxsize=2000)
+
+
+def get_client(service_name: str, region_name: str = None, **config_kwargs):
+    """
+    Returns a long-lived boto3 client built from the service's own credentials.
+    Clients are thread-safe, so one instance per service/region is shared by
+    every request and keeps its HTTP connection pool warm.
+    """
+    region_name = region_name or REGION
+    key = (service_name, region_name, tuple(sorted(config_kwargs.items())))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            # boto3 is heavy to import, so it's only loaded once a client is needed
+            import boto3
+            from botocore.config import Config
+
+            config = Config(max_pool_connections=MAX_POOL_CONNECTIONS, **{**aws_breakers.client_config(service_name), **config_kwargs})
+            client = boto3.client(service_name, region_name=region_name, config=config)
+            aws_metrics.instrument(client.meta.events)
+            aws_policy.install(client.meta.events)
+            aws_breakers.install(client.meta.events)
+            _clients[key] = client
+    return client
+
+
+def pooled_clients() -> list:
+    """
+    Returns the (service, region) pairs that currently have a pooled client.
+    """
+    return sorted({(service, region) for service, region, _ in list(_clients)})
+
+
+def get_base_session():
+    """
+    Returns the boto3 session every per-identity client is built from.
+    Loading service models is the expensive part of creating a client, and
+    the session's loader keeps them after the first one.
+    """
+    global _base_session
+    if _base_session is None:
+        with _lock:
+            if _base_session is None:
+                import boto3
+
+                session = boto3.Session()
+                aws_metrics.instrument(session.events)
+                aws_policy.install(session.events)
+                aws_breakers.install(session.events)
+                _base_session = session
+    return _base_session
+
+
+def _resource_class(service_name: str, region_name: str):
+    key = (service_name, region_name)
+    cls = _resource_classes.get(key)
+    if cls is None:
+        # Building a resource generates its class from the resource model; later ones just wrap a client
+        cls = _resource_classes[key] = type(get_base_session().resource(service_name, region_name=region_name))
+    return cls
+
+
+def pooled_access() -> bool:
+    """
+    Whether user data is reached with the service's own credentials (DATA_ACCESS_MODE=pooled).
+    """
+    return DATA_ACCESS_MODE == POOLED
+
+
+class IdentitySession:
+    """
+    Stands in for a boto3.Session holding one identity's temporary
+    credentials. Clients are created once per service and region and reused
+    by every request of that identity; resources are not thread-safe, so a
+    fresh one is wrapped around the shared client on each call. A resource
+    installs its attribute value transforms on the client it wraps, so
+    resources get their own client and client() stays low-level.
+    """
+
+    pool_connections = IDENTITY_POOL_CONNECTIONS
+
+    def __init__(self, access_key: str, secret_key: str, session_token: str):
+        self._credentials = {
+            "aws_access_key_id": access_key,
+            "aws_secret_access_key": secret_key,
+            "aws_session_token": session_token,
+        }
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, service_name: str, region_name: str = None, for_resource: bool = False):
+        region_name = region_name or REGION
+        key = (service_name, region_name, for_resource)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    from botocore.config import Config
+
+                    config = Config(max_pool_connections=self.pool_connections, **aws_breakers.client_config(service_name))
+                    client = get_base_session().client(service_name, region_name=region_name, config=config, **self._credentials)
+                    self._clients[key] = client
+        return client
+
+    def resource(self, service_name: str, region_name: str = None):
+        region_name = region_name or REGION
+        return _resource_class(service_name, region_name)(client=self.client(service_name, region_name, for_resource=True))
+
+
+class ServiceSession(IdentitySession):
+    """
+    The same interface over the service's own credentials, for
+    DATA_ACCESS_MODE=pooled. One instance serves every user, so its clients
+    and their connection pools stay warm; botocore refreshes role credentials
+    from the default chain before they expire. Nothing here scopes access to
+    a user: callers must key every request by the verified sub, as
+    app.storage.repository does.
+    """
+
+    pool_connections = MAX_POOL_CONNECTIONS
+
+    def __init__(self):
+        self._credentials = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+
+def get_service_session() -> ServiceSession:
+    global _service_session
+    if _service_session is None:
+        with _lock:
+            if _service_session is None:
+                _service_session = ServiceSession()
+    return _service_session
+
+
+def get_identity_session(credentials: dict) -> IdentitySession:
+    """
+    Returns the session for a set of Cognito Identity credentials
+    (AccessKeyId, SecretKey, SessionToken), reusing it while they are valid.
+    """
+    session = _identity_sessions.get(credentials["AccessKeyId"])
+    if session is None:
+        session = IdentitySession(credentials["AccessKeyId"], credentials["SecretKey"], credentials["SessionToken"])
+        _identity_sessions.set(credentials["AccessKeyId"], session)
+    return session
+
+
+def reset_clients():
+    """
+    Drops every pooled client and per-identity session, mainly for tests.
+    """
+    global _base_session, _service_session
+    with _lock:
+        _clients.clear()
+        _resource_classes.clear()
+        _base_session = None
+        _service_session = None
+    _identity_sessions.clear()
@@ -34,3 +34,127 @@ S3_PROFILE_PIC_FOLDER = os.getenv("S3_PROFILE_PIC_FOLDER")
 DynamoDB_USER_DETAILS_TABLE = os.getenv("DynamoDB_USER_DETAILS_TABLE")
 DynamoDB_ASSET_DETAILS_TABLE = os.getenv("DynamoDB_ASSET_DETAILS_TABLE")
 DynamoDB_LIABILITY_DETAILS_TABLE = os.getenv("DynamoDB_LIABILITY_DETAILS_TABLE")
+# Single table for assets and liabilities, keyed by PK=USER#{sub} and SK=ASSET#{id} / LIAB#{id}
+DynamoDB_PORTFOLIO_TABLE = os.getenv("DynamoDB_PORTFOLIO_TABLE")
+
+# Presigned URL settings
+PRESIGNED_URL_EXPIRES_IN = int(os.getenv("PRESIGNED_URL_EXPIRES_IN", "3600"))
+PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv("PRESIGNED_URL_REFRESH_MARGIN", "300"))
+PROFILE_PIC_MAX_BYTES = int(os.getenv("PROFILE_PIC_MAX_BYTES", str(5 * 1024 * 1024)))
+PRESIGNED_POST_EXPIRES_IN = int(os.getenv("PRESIGNED_POST_EXPIRES_IN", "600"))
+
+# In-process cache settings
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+
+# Logging settings
+# LOG_MODE: "sync" writes from the calling thread, "queue" hands records to a background writer
+LOG_MODE = os.getenv("LOG_MODE", "sync")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Comma separated logger=rate pairs, e.g. "app.asset.service=0.1,app.liability.service=0.1"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+
+# Request profiling settings
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile-Request")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+
+# Cold start settings
+# Routers and AWS clients are built on first use unless warm-up runs at startup
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+# How requests reach user data: "identity" exchanges each user's ID token for temporary Cognito Identity
+# credentials; "pooled" uses the service's own long-lived credentials (default chain, e.g. the task or
+# instance role, or AWS_PROFILE with a role_arn) with shared clients, and scopes every query to the
+# verified sub. See app.clients.ServiceSession.
+DATA_ACCESS_MODE = os.getenv("DATA_ACCESS_MODE", "identity")
+
+# Durable sub -> Cognito identity id map, so GetId runs once per user: "sqlite" keeps it in
+# IDENTITY_MAP_DB_PATH, shared by the workers of one host; "dynamodb" uses DynamoDB_IDENTITY_MAP_TABLE; "none" disables it
+IDENTITY_MAP_STORE = os.getenv("IDENTITY_MAP_STORE", "sqlite")
+IDENTITY_MAP_DB_PATH = os.getenv("IDENTITY_MAP_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "identity_map.sqlite3"))
+DynamoDB_IDENTITY_MAP_TABLE = os.getenv("DynamoDB_IDENTITY_MAP_TABLE")
+
+# Token and credential cache settings
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+CREDENTIALS_REFRESH_MARGIN = int(os.getenv("CREDENTIALS_REFRESH_MARGIN", "300"))
+# Unix socket of the host-wide cache daemon started by app.server, empty to disable
+SHARED_CACHE_ADDRESS = os.getenv("SHARED_CACHE_ADDRESS", "")
+SHARED_CACHE_AUTHKEY = os.getenv("SHARED_CACHE_AUTHKEY", "")
+# Seconds a worker waits for the daemon's answer before using its local caches only
+SHARED_CACHE_TIMEOUT = float(os.getenv("SHARED_CACHE_TIMEOUT", "0.05"))
+
+# Server launcher settings (python -m app.server)
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+SERVER_KEEP_ALIVE = int(os.getenv("SERVER_KEEP_ALIVE", "75"))
+
+# Downstream AWS call policy
+# Comma separated service:Operation=requests per second, on top of the defaults in app.aws_policy
+AWS_RATE_LIMITS = os.getenv("AWS_RATE_LIMITS", "")
+# Fraction of each account quota this process may use
+AWS_RATE_LIMIT_SHARE = float(os.getenv("AWS_RATE_LIMIT_SHARE", "1"))
+AWS_THROTTLE_MAX_ATTEMPTS = int(os.getenv("AWS_THROTTLE_MAX_ATTEMPTS", "5"))
+AWS_RETRY_BASE = float(os.getenv("AWS_RETRY_BASE", "0.05"))
+AWS_RETRY_CAP = float(os.getenv("AWS_RETRY_CAP", "2.0"))
+# Per dependency (cognito-idp, cognito-identity, dynamodb, s3) timeouts, bulkheads and circuit breakers, see app.aws_breakers
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "1.0"))
+# Comma separated dependency=seconds, on top of the defaults in app.aws_breakers
+AWS_READ_TIMEOUTS = os.getenv("AWS_READ_TIMEOUTS", "")
+# Retries botocore makes after a connection error or timeout (throttling retries are separate)
+AWS_CONNECTION_RETRIES = int(os.getenv("AWS_CONNECTION_RETRIES", "1"))
+# Comma separated dependency=concurrent calls, on top of the defaults in app.aws_breakers
+AWS_BULKHEADS = os.getenv("AWS_BULKHEADS", "")
+# How long (seconds) a call waits for a bulkhead slot before failing fast
+AWS_BULKHEAD_WAIT = float(os.getenv("AWS_BULKHEAD_WAIT", "0.1"))
+# Consecutive failures that open a dependency's circuit, and seconds before a trial call is let through
+AWS_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AWS_CIRCUIT_FAILURE_THRESHOLD", "5"))
+AWS_CIRCUIT_RESET_TIMEOUT = float(os.getenv("AWS_CIRCUIT_RESET_TIMEOUT", "10.0"))
+
+# Request rate limiting and load shedding
+RATE_LIMITING = os.getenv("RATE_LIMITING", "true").lower() in ("1", "true", "yes")
+# Comma separated path_prefix=rate/burst per user (per IP under /auth), on top of the defaults in app.ratelimit.middleware
+RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+# Header a trusted proxy puts the client address in (e.g. X-Forwarded-For; the last address is used). Unset,
+# the per IP limits key on the peer address, so every client behind one proxy or NAT shares a bucket.
+RATE_LIMIT_CLIENT_IP_HEADER = os.getenv("RATE_LIMIT_CLIENT_IP_HEADER", "")
+# Shed with 503 above this many concurrent requests, or when the event loop lags more than SHED_LOOP_LAG seconds. 0 disables.
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "512"))
+SHED_LOOP_LAG = float(os.getenv("SHED_LOOP_LAG", "0.5"))
+
+# Response compression (brotli is used when the package is installed)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Bulk export: DynamoDB page size while walking a user's items, and rows per Parquet row group
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "10000"))
+
+# Bulk import: rows validated per chunk, and BatchWriteItem calls in flight per import
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_WRITE_CONCURRENCY = int(os.getenv("IMPORT_WRITE_CONCURRENCY", "4"))
+
+# Background jobs: worker threads, and queued jobs accepted before new ones are refused with 503
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+# "sqlite" keeps job records in JOBS_DB_PATH, shared by the workers of one host; "dynamodb" uses DynamoDB_JOBS_TABLE
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "jobs.sqlite3"))
+DynamoDB_JOBS_TABLE = os.getenv("DynamoDB_JOBS_TABLE")
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+# Progress is written to the job store at most this often (seconds)
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1.0"))
+
+# Write coalescing for single creates: hold puts this long (seconds) to send them as one BatchWriteItem
+WRITE_COALESCING = os.getenv("WRITE_COALESCING", "false").lower() in ("1", "true", "yes")
+WRITE_COALESCE_WINDOW = float(os.getenv("WRITE_COALESCE_WINDOW", "0.005"))
+
+# Storage layout of assets and liabilities: "tables" (one table each, queried through UserSubIndex) or
+# "single" (DynamoDB_PORTFOLIO_TABLE). While migrating, writes can also go to the other layout, and reads can
+# merge both; see app.storage.repository for the steps.
+STORAGE_LAYOUT = os.getenv("STORAGE_LAYOUT", "tables")
+STORAGE_DUAL_WRITE = os.getenv("STORAGE_DUAL_WRITE", "false").lower() in ("1", "true", "yes")
+STORAGE_DUAL_READ = os.getenv("STORAGE_DUAL_READ", "false").lower() in ("1", "true", "yes")
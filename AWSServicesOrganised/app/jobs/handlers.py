@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+
+from app.jobs import service as job_service
+from app.user import utils as user_utils
+
+router = APIRouter()
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, current_user: dict = Depends(user_utils.get_current_user_id)) -> dict:
+    return job_service.get_job(job_id, current_user)
+
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str, current_user: dict = Depends(user_utils.get_current_user_id)) -> dict:
+    return job_service.cancel_job(job_id, current_user)
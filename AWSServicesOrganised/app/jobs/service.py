@@ -0,0 +1,190 @@
+"""
+In-process background jobs for work that is too long for a request, such
+as bulk deletes.
+
+submit() records a job and queues it on a bounded pool of JOB_WORKERS
+threads; the caller answers 202 with the job id straight away and the
+client polls GET /jobs/{id}. Jobs report progress and check for
+cancellation through their JobContext. Jobs only live in the process that
+accepted them: their records survive a restart, the work does not.
+"""
+import uuid
+import time
+import logging
+import threading
+import contextvars
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.jobs import store as job_store
+from app.metrics.registry import Counter, Gauge
+from app.config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_PROGRESS_INTERVAL
+
+
+logger = logging.getLogger(__name__)
+
+JOBS_FINISHED = Counter(
+    "app_jobs_finished_total",
+    "Background jobs that finished, by kind and final status.",
+    ("kind", "status"),
+)
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_slots = threading.BoundedSemaphore(JOB_QUEUE_SIZE + JOB_WORKERS)
+_counts = {job_store.QUEUED: 0, job_store.RUNNING: 0}
+_counts_lock = threading.Lock()
+# Contexts of the jobs running in this process, so a local cancel takes effect at the next check
+_running = {}
+Gauge("app_jobs", "Background jobs accepted by this process that have not finished.", ("status",),
+      lambda: {(status,): count for status, count in _counts.items()})
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job once cancellation was requested.
+    """
+
+
+class JobContext:
+    """
+    Handed to a running job to report progress and notice cancellation.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.done = 0
+        self.total = None
+        self._cancelled = False
+        self._last_write = 0.0
+
+    def progress(self, done: int, total: int = None):
+        """
+        Records progress. Writes to the store are throttled, and each write also
+        picks up a cancellation requested from any process.
+        """
+        self.done = done
+        if total is not None:
+            self.total = total
+        now = time.monotonic()
+        if now - self._last_write >= JOB_PROGRESS_INTERVAL:
+            self._last_write = now
+            record = job_store.get_store().update(self.job_id, done=self.done, total=self.total)
+            self._cancelled = self._cancelled or record["cancel_requested"]
+
+    def check_cancelled(self):
+        """
+        Raises JobCancelled if cancellation was requested. Call between units of work.
+        """
+        if self._cancelled:
+            raise JobCancelled()
+
+
+def _set_count(status: str, delta: int):
+    with _counts_lock:
+        _counts[status] += delta
+
+
+def submit(kind: str, owner: str, fn: Callable, *args) -> dict:
+    """
+    Records and queues fn(context, *args), returning the job record. Raises
+    503 when the queue is full.
+    """
+    if not _slots.acquire(blocking=False):
+        logger.warning("Job queue full, refusing %s job", kind)
+        raise HTTPException(status_code=503, detail="Too many background jobs. Please try again shortly.", headers={"Retry-After": "5"})
+    try:
+        record = job_store.new_record(str(uuid.uuid4()), owner, kind)
+        job_store.get_store().create(record)
+        _set_count(job_store.QUEUED, 1)
+        _executor.submit(contextvars.copy_context().run, _run, record["job_id"], kind, fn, args)
+    except Exception as e:
+        _slots.release()
+        logger.error("Error queueing %s job: %s", kind, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    logger.info("Queued %s job %s for %s", kind, record["job_id"], owner)
+    return record
+
+
+def _run(job_id: str, kind: str, fn: Callable, args: tuple):
+    store = job_store.get_store()
+    _set_count(job_store.QUEUED, -1)
+    status = job_store.FAILED
+    try:
+        record = store.get(job_id)
+        if record["cancel_requested"]:
+            status = job_store.CANCELLED
+            store.update(job_id, status=status)
+            return
+        _set_count(job_store.RUNNING, 1)
+        try:
+            store.update(job_id, status=job_store.RUNNING)
+            context = _running[job_id] = JobContext(job_id)
+            try:
+                result = fn(context, *args)
+                status = job_store.SUCCEEDED
+                store.update(job_id, status=status, done=context.done, total=context.total, result=result)
+            except JobCancelled:
+                status = job_store.CANCELLED
+                store.update(job_id, status=status, done=context.done, total=context.total)
+            except Exception as e:
+                logger.error("%s job %s failed: %s", kind, job_id, e)
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                store.update(job_id, status=status, done=context.done, total=context.total, error=detail)
+        finally:
+            _running.pop(job_id, None)
+            _set_count(job_store.RUNNING, -1)
+    except Exception as e:
+        logger.error("Could not record the state of %s job %s: %s", kind, job_id, e)
+    finally:
+        _slots.release()
+        JOBS_FINISHED.inc((kind, status))
+        logger.info("%s job %s finished: %s", kind, job_id, status)
+
+
+def _owned_record(job_id: str, current_user: dict) -> dict:
+    try:
+        record = job_store.get_store().get(job_id)
+    except Exception as e:
+        logger.error("Error reading job %s: %s", job_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    # Someone else's job is reported as missing rather than forbidden
+    if record is None or record["owner"] != current_user["sub"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return record
+
+
+def get_job(job_id: str, current_user: dict) -> dict:
+    record = _owned_record(job_id, current_user)
+    record.pop("owner")
+    return record
+
+
+def cancel_job(job_id: str, current_user: dict) -> dict:
+    """
+    Requests cancellation. A queued job never starts; a running one stops at its next check.
+    """
+    record = _owned_record(job_id, current_user)
+    if record["status"] not in job_store.FINISHED:
+        logger.info("Cancelling job %s", job_id)
+        record = job_store.get_store().update(job_id, cancel_requested=True)
+        context = _running.get(job_id)
+        if context is not None:
+            context._cancelled = True
+    record.pop("owner")
+    return record
+
+
+def accepted(record: dict):
+    """
+    The 202 response for a job a route has just submitted.
+    """
+    location = f"/jobs/{record['job_id']}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": record["job_id"], "status": record["status"], "status_url": location},
+        headers={"Location": location},
+    )
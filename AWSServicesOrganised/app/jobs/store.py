@@ -0,0 +1,161 @@
+"""
+Persistent job records. SQLiteJobStore keeps them in a local file shared by
+the workers of one host; DynamoDBJobStore keeps them in a table so any
+instance can answer GET /jobs/{id}. Select one with JOB_STORE.
+
+A record is a dict with job_id, owner, kind, status, done, total, result,
+error, cancel_requested, created_at and updated_at.
+"""
+import json
+import time
+import sqlite3
+import datetime
+import threading
+
+from app.config import JOB_STORE, JOBS_DB_PATH, DynamoDB_JOBS_TABLE, JOB_RETENTION_DAYS
+
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat()
+
+
+def new_record(job_id: str, owner: str, kind: str) -> dict:
+    now = _now()
+    return {"job_id": job_id, "owner": owner, "kind": kind, "status": QUEUED, "done": 0, "total": None,
+            "result": None, "error": None, "cancel_requested": False, "created_at": now, "updated_at": now}
+
+
+class SQLiteJobStore:
+    """
+    Job records in SQLite. One connection is shared behind a lock; WAL lets
+    other processes read while a worker writes.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, owner TEXT, kind TEXT, status TEXT,"
+                " done INTEGER, total INTEGER, result TEXT, error TEXT, cancel_requested INTEGER,"
+                " created_at TEXT, updated_at TEXT)"
+            )
+        self.delete_older_than()
+
+    def create(self, record: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (:job_id, :owner, :kind, :status, :done, :total, :result, :error,"
+                " :cancel_requested, :created_at, :updated_at)",
+                dict(record, result=json.dumps(record["result"])),
+            )
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["result"] = json.loads(record["result"]) if record["result"] else None
+        record["cancel_requested"] = bool(record["cancel_requested"])
+        return record
+
+    def update(self, job_id: str, **fields) -> dict:
+        """
+        Updates fields and returns the whole record as stored afterwards.
+        """
+        fields["updated_at"] = _now()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = :job_id", dict(fields, job_id=job_id))
+        return self.get(job_id)
+
+    def delete_older_than(self, days: int = JOB_RETENTION_DAYS):
+        cutoff = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).isoformat()
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+
+
+class DynamoDBJobStore:
+    """
+    Job records in a DynamoDB table keyed by job_id, written with the
+    service's own credentials. expires_at can be enabled as the table's TTL
+    attribute to drop old jobs.
+    """
+
+    def __init__(self, table_name: str = DynamoDB_JOBS_TABLE):
+        from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+        from app import clients
+
+        self.table_name = table_name
+        self._client = clients.get_client("dynamodb")
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    def _to_item(self, fields: dict) -> dict:
+        return {name: self._serializer.serialize(value) for name, value in fields.items()}
+
+    def _from_item(self, item: dict) -> dict:
+        record = {name: self._deserializer.deserialize(value) for name, value in item.items()}
+        for name in ("done", "total"):
+            if record.get(name) is not None:
+                record[name] = int(record[name])
+        record["result"] = json.loads(record["result"]) if record.get("result") else None
+        record.pop("expires_at", None)
+        return record
+
+    def create(self, record: dict):
+        expires_at = int(time.time()) + JOB_RETENTION_DAYS * 86400
+        item = self._to_item(dict(record, result=json.dumps(record["result"]), expires_at=expires_at))
+        self._client.put_item(TableName=self.table_name, Item=item)
+
+    def get(self, job_id: str) -> dict:
+        # Consistent, so a poll right after a worker's update sees it
+        response = self._client.get_item(TableName=self.table_name, Key={"job_id": {"S": job_id}}, ConsistentRead=True)
+        item = response.get("Item")
+        return self._from_item(item) if item else None
+
+    def update(self, job_id: str, **fields) -> dict:
+        """
+        Updates fields and returns the whole record as stored afterwards.
+        """
+        fields["updated_at"] = _now()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        names = {f"#f{i}": name for i, name in enumerate(fields)}
+        values = self._to_item({f":v{i}": value for i, value in enumerate(fields.values())})
+        response = self._client.update_item(
+            TableName=self.table_name,
+            Key={"job_id": {"S": job_id}},
+            UpdateExpression="SET " + ", ".join(f"#f{i} = :v{i}" for i in range(len(fields))),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW",
+        )
+        return self._from_item(response["Attributes"])
+
+    def delete_older_than(self, days: int = JOB_RETENTION_DAYS):
+        # Left to the table's TTL on expires_at
+        pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DynamoDBJobStore() if JOB_STORE == "dynamodb" else SQLiteJobStore()
+    return _store
@@ -0,0 +1,160 @@
+"""
+AWS Lambda entry point for running the app behind API Gateway.
+
+Everything at module level runs once in the Lambda init phase: config parsing,
+router imports, pooled AWS clients and the JWKS fetch. Warm invocations only
+translate the event into an ASGI request and back.
+
+Handler: app.lambda_handler.handler
+Supports REST API (payload 1.0) and HTTP API (payload 2.0) proxy events.
+"""
+import asyncio
+import base64
+import logging
+
+from urllib.parse import urlencode
+
+from app.main import app, warm_up
+
+
+logger = logging.getLogger(__name__)
+
+# Init phase: one event loop for the lifetime of the execution environment
+_loop = asyncio.new_event_loop()
+warm_up()
+
+_SERVER = ("lambda", 443)
+_TEXT_CONTENT_TYPES = (b"text/", b"application/json", b"application/xml", b"application/javascript", b"application/x-ndjson")
+
+
+def _is_v2(event: dict) -> bool:
+    return event.get("version") == "2.0"
+
+
+def _request_from_event(event: dict) -> tuple:
+    """
+    Returns (method, path, query string, header list, client ip, body) for either payload version.
+    """
+    request_context = event.get("requestContext") or {}
+    if _is_v2(event):
+        http = request_context.get("http") or {}
+        method = http.get("method", "GET")
+        path = event.get("rawPath") or "/"
+        query_string = (event.get("rawQueryString") or "").encode("latin-1")
+        headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (event.get("headers") or {}).items()]
+        if event.get("cookies"):
+            headers.append((b"cookie", "; ".join(event["cookies"]).encode("latin-1")))
+        client_ip = http.get("sourceIp")
+    else:
+        method = event.get("httpMethod", "GET")
+        path = event.get("path") or "/"
+        multi_query = event.get("multiValueQueryStringParameters")
+        if multi_query:
+            query_string = urlencode(multi_query, doseq=True).encode("latin-1")
+        else:
+            query_string = urlencode(event.get("queryStringParameters") or {}).encode("latin-1")
+        multi_headers = event.get("multiValueHeaders")
+        if multi_headers:
+            headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, values in multi_headers.items() for v in values]
+        else:
+            headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (event.get("headers") or {}).items()]
+        client_ip = (request_context.get("identity") or {}).get("sourceIp")
+
+    body = event.get("body") or b""
+    if body:
+        body = base64.b64decode(body) if event.get("isBase64Encoded") else body.encode("utf-8")
+    return method, path, query_string, headers, client_ip, body
+
+
+async def _run(scope: dict, body: bytes) -> tuple:
+    status = 500
+    response_headers = []
+    chunks = []
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Only report a disconnect once the response is complete, so streaming responses are not cut short
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = message.get("headers") or []
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    response_done.set()
+    return status, response_headers, b"".join(chunks)
+
+
+def _response_to_event(event: dict, status: int, headers: list, body: bytes) -> dict:
+    content_type = b""
+    encoded = False
+    multi_headers = {}
+    cookies = []
+    for name, value in headers:
+        if name == b"content-type":
+            content_type = value
+        elif name == b"content-encoding":
+            encoded = True
+        key, text = name.decode("latin-1"), value.decode("latin-1")
+        if key == "set-cookie":
+            cookies.append(text)
+        multi_headers.setdefault(key, []).append(text)
+
+    # A compressed body is binary whatever its content type
+    if content_type.startswith(_TEXT_CONTENT_TYPES) and not encoded:
+        is_base64, payload = False, body.decode("utf-8")
+    else:
+        is_base64, payload = bool(body), base64.b64encode(body).decode("ascii") if body else ""
+
+    if _is_v2(event):
+        multi_headers.pop("set-cookie", None)
+        return {
+            "statusCode": status,
+            "headers": {k: ",".join(v) for k, v in multi_headers.items()},
+            "cookies": cookies,
+            "body": payload,
+            "isBase64Encoded": is_base64,
+        }
+    return {
+        "statusCode": status,
+        "multiValueHeaders": multi_headers,
+        "body": payload,
+        "isBase64Encoded": is_base64,
+    }
+
+
+def handler(event: dict, context=None) -> dict:
+    """
+    Lambda handler: runs one API Gateway proxy event through the ASGI app.
+    """
+    method, path, query_string, headers, client_ip, body = _request_from_event(event)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "https",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": headers,
+        "server": _SERVER,
+        "client": (client_ip, 0) if client_ip else None,
+        "aws.event": event,
+        "aws.context": context,
+    }
+    status, response_headers, response_body = _loop.run_until_complete(_run(scope, body))
+    return _response_to_event(event, status, response_headers, response_body)
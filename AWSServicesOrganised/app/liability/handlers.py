@@ -3,9 +3,12 @@ from typing import Annotated
 
 from app.user import utils as user_utils
 from app.liability import service as liability_service
+from app.jobs import service as job_service
 from app.models import LiabilityBase, Liability
+from app.responses.encoding import FastJSONResponse, projector
 
 router = APIRouter()
+_project = projector(Liability)
 
 @router.post("/")
 def add_liability(
@@ -16,7 +19,8 @@ def add_liability(
 
 @router.get("/", response_model=list[Liability])
 def get_all_liabilities(user=Depends(user_utils.get_current_user_id)):
-    return liability_service.list_liabilities_per_user(user)
+    # Items come from our own table, so they are trimmed to the model instead of validated again
+    return FastJSONResponse(_project(liability_service.list_liabilities_per_user(user)))
 
 @router.get("/{liability_id}")
 def get_one_liability(
@@ -32,6 +36,7 @@ def delete_one_liability(
 ):
     return liability_service.delete_liability(liability_id, user)
 
-@router.delete("/")
+@router.delete("/", status_code=202)
 def delete_all_liabilities(user=Depends(user_utils.get_current_user_id)):
-    return liability_service.delete_all_liabilities(user)
+    # Runs in the background; poll the returned job for progress
+    return job_service.accepted(liability_service.delete_all_liabilities(user))
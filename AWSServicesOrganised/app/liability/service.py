@@ -1,4 +1,3 @@
-import boto3
 import uuid
 import datetime
 import logging
@@ -6,12 +5,35 @@ import logging
 from fastapi import Depends, HTTPException
 from decimal import Decimal
 
+from app import aws_policy
 from app.models import LiabilityBase
 from app.user import utils as user_utils
-from app.config import REGION, DynamoDB_LIABILITY_DETAILS_TABLE
+from app.singleflight import SingleFlight
+from app.jobs import service as job_service
+from app.storage import codec
+from app.storage import repository as storage
+from app.config import REGION, EXPORT_PAGE_SIZE
 
 
 logger = logging.getLogger(__name__)
+# Identical list queries in flight at the same time (e.g. /liability/ and /portfolio/) share one Query
+_list_flight = SingleFlight("liability_list")
+
+
+def new_liability_item(liability: LiabilityBase, current_user: dict, identity_id: str, liability_id: str = None) -> dict:
+    """
+    Builds the DynamoDB item for a new liability of the user.
+    """
+    return {
+        "liability_id": liability_id or str(uuid.uuid4()),
+        "username": current_user["username"],
+        "category": liability.category,
+        "title": liability.title,
+        "liability_value": Decimal(str(liability.liability_value)),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "sub": current_user["sub"],
+        "identity_id": identity_id
+    }
 
 
 def create_liability(
@@ -19,46 +41,50 @@ def create_liability(
         current_user: dict = Depends(user_utils.get_current_user_id)
     ):
     try:
-        logger.info(f"Creating liability for user: {current_user.get('user_id')}")
+        logger.info("Creating liability for user: %s", current_user.get('user_id'))
         liability_id = str(uuid.uuid4())
-        session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
+        session, identity_id = user_utils.get_user_session(current_user, with_identity_id=True)
         dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_LIABILITY_DETAILS_TABLE)
-
-        item = {
-            "liability_id": liability_id,
-            "username": current_user["username"],
-            "category": liability.category,
-            "title": liability.title,
-            "liability_value": Decimal(str(liability.liability_value)),
-            "created_at": datetime.datetime.utcnow().isoformat(),
-            "sub": current_user["sub"],
-            "identity_id": identity_id
-        }
-        table.put_item(Item=item)
-        logger.info(f"Liability created successfully with ID: {liability_id}")
+
+        storage.put_item(dynamodb, "liability", new_liability_item(liability, current_user, identity_id, liability_id))
+        logger.info("Liability created successfully with ID: %s", liability_id)
         return {"Liability created successfully"}
     except Exception as e:
-        logger.error(f"Error creating liability: {str(e)}")
+        logger.error("Error creating liability: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _query_liabilities(current_user: dict) -> list:
+    session, _ = user_utils.get_user_session(current_user)
+    client = session.client('dynamodb', region_name=REGION)
+    return list(storage.query_raw(client, "liability", current_user))
+
+
+def list_raw_liabilities_per_user(current_user: dict) -> list:
+    """
+    Lists the user's liabilities as raw DynamoDB attribute values, shared with identical queries in flight.
+    """
+    return _list_flight.do(current_user['username'], _query_liabilities, current_user)
+
+
+def iter_liabilities_per_user(current_user: dict, page_size: int = EXPORT_PAGE_SIZE):
+    """
+    Yields every liability of the user, one DynamoDB page at a time, so callers never hold the whole set.
+    """
+    session, _ = user_utils.get_user_session(current_user)
+    yield from storage.query_items(session.client('dynamodb', region_name=REGION), "liability", current_user, page_size)
+
+
 def list_liabilities_per_user(
         current_user: dict = Depends(user_utils.get_current_user_id)
     ):
     try:
-        logger.info(f"Listing liabilities for user: {current_user.get('user_id')}")
-        session, _ = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
-        dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_LIABILITY_DETAILS_TABLE)
-
-        response = table.query(
-            IndexName="UserSubIndex",
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('username').eq(current_user['username'])
-        )
-        return response.get('Items', [])
+        logger.info("Listing liabilities for user: %s", current_user.get('user_id'))
+        return [codec.decode_item(item) for item in list_raw_liabilities_per_user(current_user)]
     except Exception as e:
-        logger.error(f"Error listing liabilities: {str(e)}")
+        logger.error("Error listing liabilities: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -67,24 +93,23 @@ def get_liability_by_id(
         current_user: dict = Depends(user_utils.get_current_user_id)
     ):
     try:
-        logger.info(f"Fetching liability with ID: {liability_id} for user: {current_user.get('user_id')}")
-        session, _ = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
-        dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_LIABILITY_DETAILS_TABLE)
+        logger.info("Fetching liability with ID: %s for user: %s", liability_id, current_user.get('user_id'))
+        session, _ = user_utils.get_user_session(current_user)
+        client = session.client('dynamodb', region_name=REGION)
 
-        response = table.get_item(
-            Key={"liability_id": liability_id}
-        )
-        item = response.get("Item")
+        item = storage.get_item(client, "liability", current_user, liability_id)
         if not item:
-            logger.warning(f"Liability with ID: {liability_id} not found for user: {current_user.get('user_id')}")
+            logger.warning("Liability with ID: %s not found for user: %s", liability_id, current_user.get('user_id'))
             raise HTTPException(status_code=404, detail="Liability not found")
         if item.get("sub") != current_user["sub"]:
-            logger.warning(f"Unauthorized access attempt to liability ID: {liability_id} by user: {current_user.get('user_id')}")
+            logger.warning("Unauthorized access attempt to liability ID: %s by user: %s", liability_id, current_user.get('user_id'))
             raise HTTPException(status_code=403, detail="Unauthorized access")
         return item
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching liability by ID: {str(e)}")
+        logger.error("Error fetching liability by ID: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -93,35 +118,41 @@ def delete_liability(
         current_user: dict = Depends(user_utils.get_current_user_id)
     ):
     try:
-        logger.info(f"Deleting liability with ID: {liability_id} for user: {current_user.get('user_id')}")
-        session, _ = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
+        logger.info("Deleting liability with ID: %s for user: %s", liability_id, current_user.get('user_id'))
+        session, _ = user_utils.get_user_session(current_user)
         dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_LIABILITY_DETAILS_TABLE)
 
-        table.delete_item(Key={"liability_id": liability_id})
-        logger.info(f"Liability with ID: {liability_id} deleted successfully for user: {current_user.get('user_id')}")
+        storage.delete_item(dynamodb, "liability", current_user, liability_id)
+        logger.info("Liability with ID: %s deleted successfully for user: %s", liability_id, current_user.get('user_id'))
         return {"message": "Liability deleted successfully"}
     except Exception as e:
-        logger.error(f"Error deleting liability: {str(e)}")
+        logger.error("Error deleting liability: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 def delete_all_liabilities(
         current_user: dict = Depends(user_utils.get_current_user_id)
     ):
-    try:
-        logger.info(f"Deleting all liabilities for user: {current_user.get('user_id')}")
-        session, _ = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
-        dynamodb = session.resource('dynamodb', region_name=REGION)
-        table = dynamodb.Table(DynamoDB_LIABILITY_DETAILS_TABLE)
-
-        response = table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr('username').eq(current_user['username'])
-        )
-        for item in response.get('Items', []):
-            table.delete_item(Key={"liability_id": item['liability_id']})
-        logger.info(f"All liabilities deleted successfully for user: {current_user.get('user_id')}")
-        return {"message": "All liabilities deleted successfully"}
-    except Exception as e:
-        logger.error(f"Error deleting all liabilities: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    """
+    Queues the deletion of every liability of the user as a background job.
+    """
+    logger.info("Queueing deletion of all liabilities for user: %s", current_user.get('user_id'))
+    return job_service.submit("delete_all_liabilities", current_user["sub"], _delete_all_liabilities, current_user)
+
+
+def _delete_all_liabilities(job, current_user: dict) -> dict:
+    # Ids are collected first, so progress has a total and paging never runs over deleted items
+    ids = [item['liability_id'] for item in iter_liabilities_per_user(current_user)]
+    job.progress(0, len(ids))
+    session, _ = user_utils.get_user_session(current_user)
+    dynamodb = session.resource('dynamodb', region_name=REGION)
+
+    def progress(deleted: int):
+        job.progress(deleted)
+        job.check_cancelled()
+
+    job.check_cancelled()
+    deleted = storage.delete_items(dynamodb, "liability", current_user, ids, progress)
+    logger.info("Deleted %s liabilities for user: %s", deleted, current_user.get('user_id'))
+    return {"deleted": deleted}
@@ -1,9 +1,22 @@
+import atexit
+import json
+import queue
+import random
 import logging
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+
+from app.config import LOG_MODE, LOG_FORMAT, LOG_SAMPLING
 
 LOGGING_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,
+    "filters": {
+        "sampling": {
+            "()": "app.logger.SamplingFilter",
+            "rates": LOG_SAMPLING,
+        },
+    },
     "formatters": {
         "default": {
             "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s",
@@ -11,12 +24,16 @@ LOGGING_CONFIG = {
         "detailed": {
             "format": "[%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] - %(message)s",
         },
+        "json": {
+            "()": "app.logger.JsonFormatter",
+        },
     },
     "handlers": {
         "default": {
             "level": "DEBUG",
             "formatter": "detailed",
             "class": "logging.StreamHandler",
+            "filters": ["sampling"],
         },
     },
     "root": {
@@ -25,6 +42,104 @@ LOGGING_CONFIG = {
     }
 }
 
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line.
+    The message is only interpolated here, so %-style arguments of records
+    that are filtered out are never formatted.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of INFO and lower records for the configured loggers.
+    Warnings and errors are never sampled out.
+    """
+
+    def __init__(self, rates: str = ""):
+        super().__init__()
+        self.rates = {}
+        for pair in filter(None, (p.strip() for p in rates.split(","))):
+            name, rate = pair.split("=")
+            self.rates[name.strip()] = float(rate)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None:
+            return True
+        return random.random() < rate
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Enqueues records as-is. The stock QueueHandler formats the message in the
+    calling thread, which is exactly the work we want off the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(mode: str = LOG_MODE, log_format: str = LOG_FORMAT, sampling: str = LOG_SAMPLING):
+    """
+    Configures logging.
+    In "queue" mode the root logger only enqueues records and a background
+    QueueListener thread does the formatting and writing, so request handlers
+    never block on the stream.
+    """
+    _stop_listener()
+    config = dict(LOGGING_CONFIG)
+    config["handlers"] = {name: dict(handler) for name, handler in LOGGING_CONFIG["handlers"].items()}
+    config["filters"] = {"sampling": dict(LOGGING_CONFIG["filters"]["sampling"], rates=sampling)}
+    if log_format == "json":
+        config["handlers"]["default"]["formatter"] = "json"
+    dictConfig(config)
+
+    if mode == "queue":
+        _start_queue_listener()
+
+
+def _start_queue_listener():
+    global _listener
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    # Sampling runs before enqueueing so dropped records never cross threads
+    for handler in handlers:
+        for f in list(handler.filters):
+            queue_handler.addFilter(f)
+            handler.removeFilter(f)
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
 
-def setup_logger():
-    dictConfig(LOGGING_CONFIG)
+atexit.register(_stop_listener)
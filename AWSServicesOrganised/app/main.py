@@ -1,15 +1,18 @@
 import os
 import logging
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from dotenv import load_dotenv
 
-from app.auth.handlers import router as auth_router
-from app.user.handlers import router as user_router
-from app.admin.handlers import router as admin_router
-from app.asset.handlers import router as asset_router
-from app.liability.handlers import router as liability_router
-from app.portfolio.handlers import router as portfolio_router
+from app import routers
+from app.config import WARM_UP_ON_STARTUP
+from app.metrics.handlers import router as metrics_router
+from app.metrics.middleware import MetricsMiddleware
+from app.profiling.middleware import ProfilingMiddleware
+from app.ratelimit.middleware import RateLimitMiddleware
+from app.responses.compression import CompressionMiddleware
 
 from app.logger import setup_logger
 
@@ -17,15 +20,43 @@ from app.logger import setup_logger
 setup_logger()
 logger = logging.getLogger(__name__)
 
+
+def warm_up():
+    """
+    Pays the one-off costs up front: imports every router, creates the pooled
+    AWS clients and fetches the user pool JWKS.
+    """
+    from app import clients
+    from app.config import REGION
+    from app.user import utils as user_utils
+
+    routers.load_all(app)
+    clients.get_client("cognito-idp", REGION)
+    clients.get_client("cognito-identity", REGION)
+    try:
+        user_utils.get_jwks()
+    except Exception as e:
+        logger.error("Error fetching JWKS during warm-up: %s", e)
+    logger.info("Warm-up completed.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_UP_ON_STARTUP:
+        warm_up()
+    yield
+
+
 # Run the App
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(routers.LazyRouterMiddleware, target=app)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # App configuraitons
-app.include_router(auth_router, prefix="/auth", tags=["auth"])
-app.include_router(user_router, prefix="/user", tags=["auth"])
-app.include_router(admin_router, prefix="/admin", tags=["admin"])
-app.include_router(asset_router, prefix="/asset", tags=["asset"])
-app.include_router(liability_router, prefix="/liability", tags=["liability"])
-app.include_router(portfolio_router, prefix="/portfolio", tags=["Portfolio"])
-
-logger.info("FastAPI application started successfully.")
\ No newline at end of file
+# Domain routers are included on first use, see app.routers
+app.include_router(metrics_router, tags=["metrics"])
+
+logger.info("FastAPI application started successfully.")
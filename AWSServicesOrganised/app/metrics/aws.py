@@ -0,0 +1,95 @@
+import time
+
+from collections import Counter as CallCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.metrics.registry import Counter, Histogram
+
+
+AWS_CALL_SECONDS = Histogram(
+    "app_aws_call_duration_seconds",
+    "Duration of AWS API calls including retries and backoff.",
+    ("service", "operation"),
+)
+AWS_CALL_ERRORS = Counter(
+    "app_aws_call_errors_total",
+    "AWS API calls that ended in an error response or exception.",
+    ("service", "operation"),
+)
+AWS_CALL_RETRIES = Counter(
+    "app_aws_call_retries_total",
+    "Retry attempts botocore made for AWS API calls.",
+    ("service", "operation"),
+)
+
+_START_KEY = "app_metrics_start"
+_MODEL_KEY = "app_metrics_model"
+
+# Set while record_calls() is active; threadpool workers inherit it with the request context
+_recorded_calls = ContextVar("recorded_aws_calls", default=None)
+
+
+@contextmanager
+def record_calls():
+    """
+    Counts the AWS operations made inside the block, keyed by (service, operation).
+    """
+    calls = CallCounter()
+    token = _recorded_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _recorded_calls.reset(token)
+
+
+def _record(labels: tuple):
+    calls = _recorded_calls.get()
+    if calls is not None:
+        calls[labels] += 1
+
+
+def _labels(model) -> tuple:
+    return (model.service_model.service_id.hyphenize(), model.name)
+
+
+def _before_call(model, context, **kwargs):
+    context[_START_KEY] = time.perf_counter()
+    context[_MODEL_KEY] = model
+
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    start = context.pop(_START_KEY, None)
+    if start is None:
+        return
+    labels = _labels(model)
+    _record(labels)
+    AWS_CALL_SECONDS.observe(labels, time.perf_counter() - start)
+    retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+    if retries:
+        AWS_CALL_RETRIES.inc(labels, retries)
+    if http_response.status_code >= 300:
+        AWS_CALL_ERRORS.inc(labels)
+
+
+def _after_call_error(exception, context, **kwargs):
+    start = context.pop(_START_KEY, None)
+    model = context.get(_MODEL_KEY)
+    if start is None or model is None:
+        return
+    labels = _labels(model)
+    _record(labels)
+    AWS_CALL_SECONDS.observe(labels, time.perf_counter() - start)
+    AWS_CALL_ERRORS.inc(labels)
+
+
+def instrument(events):
+    """
+    Registers the timing hooks on a botocore event emitter, such as
+    boto3.Session().events or client.meta.events.
+    Registration is idempotent per emitter.
+    """
+    events.register_first("before-call.*.*", _before_call, unique_id="app-metrics-before")
+    events.register("after-call.*.*", _after_call, unique_id="app-metrics-after")
+    events.register("after-call-error.*.*", _after_call_error, unique_id="app-metrics-error")
+    return events
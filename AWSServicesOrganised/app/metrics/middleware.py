@@ -0,0 +1,50 @@
+import time
+
+from app.metrics.registry import Counter, Histogram
+
+
+REQUEST_SECONDS = Histogram(
+    "app_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+REQUESTS_STARTED = Counter(
+    "app_requests_started_total",
+    "HTTP requests that entered the app.",
+    ("method",),
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records per-route latency histograms.
+    Routes are labelled by their template (e.g. /asset/{asset_id}) so path
+    parameters don't blow up label cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+        REQUESTS_STARTED.inc((scope["method"],))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(
+                (scope["method"], route_path, str(status["code"])),
+                time.perf_counter() - start,
+            )
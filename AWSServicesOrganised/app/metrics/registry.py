@@ -0,0 +1,124 @@
+import threading
+
+from typing import Callable, Iterable
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []
+
+
+def _format_labels(labelnames: tuple, labels: tuple, extra: dict = None) -> str:
+    pairs = list(zip(labelnames, labels))
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    """
+    Monotonic counter with a fixed set of label names.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def collect(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus exposition layout.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def count(self, labels: tuple = ()) -> int:
+        entry = self._values.get(labels)
+        return entry[1] if entry else 0
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def collect(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, total_sum) in sorted(self._values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, {'le': bound})} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, {'le': '+Inf'})} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total_sum}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose samples are read from a callback at scrape time.
+    The callback returns a mapping of label tuples to values.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str], callback: Callable[[], dict]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        _metrics.append(self)
+
+    def collect(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self.callback().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+def render() -> str:
+    """
+    Renders every registered metric in the Prometheus text format.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,37 @@
+from app import cache, clients
+from app.metrics import registry
+
+
+def _cache_sizes() -> dict:
+    return {(name, ): len(c) for name, c in cache.all_caches().items()}
+
+
+def _cache_hits() -> dict:
+    return {(name, ): c.hits for name, c in cache.all_caches().items()}
+
+
+def _cache_misses() -> dict:
+    return {(name, ): c.misses for name, c in cache.all_caches().items()}
+
+
+def _cache_shared_hits() -> dict:
+    return {(name, ): c.shared_hits for name, c in cache.all_caches().items() if c.shared}
+
+
+def _pooled_clients() -> dict:
+    return {(service, region): 1 for service, region in clients.pooled_clients()}
+
+
+registry.Gauge("app_cache_entries", "Entries currently held by each in-process cache.", ("cache",), _cache_sizes)
+registry.Gauge("app_cache_hits", "Cache hits since process start.", ("cache",), _cache_hits)
+registry.Gauge("app_cache_misses", "Cache misses since process start.", ("cache",), _cache_misses)
+registry.Gauge("app_cache_shared_hits", "Local misses answered by the cross-worker cache daemon.", ("cache",), _cache_shared_hits)
+registry.Gauge("app_aws_pooled_clients", "Long-lived pooled AWS clients by service and region.", ("service", "region"), _pooled_clients)
+registry.Gauge("app_aws_pool_max_connections", "Connection pool size of each pooled AWS client.", (), lambda: {(): clients.MAX_POOL_CONNECTIONS})
+
+
+def render_metrics() -> str:
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    return registry.render()
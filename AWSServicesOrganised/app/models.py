@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator
 from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
@@ -29,6 +29,21 @@ class UserProfile(UserNameModel):
     dob: Optional[str] = None
 
 
+class UserProfileUpdate(BaseModel):
+    name: Optional[str] = None
+    height: Optional[str] = None
+    gender: Optional[str] = None
+    dob: Optional[str] = None
+
+    @field_validator("name")
+    @classmethod
+    def name_not_null(cls, value):
+        # Omit the field to leave it unchanged; a stored profile always has a name
+        if value is None:
+            raise ValueError("name cannot be null")
+        return value
+
+
 class UserProfileFull(UserProfile):
     sub: str
     name: str
@@ -37,6 +52,15 @@ class UserProfileFull(UserProfile):
     identity_id: Optional[str] = None
 
 
+class ProfilePictureUploadRequest(BaseModel):
+    filename: str
+    content_type: str
+
+
+class ProfilePictureUploadComplete(BaseModel):
+    s3_key: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -46,7 +70,8 @@ class Token(BaseModel):
 class AssetBase(BaseModel):
     category: str
     title: str
-    asset_value: float
+    # NaN and infinity can't be stored in DynamoDB, so they are rejected up front
+    asset_value: float = Field(allow_inf_nan=False)
 
 class Asset(AssetBase):
     asset_id: UUID
@@ -55,8 +80,16 @@ class Asset(AssetBase):
 class LiabilityBase(BaseModel):
     category: str
     title: str
-    liability_value: float
+    liability_value: float = Field(allow_inf_nan=False)
 
 class Liability(LiabilityBase):
     liability_id: UUID
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+
+class Portfolio(BaseModel):
+    total_assets: float
+    total_liabilities: float
+    net_worth: float
+    assets: List[AssetBase]
+    liabilities: List[LiabilityBase]
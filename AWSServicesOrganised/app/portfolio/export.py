@@ -0,0 +1,163 @@
+"""
+Streaming bulk export of a user's assets and liabilities as NDJSON, CSV or
+Parquet.
+
+Items are read from DynamoDB one page at a time and encoded as they arrive,
+so memory stays flat however large the portfolio is. Parquet needs the
+optional `pyarrow` package and is written one row group at a time.
+"""
+import io
+import csv
+import logging
+
+from decimal import Decimal
+from typing import Iterator
+
+from app.user import utils as user_utils
+from app.storage import codec
+from app.storage import repository as storage
+from app.responses.encoding import dumps
+from app.config import REGION, EXPORT_PAGE_SIZE, EXPORT_ROW_GROUP_SIZE
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("kind", "id", "category", "title", "value", "created_at")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+# kind -> (id attribute, value attribute)
+FIELDS = {"asset": ("asset_id", "asset_value"), "liability": ("liability_id", "liability_value")}
+# Encoded rows are sent in chunks of about this size rather than one write per row
+CHUNK_SIZE = 64 * 1024
+
+
+def parquet_available() -> bool:
+    return pyarrow is not None
+
+
+def iter_rows(current_user: dict, page_size: int = None) -> Iterator[dict]:
+    """
+    Yields the user's assets, then liabilities, as flat export rows.
+    """
+    session, _ = user_utils.get_user_session(current_user)
+    client = session.client('dynamodb', region_name=REGION)
+    for kind, item in storage.query_portfolio_raw(client, current_user, page_size or EXPORT_PAGE_SIZE):
+        id_field, value_field = FIELDS[kind]
+        # The stored number text is kept exact for the CSV
+        value = Decimal(item[value_field]["N"]) if value_field in item else None
+        fields = codec.decode_item(item)
+        yield _row(kind, fields, fields.get(id_field), value)
+
+
+def _row(kind: str, item: dict, item_id, value) -> dict:
+    # value stays a Decimal here; each encoder decides how to write it
+    return {"kind": kind, "id": item_id, "category": item.get("category"), "title": item.get("title"),
+            "value": value, "created_at": item.get("created_at")}
+
+
+def _ndjson_chunks(rows: Iterator[dict]) -> Iterator[bytes]:
+    buffer, size = [], 0
+    for row in rows:
+        line = dumps(row) + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _csv_chunks(rows: Iterator[dict]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """
+    Write-only file for the Parquet writer that hands back what was written
+    since the last drain(). pyarrow tracks the file position itself.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema():
+    return pyarrow.schema([
+        ("kind", pyarrow.string()),
+        ("id", pyarrow.string()),
+        ("category", pyarrow.string()),
+        ("title", pyarrow.string()),
+        ("value", pyarrow.float64()),
+        ("created_at", pyarrow.string()),
+    ])
+
+
+def _parquet_chunks(rows: Iterator[dict], row_group_size: int = None) -> Iterator[bytes]:
+    row_group_size = row_group_size or EXPORT_ROW_GROUP_SIZE
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    columns = {name: [] for name in COLUMNS}
+    with pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode="w"), schema) as writer:
+        for row in rows:
+            for name in COLUMNS:
+                columns[name].append(row[name])
+            if len(columns["id"]) >= row_group_size:
+                _write_row_group(writer, schema, columns)
+                yield sink.drain()
+        if columns["id"]:
+            _write_row_group(writer, schema, columns)
+    # Closing the writer adds the footer
+    yield sink.drain()
+
+
+def _write_row_group(writer, schema, columns: dict):
+    values = [float(v) if v is not None else None for v in columns["value"]]
+    writer.write_table(pyarrow.Table.from_pydict({**columns, "value": values}, schema=schema))
+    for column in columns.values():
+        column.clear()
+
+
+ENCODERS = {"ndjson": _ndjson_chunks, "csv": _csv_chunks, "parquet": _parquet_chunks}
+
+
+def export_chunks(rows: Iterator[dict], fmt: str) -> Iterator[bytes]:
+    """
+    Encodes rows incrementally in the given format.
+    """
+    return ENCODERS[fmt](rows)
@@ -1,9 +1,42 @@
-from fastapi import APIRouter, Depends
+import datetime
+
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+
 from app.portfolio import service as portfolio_service
+from app.portfolio import export
 from app.user import utils as user_utils
+from app.models import Portfolio
 
 router = APIRouter()
 
-@router.get("/")
+@router.get("/", response_model=Portfolio)
 def get_portfolio(current_user=Depends(user_utils.get_current_user_id)):
-    return portfolio_service.calculate_portfolio(current_user)
+    # The service already validated every item, so serialize without validating again
+    portfolio = Portfolio.model_construct(**portfolio_service.calculate_portfolio(current_user))
+    return Response(portfolio.model_dump_json(), media_type="application/json")
+
+
+@router.get("/export")
+def export_portfolio(
+    format: Literal["ndjson", "csv", "parquet"] = "ndjson",
+    current_user=Depends(user_utils.get_current_user_id),
+    ):
+    chunks = portfolio_service.export_portfolio(current_user, format)
+    filename = f"portfolio-{datetime.date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import")
+def import_portfolio(
+    file: UploadFile = File(...),
+    current_user=Depends(user_utils.get_current_user_id),
+    ):
+    # Rows are reported as they are processed; the last line is a summary
+    return StreamingResponse(portfolio_service.import_portfolio(file.file, current_user), media_type="application/x-ndjson")
@@ -0,0 +1,152 @@
+"""
+Streaming CSV import of assets and liabilities.
+
+The upload is read row by row, validated against AssetBase/LiabilityBase a
+chunk at a time, and valid rows are written with pipelined BatchWriteItem
+calls while the next chunk is parsed. Memory is bounded by the chunk size
+and the batches in flight, not by the size of the file.
+
+The CSV needs kind (asset or liability), category, title and value
+columns; other columns (such as the id and created_at of an export) are
+ignored, so an export can be imported again.
+"""
+import io
+import csv
+import logging
+
+from typing import Iterator
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.models import AssetBase, LiabilityBase
+from app.asset import service as asset_service
+from app.liability import service as liability_service
+from app.batch_write import BatchWriter
+from app.storage import repository as storage
+from app.responses.encoding import dumps
+from app.config import IMPORT_CHUNK_SIZE, IMPORT_WRITE_CONCURRENCY
+
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ("kind", "category", "title", "value")
+# kind -> (list adapter, value field, item builder)
+KINDS = {
+    "asset": (TypeAdapter(list[AssetBase]), "asset_value", asset_service.new_asset_item),
+    "liability": (TypeAdapter(list[LiabilityBase]), "liability_value", liability_service.new_liability_item),
+}
+
+
+class ImportFormatError(ValueError):
+    """
+    Raised when the upload is not a CSV with the required columns.
+    """
+
+
+def open_rows(file) -> Iterator[tuple]:
+    """
+    Checks the header and returns an iterator of (line number, row) over the upload.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    try:
+        header = reader.fieldnames or []
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFormatError(f"Could not read the CSV header: {e}")
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ImportFormatError(f"Missing required columns: {', '.join(missing)}")
+
+    def rows():
+        try:
+            for row in reader:
+                yield reader.line_num, row
+        finally:
+            # Leave closing the upload to the framework
+            text.detach()
+    return rows()
+
+
+def _chunks(rows: Iterator[tuple], size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_chunk(kind: str, rows: list) -> tuple:
+    """
+    Validates rows of one kind in one call. Returns ([(line, model)], [(line, errors)]).
+    """
+    adapter, value_field = KINDS[kind][:2]
+    records = [{"category": row.get("category"), "title": row.get("title"), value_field: row.get("value")} for _, row in rows]
+    try:
+        return list(zip((line for line, _ in rows), adapter.validate_python(records))), []
+    except ValidationError as e:
+        errors = {}
+        for error in e.errors(include_url=False):
+            index, *field = error["loc"]
+            name = "value" if field == [value_field] else ".".join(map(str, field))
+            errors.setdefault(index, []).append(f"{name}: {error['msg']}")
+    # Validate the rest again, now that the failing rows are known
+    good = [(line, row) for i, (line, row) in enumerate(rows) if i not in errors]
+    valid, _ = validate_chunk(kind, good) if good else ([], [])
+    return valid, [(rows[i][0], messages) for i, messages in sorted(errors.items())]
+
+
+def import_rows(rows: Iterator[tuple], current_user: dict, identity_id: str, dynamodb) -> Iterator[bytes]:
+    """
+    Validates and writes rows, yielding an NDJSON report: one line per
+    rejected or failed row, then a summary line.
+    """
+    writer = BatchWriter(dynamodb, IMPORT_WRITE_CONCURRENCY)
+    counts = {"asset": 0, "liability": 0}
+    rejected = failed = 0
+
+    def failures(items: list) -> Iterator[bytes]:
+        nonlocal failed
+        for tag, error in items:
+            if tag is None:
+                # Secondary copies of dual writes; BatchWriter has logged the error
+                continue
+            line, kind = tag
+            failed += 1
+            counts[kind] -= 1
+            yield dumps({"row": line, "status": "failed", "errors": [error]}) + b"\n"
+
+    for chunk in _chunks(rows, IMPORT_CHUNK_SIZE):
+        by_kind = {kind: [] for kind in KINDS}
+        report = []
+        for line, row in chunk:
+            kind = (row.get("kind") or "").strip().lower()
+            if kind in by_kind:
+                by_kind[kind].append((line, row))
+            else:
+                report.append((line, [f"kind: must be one of {', '.join(KINDS)}"]))
+
+        for kind, kind_rows in by_kind.items():
+            if not kind_rows:
+                continue
+            valid, errors = validate_chunk(kind, kind_rows)
+            report += errors
+            build_item = KINDS[kind][2]
+            for line, model in valid:
+                counts[kind] += 1
+                targets = storage.write_targets(kind, build_item(model, current_user, identity_id))
+                for i, (table, item) in enumerate(targets):
+                    yield from failures(writer.put(table, item, (line, kind) if i == 0 else None))
+
+        rejected += len(report)
+        for line, errors in sorted(report):
+            yield dumps({"row": line, "status": "rejected", "errors": errors}) + b"\n"
+        yield from failures(writer.completed())
+
+    yield from failures(writer.flush())
+    logger.info("Imported %s assets and %s liabilities for user %s (%s rejected, %s failed)",
+                counts["asset"], counts["liability"], current_user.get("username"), rejected, failed)
+    yield dumps({"status": "done", "assets": counts["asset"], "liabilities": counts["liability"],
+                 "rejected": rejected, "failed": failed}) + b"\n"
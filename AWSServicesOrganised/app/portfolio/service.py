@@ -1,15 +1,25 @@
 import logging
+import itertools
+import contextvars
 
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import Depends, HTTPException
-from decimal import Decimal
+from typing import Iterator
 
+from app import aws_policy
+from app.config import REGION
 from app.user import utils as user_utils
+from app.portfolio import export
+from app.portfolio import importer
+from app.storage import codec
+from app.storage import repository as storage
 from app.asset import service as asset_service
 from app.liability import service as liability_service
-from app.models import AssetBase, LiabilityBase
 
 
 logger = logging.getLogger(__name__)
+# Runs the asset query next to the liability query, so both can join in-flight list calls
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="portfolio")
 
 
 def calculate_portfolio(current_user: dict = Depends(user_utils.get_current_user_id)):
@@ -17,29 +27,88 @@ def calculate_portfolio(current_user: dict = Depends(user_utils.get_current_user
     Calculates total assets, liabilities, and net worth for a user.
     """
     try:
-        logger.info(f"Calculating portfolio for user: {current_user.get('user_id')}")
-        # Fetch raw data
-        raw_assets = asset_service.list_assets_per_user(current_user)
-        raw_liabilities = liability_service.list_liabilities_per_user(current_user)
-
-        # Typecast to Pydantic models
-        assets = [AssetBase(**a) for a in raw_assets]
-        liabilities = [LiabilityBase(**l) for l in raw_liabilities]
-
-        # Compute totals
-        total_assets = sum(Decimal(str(a.asset_value)) for a in assets)
-        total_liabilities = sum(Decimal(str(l.liability_value)) for l in liabilities)
+        logger.info("Calculating portfolio for user: %s", current_user.get('user_id'))
+        # Fetch raw attribute values
+        if storage.single_table():
+            raw_assets, raw_liabilities = _query_portfolio(current_user)
+        else:
+            assets_future = _executor.submit(contextvars.copy_context().run, asset_service.list_raw_assets_per_user, current_user)
+            raw_liabilities = liability_service.list_raw_liabilities_per_user(current_user)
+            raw_assets = assets_future.result()
+
+        # Decode straight into the models, and sum exactly in fixed point
+        assets, total_assets = codec.decode_holdings("asset", raw_assets)
+        liabilities, total_liabilities = codec.decode_holdings("liability", raw_liabilities)
         net_worth = total_assets - total_liabilities
 
-        logger.info(f"Total assets: {total_assets}, Total liabilities: {total_liabilities}, Net worth: {net_worth}")
+        logger.info("Total assets: %s, Total liabilities: %s, Net worth: %s", codec.from_fixed(total_assets),
+                    codec.from_fixed(total_liabilities), codec.from_fixed(net_worth))
         return {
-            "total_assets": float(total_assets),
-            "total_liabilities": float(total_liabilities),
-            "net_worth": float(net_worth),
+            "total_assets": codec.from_fixed(total_assets),
+            "total_liabilities": codec.from_fixed(total_liabilities),
+            "net_worth": codec.from_fixed(net_worth),
             "assets": assets,
             "liabilities": liabilities
         }
 
     except Exception as e:
-        logger.error(f"Error calculating portfolio: {str(e)}")
+        logger.error("Error calculating portfolio: %s", e)
+        aws_policy.raise_if_throttled(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _query_portfolio(current_user: dict) -> tuple:
+    # One query over the user's partition of the single table
+    session, _ = user_utils.get_user_session(current_user)
+    items = {"asset": [], "liability": []}
+    for kind, item in storage.query_portfolio_raw(session.client('dynamodb', region_name=REGION), current_user):
+        items[kind].append(item)
+    return items["asset"], items["liability"]
+
+
+def export_portfolio(current_user: dict, fmt: str) -> Iterator[bytes]:
+    """
+    Starts a streaming export of every asset and liability of the user.
+    """
+    if fmt == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export is not available on this server")
+    logger.info("Exporting portfolio for user: %s as %s", current_user.get('username'), fmt)
+    chunks = _log_stream_errors(export.export_chunks(export.iter_rows(current_user), fmt), current_user)
+    try:
+        # The first chunk is read before the response starts, so credential and first page
+        # errors still turn into a proper status code instead of a truncated body
+        first = next(chunks, b"")
+    except Exception as e:
+        logger.error("Error exporting portfolio: %s", e)
+        aws_policy.raise_if_throttled(e)
+        raise HTTPException(status_code=500, detail=str(e))
+    return itertools.chain([first], chunks)
+
+
+def _log_stream_errors(chunks: Iterator[bytes], current_user: dict) -> Iterator[bytes]:
+    try:
+        yield from chunks
+    except Exception as e:
+        # Once streaming has started the status is sent, so the client only sees a cut-off body
+        logger.error("Streaming for user %s failed midway: %s", current_user.get('username'), e)
+        raise
+
+
+def import_portfolio(file, current_user: dict) -> Iterator[bytes]:
+    """
+    Starts a streaming import of the assets and liabilities in an uploaded CSV.
+    """
+    try:
+        rows = importer.open_rows(file)
+    except importer.ImportFormatError as e:
+        logger.warning("[%s] Rejected portfolio import: %s", current_user.get('username'), e)
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        session, identity_id = user_utils.get_user_session(current_user, with_identity_id=True)
+        dynamodb = session.resource('dynamodb', region_name=REGION)
+    except Exception as e:
+        logger.error("Error starting portfolio import: %s", e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
+    logger.info("Importing portfolio for user: %s", current_user.get('username'))
+    return _log_stream_errors(importer.import_rows(rows, current_user, identity_id, dynamodb), current_user)
@@ -0,0 +1,73 @@
+import random
+import threading
+import time
+import logging
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from app.config import PROFILE_SAMPLE_RATE, PROFILE_HEADER, PROFILE_INTERVAL
+from app.profiling import service as profiling_service
+from app.profiling.sampler import StackSampler, profiled_request, WORKER_CONTEXTS_SUPPORTED
+
+
+logger = logging.getLogger(__name__)
+
+
+def _is_admin_request(scope) -> bool:
+    # Imported here so the middleware doesn't pull the auth stack in at app import time
+    from app.user import utils as user_utils
+
+    try:
+        current_user = user_utils.get_current_user_id(Request(scope))
+    except HTTPException:
+        return False
+    return 'admin' in (current_user.get('cognito:groups') or [])
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a sampled fraction of requests, plus any
+    request from an admin that carries the PROFILE_HEADER header, and stores
+    the collapsed stacks for /admin/profiles.
+    """
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, header: str = PROFILE_HEADER):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        if not WORKER_CONTEXTS_SUPPORTED:
+            logger.warning("Request profiling is off: this anyio version's threadpool workers can't be told apart")
+
+    def _should_profile(self, scope) -> bool:
+        if not WORKER_CONTEXTS_SUPPORTED:
+            return False
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if any(name == self.header for name, _ in scope.get("headers", [])):
+            return _is_admin_request(scope)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL)
+        start = time.perf_counter()
+        token = profiled_request.set(sampler)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Reset first, so the threadpool calls below are not sampled as part of the request
+            profiled_request.reset(token)
+            duration = time.perf_counter() - start
+            # Joining the sampler and writing the capture block, so neither runs on the event loop
+            await run_in_threadpool(sampler.stop)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            try:
+                await run_in_threadpool(profiling_service.save_capture, scope["method"], route, duration, sampler.collapsed())
+            except OSError as e:
+                logger.error("Error saving request profile: %s", e)
@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+
+from collections import Counter
+from contextvars import Context, ContextVar
+
+
+WORKER_THREAD_NAME = "AnyIO worker thread"
+
+# The sampler of the request being profiled. The middleware sets it in the
+# request's context, and anyio copies that context into every threadpool call
+# the request makes.
+profiled_request = ContextVar("profiled_request", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _worker_run_code():
+    """
+    The code of anyio's worker loop, when it keeps the context of the call it
+    runs in a `context` local as this sampler expects; None otherwise.
+    """
+    try:
+        from anyio._backends._asyncio import WorkerThread
+        code = WorkerThread.run.__code__
+    except (ImportError, AttributeError):
+        return None
+    return code if "context" in code.co_varnames else None
+
+
+_WORKER_RUN_CODE = _worker_run_code()
+# Without it a worker's request can't be told, so requests are not profiled at all
+WORKER_CONTEXTS_SUPPORTED = _WORKER_RUN_CODE is not None
+
+
+def _worker_context(stack: list):
+    """
+    Returns the context of the call a threadpool worker is running: anyio's
+    worker loop keeps it in its `context` local, and drops it between calls.
+    """
+    for frame in reversed(stack):
+        if frame.f_code is _WORKER_RUN_CODE:
+            context = frame.f_locals.get("context")
+            return context if isinstance(context, Context) else None
+    return None
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler.
+    A background thread snapshots the stacks of the event loop thread and of
+    the threadpool workers that are running this request's calls, and
+    aggregates them as collapsed stacks (flamegraph.pl / speedscope input).
+
+    Sync routes run on threadpool workers, which cProfile on the loop thread
+    would never see, hence sampling threads instead. Workers busy with other
+    requests are told apart by the profiled_request value in their context.
+    """
+
+    def __init__(self, loop_thread_id: int, interval: float):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _wanted(self, thread_id: int, names: dict, stack: list) -> bool:
+        if thread_id == self.loop_thread_id:
+            return True
+        if names.get(thread_id) != WORKER_THREAD_NAME:
+            return False
+        context = _worker_context(stack)
+        return context is not None and context.get(profiled_request) is self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame)
+                    frame = frame.f_back
+                if not self._wanted(thread_id, names, stack):
+                    continue
+                self.counts[";".join(_frame_label(f) for f in reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
@@ -0,0 +1,63 @@
+import os
+import re
+import time
+import logging
+
+from fastapi import HTTPException
+
+from app.config import PROFILE_DIR, PROFILE_MAX_FILES
+
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_SUFFIX = ".collapsed"
+_unsafe_chars = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def save_capture(method: str, route: str, duration: float, collapsed: str) -> str:
+    """
+    Writes a collapsed-stack capture and prunes the oldest ones beyond PROFILE_MAX_FILES.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    route_part = _unsafe_chars.sub("_", route).strip("_") or "root"
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(time.time_ns() % 1_000_000)}-{method}-{route_part}-{int(duration * 1000)}ms{CAPTURE_SUFFIX}"
+    with open(os.path.join(PROFILE_DIR, name), "w") as f:
+        f.write(collapsed)
+    logger.info("Saved request profile %s", name)
+    _prune()
+    return name
+
+
+def _prune():
+    captures = sorted(list_captures(), key=lambda c: c["modified"])
+    for capture in captures[:max(len(captures) - PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, capture["name"]))
+        except FileNotFoundError:
+            pass
+
+
+def list_captures() -> list:
+    """
+    Lists saved captures, newest first.
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    captures = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.is_file() and entry.name.endswith(CAPTURE_SUFFIX):
+            stat = entry.stat()
+            captures.append({"name": entry.name, "size": stat.st_size, "modified": stat.st_mtime})
+    return sorted(captures, key=lambda c: c["modified"], reverse=True)
+
+
+def get_capture_path(name: str) -> str:
+    """
+    Resolves a capture name to its file, rejecting anything outside PROFILE_DIR.
+    """
+    if os.path.basename(name) != name or not name.endswith(CAPTURE_SUFFIX):
+        raise HTTPException(status_code=400, detail="Invalid profile name.")
+    path = os.path.join(PROFILE_DIR, name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return path
@@ -0,0 +1,196 @@
+import json
+import time
+import asyncio
+import logging
+
+from starlette.requests import Request
+
+from app.config import RATE_LIMITING, RATE_LIMITS, RATE_LIMIT_CLIENT_IP_HEADER, SHED_MAX_IN_FLIGHT, SHED_LOOP_LAG
+from app.metrics.registry import Counter, Gauge
+
+
+logger = logging.getLogger(__name__)
+
+# path prefix -> (requests per second, burst), per user. The longest matching prefix wins.
+DEFAULT_LIMITS = {
+    "": (20, 40),
+    "/auth": (2, 10),
+    "/admin": (2, 5),
+    "/asset": (10, 20),
+    "/liability": (10, 20),
+    "/portfolio": (5, 10),
+    "/user": (10, 20),
+}
+# Unauthenticated routes, limited per client IP. Behind a proxy or NAT that is
+# one bucket for everyone unless RATE_LIMIT_CLIENT_IP_HEADER names the header
+# the proxy records the client address in.
+IP_KEYED_PREFIXES = ("/auth",)
+EXEMPT_PATHS = {"/metrics", "/docs", "/redoc", "/openapi.json"}
+
+REQUESTS_REJECTED = Counter(
+    "app_requests_rejected_total",
+    "Requests turned away by rate limiting or load shedding.",
+    ("reason",),
+)
+
+_in_flight = 0
+_loop_lag = 0.0
+Gauge("app_requests_in_flight", "Requests currently being handled.", (), lambda: {(): _in_flight})
+Gauge("app_event_loop_lag_seconds", "Most recent event loop scheduling delay.", (), lambda: {(): _loop_lag})
+
+
+def parse_limits(spec: str) -> dict:
+    """
+    Parses "prefix=rate/burst,..." into {prefix: (rate, burst)}.
+    """
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        prefix, _, value = part.partition("=")
+        rate, _, burst = value.partition("/")
+        limits[prefix.strip().rstrip("/")] = (float(rate), float(burst or rate))
+    return limits
+
+
+class BucketStore:
+    """
+    Token buckets keyed by (route prefix, client). Only touched from the event
+    loop, so it needs no lock. The least recently created buckets are dropped
+    beyond maxsize.
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._buckets = {}
+
+    def take(self, key: tuple, rate: float, burst: float) -> float:
+        """
+        Takes a token, returning 0 on success or the seconds until one is available.
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.maxsize:
+                self._buckets.pop(next(iter(self._buckets)))
+            bucket = self._buckets[key] = [burst, now]
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / rate
+
+
+async def _monitor_loop_lag(interval: float = 0.1):
+    global _loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        # An idle loop can only look late because the process was paused (e.g. a frozen Lambda), not overloaded
+        _loop_lag = max(0.0, loop.time() - start - interval) if _in_flight else 0.0
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware that enforces per-user token buckets (keyed by the
+    verified `sub`, or the client IP on unauthenticated routes) and sheds load
+    with 503 when too many requests are in flight or the event loop falls
+    behind.
+
+    Verifying a token can fetch the JWKS, which must not happen on the event
+    loop, so only tokens the process has already verified are keyed by their
+    `sub`. Any other token, such as a user's first request or a forged one,
+    is keyed by the client IP until the route has verified it.
+    """
+
+    def __init__(self, app, enabled: bool = RATE_LIMITING, limits: dict = None,
+                 max_in_flight: int = SHED_MAX_IN_FLIGHT, max_loop_lag: float = SHED_LOOP_LAG,
+                 client_ip_header: str = RATE_LIMIT_CLIENT_IP_HEADER):
+        self.app = app
+        self.enabled = enabled
+        self.client_ip_header = client_ip_header.lower()
+        limits = {**DEFAULT_LIMITS, **parse_limits(RATE_LIMITS)} if limits is None else limits
+        # Longest prefix first, so the most specific limit matches
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.buckets = BucketStore()
+        self._monitor = None
+
+    def _limit_for(self, path: str) -> tuple:
+        for prefix, limit in self.limits:
+            if path == prefix or path.startswith(prefix + "/") or not prefix:
+                return prefix, limit
+        return None, None
+
+    def _client_ip(self, scope) -> str:
+        if self.client_ip_header:
+            forwarded = Request(scope).headers.get(self.client_ip_header)
+            if forwarded:
+                # The trusted proxy appends the address it saw; earlier entries come from the client
+                return forwarded.split(",")[-1].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _client_key(self, scope, prefix: str) -> str:
+        if not prefix.startswith(IP_KEYED_PREFIXES):
+            # Imported here so the middleware doesn't pull the auth stack in at app import time
+            from app.user import utils as user_utils
+
+            request = Request(scope)
+            token = request.cookies.get("id_token") or request.headers.get("Authorization")
+            current_user = user_utils.get_verified_user(token) if token else None
+            if current_user is not None:
+                return "sub:" + current_user["sub"]
+        return "ip:" + self._client_ip(scope)
+
+    def _shed_reason(self) -> str:
+        if self.max_in_flight and _in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.max_loop_lag and _loop_lag >= self.max_loop_lag:
+            return "loop_lag"
+        return None
+
+    async def _reject(self, send, status: int, detail: str, retry_after: float, reason: str):
+        REQUESTS_REJECTED.inc((reason,))
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(1, int(retry_after + 0.999))).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http" or not self.enabled or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        if self.max_loop_lag:
+            loop = asyncio.get_running_loop()
+            if self._monitor is None or self._monitor.get_loop() is not loop:
+                self._monitor = loop.create_task(_monitor_loop_lag())
+
+        reason = self._shed_reason()
+        if reason:
+            logger.warning("Shedding %s %s: %s", scope["method"], scope["path"], reason)
+            await self._reject(send, 503, "Server is busy. Please try again shortly.", 1, reason)
+            return
+
+        prefix, limit = self._limit_for(scope["path"])
+        if limit is not None:
+            wait = self.buckets.take((prefix, self._client_key(scope, prefix)), *limit)
+            if wait:
+                await self._reject(send, 429, "Too many requests. Please try again in a moment.", wait, "rate_limited")
+                return
+
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _in_flight -= 1
@@ -0,0 +1,139 @@
+"""
+Response compression negotiated from Accept-Encoding: brotli when the
+`brotli` package is installed and the client accepts it, otherwise gzip.
+Whole responses are only compressed at or above the size threshold;
+streamed responses are compressed chunk by chunk and flushed as they go.
+"""
+import gzip
+import zlib
+
+from app.config import COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"text/")
+
+
+def _accepted_encodings(header: str) -> dict:
+    """
+    Parses Accept-Encoding into {coding: q}.
+    """
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str) -> str:
+    accepted = _accepted_encodings(header)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    for coding in candidates:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > 0:
+            return coding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flushed so each streamed chunk reaches the client without waiting for the next
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses JSON, NDJSON and text responses for
+    clients that accept br or gzip.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((v.decode("latin-1") for k, v in scope.get("headers", []) if k == b"accept-encoding"), "")
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = dict(start.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                passthrough = b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES)
+                if passthrough:
+                    await send(start)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None and start is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = [(k, v) for k, v in start.get("headers", []) if k != b"content-length"]
+                headers += [(b"content-encoding", encoding.encode("latin-1")), (b"vary", b"Accept-Encoding")]
+                if not more_body:
+                    compressed = compress(body, encoding)
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await send(dict(start, headers=headers))
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send(dict(start, headers=headers))
+                start = None
+
+            if more_body:
+                await send({"type": "http.response.body", "body": compressor.chunk(body), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.chunk(body) + compressor.finish()})
+
+        await self.app(scope, receive, send_wrapper)
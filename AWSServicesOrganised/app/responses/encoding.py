@@ -0,0 +1,63 @@
+"""
+Fast JSON responses for list-heavy endpoints.
+
+orjson (Rust) encodes datetime and UUID natively and Decimal through
+_default; without it the stdlib encoder is used with the same output.
+"""
+import json
+import uuid
+import datetime
+
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        # Same as the response models, which declare amounts as float
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with dumps(). Returning it from a handler also skips
+    FastAPI's response_model validation and jsonable_encoder, so only return it
+    for data that is already in the declared shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def projector(model: type[BaseModel]):
+    """
+    Returns a function that trims trusted items (ones this app wrote itself) to
+    the fields of `model`, without validating them again on every read.
+    """
+    fields = tuple(model.model_fields)
+
+    def project(items: list) -> list:
+        return [{name: item.get(name) for name in fields} for item in items]
+
+    return project
@@ -0,0 +1,70 @@
+import importlib
+import threading
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# (prefix, handlers module, tags). Each router is imported and included on the
+# first request under its prefix, so importing app.main stays cheap.
+ROUTERS = [
+    ("/auth", "app.auth.handlers", ["auth"]),
+    ("/user", "app.user.handlers", ["auth"]),
+    ("/admin", "app.admin.handlers", ["admin"]),
+    ("/asset", "app.asset.handlers", ["asset"]),
+    ("/liability", "app.liability.handlers", ["liability"]),
+    ("/portfolio", "app.portfolio.handlers", ["Portfolio"]),
+    ("/jobs", "app.jobs.handlers", ["jobs"]),
+]
+
+_loaded = set()
+_lock = threading.Lock()
+
+
+def include_router(app, prefix: str, module_path: str, tags: list):
+    """
+    Imports a handlers module and includes its router, once per prefix.
+    """
+    if prefix in _loaded:
+        return
+    with _lock:
+        if prefix in _loaded:
+            return
+        router = importlib.import_module(module_path).router
+        app.include_router(router, prefix=prefix, tags=tags)
+        # The OpenAPI schema is cached on first build and would miss these routes
+        app.openapi_schema = None
+        _loaded.add(prefix)
+        logger.info("Loaded router %s", prefix)
+
+
+def load_for_path(app, path: str):
+    for prefix, module_path, tags in ROUTERS:
+        if path == prefix or path.startswith(prefix + "/"):
+            include_router(app, prefix, module_path, tags)
+            return
+
+
+def load_all(app):
+    for prefix, module_path, tags in ROUTERS:
+        include_router(app, prefix, module_path, tags)
+
+
+class LazyRouterMiddleware:
+    """
+    ASGI middleware that includes the router for a request's prefix before the
+    request is routed. The docs and OpenAPI endpoints load every router.
+    """
+
+    def __init__(self, app, target):
+        self.app = app
+        self.target = target
+        self.load_all_paths = {url for url in (target.openapi_url, target.docs_url, target.redoc_url) if url}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and len(_loaded) < len(ROUTERS):
+            if scope["path"] in self.load_all_paths:
+                load_all(self.target)
+            else:
+                load_for_path(self.target, scope["path"])
+        await self.app(scope, receive, send)
@@ -0,0 +1,72 @@
+"""
+Production launcher for app.main:app.
+
+Starts the host-wide cache daemon (app.shared_cache) and then uvicorn with
+several workers, so verified tokens and identity credentials are shared by
+every worker instead of being cached once per process.
+
+Run from AWSServicesOrganised/:
+    python -m app.server --workers 4 --port 8000
+"""
+import os
+import shutil
+import argparse
+import tempfile
+import importlib.util
+import logging
+
+from app import shared_cache
+from app.logger import setup_logger
+from app.config import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_KEEP_ALIVE
+
+
+logger = logging.getLogger(__name__)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--keep-alive", type=int, default=SERVER_KEEP_ALIVE, help="seconds to keep idle connections open")
+    parser.add_argument("--no-shared-cache", action="store_true", help="only use per-worker caches")
+    args = parser.parse_args()
+
+    setup_logger()
+    import uvicorn
+
+    socket_dir = None
+    if not args.no_shared_cache:
+        socket_dir = tempfile.mkdtemp(prefix="app-cache-")
+        address = os.path.join(socket_dir, "cache.sock")
+        authkey = os.urandom(32)
+        shared_cache.start_server_process(address, authkey)
+        # Workers read these when they import app.config
+        os.environ["SHARED_CACHE_ADDRESS"] = address
+        os.environ["SHARED_CACHE_AUTHKEY"] = authkey.hex()
+        logger.info("Shared cache daemon listening on %s", address)
+
+    # Each worker paces itself to its share of the account's AWS quotas
+    os.environ.setdefault("AWS_RATE_LIMIT_SHARE", str(1 / max(args.workers, 1)))
+
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            loop="uvloop" if _installed("uvloop") else "asyncio",
+            http="httptools" if _installed("httptools") else "h11",
+            timeout_keep_alive=args.keep_alive,
+        )
+    finally:
+        if socket_dir is not None:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Cache daemon shared by every worker on the host, reached over a local Unix
+socket. Workers started by app.server find it through SHARED_CACHE_ADDRESS;
+when it is not configured or not reachable, callers only use their own
+in-process caches.
+"""
+import os
+import time
+import threading
+import logging
+import multiprocessing
+
+from multiprocessing.connection import Listener, Client
+
+from app.cache import TTLCache
+from app.config import SHARED_CACHE_ADDRESS, SHARED_CACHE_AUTHKEY, SHARED_CACHE_TIMEOUT
+
+
+logger = logging.getLogger(__name__)
+
+# How long a worker stops asking the daemon after it failed to answer
+RETRY_AFTER = 5.0
+
+
+def serve(address: str, authkey: bytes, ready: threading.Event = None):
+    """
+    Answers get/set/pop requests from workers until the process exits.
+    """
+    store = TTLCache("shared", ttl=300, maxsize=100000)
+    listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    os.chmod(address, 0o600)
+    if ready is not None:
+        ready.set()
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                op = request[0]
+                if op == "get":
+                    conn.send(store.get_with_ttl(request[1]))
+                elif op == "set":
+                    store.set(request[1], request[2], request[3])
+                    conn.send(True)
+                elif op == "pop":
+                    store.pop(request[1])
+                    conn.send(True)
+                else:
+                    conn.send(None)
+
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError as e:
+            logger.error("Shared cache failed to accept a connection: %s", e)
+            continue
+        threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+def start_server_process(address: str, authkey: bytes) -> multiprocessing.Process:
+    """
+    Starts the cache daemon in a child process and waits for its socket to appear.
+    """
+    process = multiprocessing.Process(target=serve, args=(address, authkey), name="shared-cache", daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while not os.path.exists(address):
+        if not process.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("Shared cache daemon did not start")
+        time.sleep(0.01)
+    return process
+
+
+class SharedCacheClient:
+    """
+    Worker side of the shared cache. Each thread keeps its own connection, and
+    any failure, including an answer slower than `timeout`, turns the client
+    into a no-op for RETRY_AFTER seconds.
+    """
+
+    def __init__(self, address: str, authkey: bytes, timeout: float = SHARED_CACHE_TIMEOUT):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def _request(self, *request):
+        if time.monotonic() < self._down_until:
+            return None
+        conn = getattr(self._local, "conn", None)
+        try:
+            if conn is None:
+                conn = self._local.conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            conn.send(request)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"no answer within {self.timeout}s")
+            return conn.recv()
+        except (OSError, EOFError) as e:
+            logger.warning("Shared cache unavailable, using local caches only: %s", e)
+            # A late answer would be read as the reply to the next request, so the connection goes
+            if conn is not None:
+                conn.close()
+            self._local.conn = None
+            self._down_until = time.monotonic() + RETRY_AFTER
+            return None
+
+    def get(self, key: str):
+        """
+        Returns (value, remaining ttl) or None.
+        """
+        return self._request("get", key)
+
+    def set(self, key: str, value, ttl: float):
+        self._request("set", key, value, ttl)
+
+    def pop(self, key: str):
+        self._request("pop", key)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the client for the configured daemon, or None when there is none.
+    """
+    global _client
+    if _client is None and SHARED_CACHE_ADDRESS:
+        with _client_lock:
+            if _client is None:
+                _client = SharedCacheClient(SHARED_CACHE_ADDRESS, bytes.fromhex(SHARED_CACHE_AUTHKEY))
+    return _client
@@ -0,0 +1,86 @@
+"""
+Single-flight coalescing: concurrent calls with the same key share the result
+of the one call that is already in flight, whether the callers are threads
+(sync endpoints run in the threadpool) or coroutines.
+
+Nothing is kept once the call finishes, so this only merges overlapping calls;
+pair it with a TTLCache to reuse results. Callers must treat shared results as
+read-only.
+"""
+import asyncio
+import threading
+
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+from app.metrics.registry import Counter
+
+
+SINGLEFLIGHT_SHARED = Counter(
+    "app_singleflight_shared_total",
+    "Calls answered by joining an identical call already in flight.",
+    ("flight",),
+)
+
+
+class SingleFlight:
+    """
+    A group of coalesced calls, e.g. one per downstream operation.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable) -> tuple:
+        """
+        Returns (future, True) for the caller that must make the call, (future, False) for followers.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                SINGLEFLIGHT_SHARED.inc((self.name,))
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None):
+        # Forget the call before publishing, so later callers start a fresh one
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Calls fn(*args, **kwargs) unless an identical call is in flight, and
+        returns (or raises) its outcome.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Coroutine version of do() for async fn; shares flights with do().
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
@@ -0,0 +1,101 @@
+"""
+Online backfill of the single table from the asset and liability tables.
+
+Run from AWSServicesOrganised/ while the app writes to both layouts
+(STORAGE_DUAL_WRITE=true), see app.storage.repository:
+    python -m app.storage.backfill --segments 8
+
+Each table is read with a parallel scan using the service's own
+credentials. An item is copied with a conditional put, so whatever a dual
+write has put in the single table since is never overwritten. If the item
+was deleted from its old table meanwhile, the copy is removed again, so a
+concurrent delete can't be undone. Running it again only copies what is
+still missing.
+"""
+import argparse
+import logging
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from app import clients
+from app.logger import setup_logger
+from app.storage.repository import KINDS, partition_key, sort_key
+from app.config import DynamoDB_PORTFOLIO_TABLE
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENTS = 8
+DEFAULT_PAGE_SIZE = 500
+
+
+def copy_item(client, kind: str, item: dict) -> str:
+    """
+    Copies one item (in DynamoDB JSON) of the old table. Returns "copied",
+    "present", "deleted" (gone from the old table meanwhile) or "skipped"
+    (no owner to key it by).
+    """
+    table, id_field, _ = KINDS[kind]
+    if "sub" not in item:
+        logger.warning("Skipping %s %s without a sub", kind, item[id_field]["S"])
+        return "skipped"
+    key = {"PK": {"S": partition_key(item["sub"]["S"])}, "SK": {"S": sort_key(kind, item[id_field]["S"])}}
+    try:
+        client.put_item(TableName=DynamoDB_PORTFOLIO_TABLE, Item=dict(item, **key), ConditionExpression="attribute_not_exists(PK)")
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            return "present"
+        raise
+    # A delete between the scan and the put only reached the single table if it came after the put
+    response = client.get_item(TableName=table, Key={id_field: item[id_field]}, ConsistentRead=True, ProjectionExpression=id_field)
+    if "Item" not in response:
+        client.delete_item(TableName=DynamoDB_PORTFOLIO_TABLE, Key=key)
+        return "deleted"
+    return "copied"
+
+
+def backfill_segment(client, kind: str, segment: int, total_segments: int, page_size: int = DEFAULT_PAGE_SIZE) -> Counter:
+    scan = {"TableName": KINDS[kind][0], "Segment": segment, "TotalSegments": total_segments, "Limit": page_size}
+    counts = Counter()
+    while True:
+        response = client.scan(**scan)
+        for item in response.get("Items", []):
+            counts[copy_item(client, kind, item)] += 1
+        logger.info("%s segment %s/%s: %s", kind, segment + 1, total_segments, dict(counts))
+        if "LastEvaluatedKey" not in response:
+            return counts
+        scan["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def backfill(kinds: list = None, segments: int = DEFAULT_SEGMENTS, page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    Copies every item of the given kinds (default all) and returns the outcome counts per kind.
+    """
+    client = clients.get_client("dynamodb")
+    results = {}
+    with ThreadPoolExecutor(max_workers=segments, thread_name_prefix="backfill") as executor:
+        for kind in kinds or list(KINDS):
+            futures = [executor.submit(backfill_segment, client, kind, segment, segments, page_size) for segment in range(segments)]
+            results[kind] = sum((future.result() for future in futures), Counter())
+            logger.info("Backfilled %s: %s", kind, dict(results[kind]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kinds", default=",".join(KINDS), help="comma separated kinds to copy")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS, help="parallel scan segments per table")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    setup_logger()
+    results = backfill(args.kinds.split(","), args.segments, args.page_size)
+    for kind, counts in results.items():
+        print(kind, dict(counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Decoding of DynamoDB attribute values, as the low-level client returns
+them, straight into plain Python values.
+
+The boto3 resource layer turns every number into a Decimal, which the
+services then converted again through str() into Decimal sums and float
+fields. Here a number becomes a float where the models declare one (the
+amount fields) and an int or float elsewhere, and amounts can be read as
+fixed-point integers for exact sums, without any Decimal in between.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from pydantic import TypeAdapter
+
+from app.models import AssetBase, LiabilityBase
+
+
+# Fixed-point amounts are integers of millionths
+FIXED_DIGITS = 6
+FIXED_SCALE = 10 ** FIXED_DIGITS
+
+# kind -> (adapter for a list of the model, amount attribute). Validating a
+# whole list in one call is much cheaper than building a model per item.
+MODELS = {
+    "asset": (TypeAdapter(list[AssetBase]), "asset_value"),
+    "liability": (TypeAdapter(list[LiabilityBase]), "liability_value"),
+}
+FLOAT_FIELDS = frozenset(field for _, field in MODELS.values())
+
+
+def _number(raw: str):
+    if "." in raw or "e" in raw or "E" in raw:
+        return float(raw)
+    return int(raw)
+
+
+def decode_value(value: dict):
+    """
+    Decodes one attribute value, e.g. {"S": "x"} or {"L": [...]}.
+    """
+    (tag, raw), = value.items()
+    if tag == "S":
+        return raw
+    if tag == "N":
+        return _number(raw)
+    if tag == "M":
+        return decode_item(raw)
+    if tag == "L":
+        return [decode_value(v) for v in raw]
+    if tag == "NULL":
+        return None
+    if tag in ("BOOL", "B"):
+        return raw
+    if tag == "SS" or tag == "BS":
+        return set(raw)
+    if tag == "NS":
+        return {_number(v) for v in raw}
+    raise ValueError(f"Unknown DynamoDB type {tag}")
+
+
+def decode_item(item: dict) -> dict:
+    """
+    Decodes an item; amount fields become floats, as the models declare them.
+    """
+    decoded = {}
+    for name, value in item.items():
+        if "S" in value:
+            decoded[name] = value["S"]
+        elif "N" in value and name in FLOAT_FIELDS:
+            decoded[name] = float(value["N"])
+        else:
+            decoded[name] = decode_value(value)
+    return decoded
+
+
+def to_fixed(raw: str) -> int:
+    """
+    Parses a DynamoDB number string into millionths, exactly for up to six
+    decimals and rounded half to even beyond.
+    """
+    whole, _, fraction = raw.partition(".")
+    if len(fraction) > FIXED_DIGITS or "e" in raw or "E" in raw:
+        return int((Decimal(raw) * FIXED_SCALE).to_integral_value(ROUND_HALF_EVEN))
+    digits = whole + fraction.ljust(FIXED_DIGITS, "0")
+    return int(digits)
+
+
+def from_fixed(value: int) -> float:
+    return value / FIXED_SCALE
+
+
+def decode_holdings(kind: str, items: list) -> tuple:
+    """
+    Maps raw asset or liability items to (models, total amount in millionths).
+    """
+    adapter, amount_field = MODELS[kind]
+    amounts = [item[amount_field]["N"] for item in items]
+    holdings = adapter.validate_python([
+        {"category": item["category"]["S"], "title": item["title"]["S"], amount_field: float(amount)}
+        for item, amount in zip(items, amounts)
+    ])
+    return holdings, sum(map(to_fixed, amounts))
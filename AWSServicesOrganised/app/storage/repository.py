@@ -0,0 +1,353 @@
+"""
+Where assets and liabilities are stored, behind one set of functions the
+services call with the user's DynamoDB resource (writes) or low-level
+client (reads).
+
+Two layouts are supported, selected with STORAGE_LAYOUT:
+
+- "tables": DynamoDB_ASSET_DETAILS_TABLE and DynamoDB_LIABILITY_DETAILS_TABLE,
+  keyed by the item id and listed through their UserSubIndex GSI.
+- "single": DynamoDB_PORTFOLIO_TABLE keyed by PK=USER#{sub} and
+  SK=ASSET#{id} / LIAB#{id}. A list, an owner-scoped get or a whole
+  portfolio is one base-table query, and writes pay for no GSI.
+
+Items keep the same attributes in both layouts; the single table adds PK
+and SK, which are stripped again on read.
+
+Writes go through the boto3 resource layer. Reads take a low-level client,
+which leaves attribute values as DynamoDB returned them, send query requests
+built once at import, and hand back either those raw values (query_raw,
+query_portfolio_raw) or items decoded by app.storage.codec, so no number
+passes through Decimal on the way.
+
+Migrating online from tables to single:
+1. Create the single table and set STORAGE_DUAL_WRITE=true. Writes and
+   deletes now go to both layouts.
+2. Run python -m app.storage.backfill to copy the existing items.
+3. Set STORAGE_LAYOUT=single with STORAGE_DUAL_READ=true. Reads come from
+   the single table, merged with anything only the old tables still have
+   (counted in app_storage_dual_read_misses_total).
+4. Once that counter stays at zero, turn dual reads off, and dual writes
+   once rolling back is no longer wanted.
+Dual reads need dual writes on, or items deleted from one layout would
+reappear from the other.
+
+Every request is scoped to the verified user here, not by the credentials:
+with DATA_ACCESS_MODE=pooled the client can reach every user's items. The
+single table is keyed by the sub; in the tables layout index queries also
+filter on it, gets check it and deletes are conditional on it. Batched
+deletes only take ids read from the user's own items.
+"""
+import logging
+import contextlib
+
+from typing import Callable, Iterator
+
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+from app import clients, write_coalescer
+from app.clients import POOLED
+from app.storage import codec
+from app.metrics.registry import Counter
+from app.config import (DynamoDB_ASSET_DETAILS_TABLE, DynamoDB_LIABILITY_DETAILS_TABLE, DynamoDB_PORTFOLIO_TABLE,
+                        STORAGE_LAYOUT, STORAGE_DUAL_WRITE, STORAGE_DUAL_READ, WRITE_COALESCING)
+
+
+logger = logging.getLogger(__name__)
+
+TABLES, SINGLE = "tables", "single"
+# kind -> (table in the tables layout, id attribute, sort key prefix in the single table)
+KINDS = {
+    "asset": (DynamoDB_ASSET_DETAILS_TABLE, "asset_id", "ASSET#"),
+    "liability": (DynamoDB_LIABILITY_DETAILS_TABLE, "liability_id", "LIAB#"),
+}
+
+DUAL_READ_MISSES = Counter(
+    "app_storage_dual_read_misses_total",
+    "Items only found in the secondary storage layout while dual reads are on.",
+    ("kind",),
+)
+SECONDARY_WRITE_ERRORS = Counter(
+    "app_storage_secondary_write_errors_total",
+    "Dual writes that reached the primary storage layout but failed on the secondary one.",
+    ("kind", "operation"),
+)
+
+if STORAGE_DUAL_READ and not STORAGE_DUAL_WRITE:
+    logger.warning("STORAGE_DUAL_READ is on without STORAGE_DUAL_WRITE; deleted items may reappear from the other layout")
+
+
+def single_table() -> bool:
+    """
+    Whether reads are served from the single table.
+    """
+    return STORAGE_LAYOUT == SINGLE
+
+
+def _secondary() -> str:
+    return TABLES if single_table() else SINGLE
+
+
+def _written_layouts() -> list:
+    # Primary first
+    primary = SINGLE if single_table() else TABLES
+    return [primary, _secondary()] if STORAGE_DUAL_WRITE else [primary]
+
+
+def partition_key(sub: str) -> str:
+    return f"USER#{sub}"
+
+
+def sort_key(kind: str, item_id: str) -> str:
+    return KINDS[kind][2] + item_id
+
+
+def _kind_of(sk: str) -> str:
+    return next((kind for kind, (_, _, prefix) in KINDS.items() if sk.startswith(prefix)), None)
+
+
+def _from_single(item: dict) -> dict:
+    return {name: value for name, value in item.items() if name not in ("PK", "SK")}
+
+
+def _target(layout: str, kind: str, item: dict) -> tuple:
+    table, id_field, _ = KINDS[kind]
+    if layout == SINGLE:
+        return DynamoDB_PORTFOLIO_TABLE, dict(item, PK=partition_key(item["sub"]), SK=sort_key(kind, item[id_field]))
+    return table, item
+
+
+def _key(layout: str, kind: str, current_user: dict, item_id: str) -> tuple:
+    table, id_field, _ = KINDS[kind]
+    if layout == SINGLE:
+        return DynamoDB_PORTFOLIO_TABLE, {"PK": partition_key(current_user["sub"]), "SK": sort_key(kind, item_id)}
+    return table, {id_field: item_id}
+
+
+def write_targets(kind: str, item: dict) -> list:
+    """
+    Returns (table, item) for every layout a new item is written to, primary first.
+    """
+    return [_target(layout, kind, item) for layout in _written_layouts()]
+
+
+def put_item(dynamodb, kind: str, item: dict):
+    """
+    Writes a new item of the user. Failures on the secondary layout are logged and counted, not raised.
+    """
+    for i, (table, target) in enumerate(write_targets(kind, item)):
+        try:
+            if WRITE_COALESCING:
+                # Pooled credentials are the same for every user, so their creates share batches
+                group = POOLED if clients.pooled_access() else item["identity_id"]
+                write_coalescer.put(dynamodb, table, target, group)
+            else:
+                dynamodb.Table(table).put_item(Item=target)
+        except Exception as e:
+            if i == 0:
+                raise
+            SECONDARY_WRITE_ERRORS.inc((kind, "put"))
+            logger.error("Secondary write of %s to %s failed: %s", kind, table, e)
+
+
+def delete_item(dynamodb, kind: str, current_user: dict, item_id: str):
+    """
+    Deletes one item of the user from every written layout. Items of other
+    users are left alone, as are ids that do not exist.
+    """
+    for i, layout in enumerate(_written_layouts()):
+        table, key = _key(layout, kind, current_user, item_id)
+        try:
+            if layout == SINGLE:
+                dynamodb.Table(table).delete_item(Key=key)
+            else:
+                # The single table's key carries the owner; here the condition does
+                dynamodb.Table(table).delete_item(Key=key, ConditionExpression=Attr("sub").eq(current_user["sub"]))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                continue
+            if i == 0:
+                raise
+            SECONDARY_WRITE_ERRORS.inc((kind, "delete"))
+            logger.error("Secondary delete of %s %s failed: %s", kind, item_id, e)
+
+
+def delete_items(dynamodb, kind: str, current_user: dict, item_ids, progress: Callable = None) -> int:
+    """
+    Deletes items of the user with batched deletes in every written layout.
+    progress(deleted) is called after each item; an exception it raises
+    stops the deletion once the queued deletes are flushed.
+    """
+    deleted = 0
+    with contextlib.ExitStack() as stack:
+        writers = {}
+        for item_id in item_ids:
+            for layout in _written_layouts():
+                table, key = _key(layout, kind, current_user, item_id)
+                if table not in writers:
+                    writers[table] = stack.enter_context(dynamodb.Table(table).batch_writer())
+                writers[table].delete_item(Key=key)
+            deleted += 1
+            if progress is not None:
+                progress(deleted)
+    return deleted
+
+
+def _wire_key(key: dict) -> dict:
+    # Every key attribute of both layouts is a string
+    return {name: {"S": value} for name, value in key.items()}
+
+
+def _get(layout: str, client, kind: str, current_user: dict, item_id: str) -> dict:
+    table, key = _key(layout, kind, current_user, item_id)
+    item = client.get_item(TableName=table, Key=_wire_key(key)).get("Item")
+    if item is None:
+        return None
+    item = codec.decode_item(item)
+    if layout == SINGLE:
+        return _from_single(item)
+    # Keyed by the item id alone, so the owner is checked here
+    return item if item.get("sub") == current_user["sub"] else None
+
+
+def get_item(client, kind: str, current_user: dict, item_id: str) -> dict:
+    """
+    Returns one item of the user, or None, also for items of other users.
+    """
+    item = _get(STORAGE_LAYOUT, client, kind, current_user, item_id)
+    if item is None and STORAGE_DUAL_READ:
+        item = _get(_secondary(), client, kind, current_user, item_id)
+        if item is not None:
+            DUAL_READ_MISSES.inc((kind,))
+    return item
+
+
+def _projection(names: tuple, key_names: dict) -> dict:
+    aliases = {f"#p{i}": name for i, name in enumerate(names)}
+    return {"ProjectionExpression": ", ".join(aliases), "ExpressionAttributeNames": {**aliases, **key_names}}
+
+
+def _listed_fields(kind: str) -> tuple:
+    # What the list, portfolio and export responses use; owner attributes stay behind
+    return KINDS[kind][1], "category", "title", codec.MODELS[kind][1], "created_at"
+
+
+def _build_queries() -> dict:
+    queries = {}
+    for kind, (table, _, _) in KINDS.items():
+        queries[TABLES, kind] = {
+            "TableName": table,
+            "IndexName": "UserSubIndex",
+            "KeyConditionExpression": "#pk = :pk",
+            **_projection(_listed_fields(kind), {"#pk": "username"}),
+        }
+        # With pooled credentials only the request scopes the user, so the index query checks the sub as well
+        queries[TABLES, kind, POOLED] = {
+            **queries[TABLES, kind],
+            "FilterExpression": "#owner = :owner",
+            "ExpressionAttributeNames": {**queries[TABLES, kind]["ExpressionAttributeNames"], "#owner": "sub"},
+        }
+        queries[SINGLE, kind] = {
+            "TableName": DynamoDB_PORTFOLIO_TABLE,
+            "KeyConditionExpression": "#pk = :pk AND begins_with(#sk, :prefix)",
+            **_projection(_listed_fields(kind), {"#pk": "PK", "#sk": "SK"}),
+        }
+    return queries
+
+
+# Query requests are built once; a call only adds its ExpressionAttributeValues
+_QUERIES = _build_queries()
+_PORTFOLIO_QUERY = {
+    "TableName": DynamoDB_PORTFOLIO_TABLE,
+    "KeyConditionExpression": "#pk = :pk",
+    **_projection(tuple(dict.fromkeys(["SK", *(f for kind in KINDS for f in _listed_fields(kind))])), {"#pk": "PK"}),
+}
+
+
+def _pages(client, query: dict) -> Iterator[dict]:
+    while True:
+        response = client.query(**query)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _query(layout: str, client, kind: str, current_user: dict, page_size: int = None) -> Iterator[dict]:
+    if layout == SINGLE:
+        values = {":pk": {"S": partition_key(current_user["sub"])}, ":prefix": {"S": KINDS[kind][2]}}
+        query = _QUERIES[layout, kind]
+    elif clients.pooled_access():
+        values = {":pk": {"S": current_user["username"]}, ":owner": {"S": current_user["sub"]}}
+        query = _QUERIES[layout, kind, POOLED]
+    else:
+        values = {":pk": {"S": current_user["username"]}}
+        query = _QUERIES[layout, kind]
+    query = dict(query, ExpressionAttributeValues=values)
+    if page_size:
+        query["Limit"] = page_size
+    return _pages(client, query)
+
+
+def _merge_secondary(client, kind: str, current_user: dict, seen: set, page_size: int = None) -> Iterator[dict]:
+    id_field = KINDS[kind][1]
+    for item in _query(_secondary(), client, kind, current_user, page_size):
+        if item[id_field]["S"] not in seen:
+            DUAL_READ_MISSES.inc((kind,))
+            yield item
+
+
+def query_raw(client, kind: str, current_user: dict, page_size: int = None) -> Iterator[dict]:
+    """
+    Yields every item of one kind of the user, a page at a time, as the
+    attribute values DynamoDB returned (decode with app.storage.codec).
+    """
+    id_field = KINDS[kind][1]
+    seen = set()
+    for item in _query(STORAGE_LAYOUT, client, kind, current_user, page_size):
+        if STORAGE_DUAL_READ:
+            seen.add(item[id_field]["S"])
+        yield item
+    if STORAGE_DUAL_READ:
+        yield from _merge_secondary(client, kind, current_user, seen, page_size)
+
+
+def query_items(client, kind: str, current_user: dict, page_size: int = None) -> Iterator[dict]:
+    """
+    Yields every item of one kind of the user, a page at a time.
+    """
+    return map(codec.decode_item, query_raw(client, kind, current_user, page_size))
+
+
+def query_portfolio_raw(client, current_user: dict, page_size: int = None) -> Iterator[tuple]:
+    """
+    Yields (kind, attribute values) for every asset, then every liability, of
+    the user. In the single table that is one query over the user's partition.
+    """
+    if not single_table():
+        for kind in KINDS:
+            yield from ((kind, item) for item in query_raw(client, kind, current_user, page_size))
+        return
+
+    query = dict(_PORTFOLIO_QUERY, ExpressionAttributeValues={":pk": {"S": partition_key(current_user["sub"])}})
+    if page_size:
+        query["Limit"] = page_size
+    seen = set()
+    # Sort keys order ASSET# before LIAB#
+    for item in _pages(client, query):
+        kind = _kind_of(item["SK"]["S"])
+        if kind is not None:
+            seen.add(item[KINDS[kind][1]]["S"])
+            yield kind, item
+    if STORAGE_DUAL_READ:
+        for kind in KINDS:
+            yield from ((kind, item) for item in _merge_secondary(client, kind, current_user, seen, page_size))
+
+
+def query_portfolio(client, current_user: dict, page_size: int = None) -> Iterator[tuple]:
+    """
+    Yields (kind, item) for every asset, then every liability, of the user.
+    """
+    for kind, item in query_portfolio_raw(client, current_user, page_size):
+        yield kind, _from_single(codec.decode_item(item))
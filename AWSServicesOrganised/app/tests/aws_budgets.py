@@ -0,0 +1,67 @@
+"""
+Per-route AWS call budgets.
+
+Each route lists the most calls it may make per request, as
+"service:Operation" -> count. "service:*" caps all operations of a service.
+Operations that are not listed are not allowed at all. "warm" is the budget
+for a repeat request by the same user, and defaults to "cold".
+"""
+
+# GetId only runs for a user the identity map hasn't seen yet
+IDENTITY_EXCHANGE = {"cognito-identity:GetId": 1, "cognito-identity:GetCredentialsForIdentity": 1}
+
+BUDGETS = {
+    "POST /auth/signup": {"cold": {"cognito-identity-provider:ListUsers": 1, "cognito-identity-provider:SignUp": 1}},
+    "POST /auth/signin": {"cold": {"cognito-identity-provider:InitiateAuth": 1}},
+    "POST /asset/": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:PutItem": 1}, "warm": {"dynamodb:PutItem": 1}},
+    "GET /asset/": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:Query": 1}, "warm": {"dynamodb:Query": 1}},
+    "GET /asset/{asset_id}": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:GetItem": 1}, "warm": {"dynamodb:GetItem": 1}},
+    "DELETE /asset/{asset_id}": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:DeleteItem": 1}, "warm": {"dynamodb:DeleteItem": 1}},
+    "POST /liability/": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:PutItem": 1}, "warm": {"dynamodb:PutItem": 1}},
+    "GET /liability/": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:Query": 1}, "warm": {"dynamodb:Query": 1}},
+    "GET /liability/{liability_id}": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:GetItem": 1}, "warm": {"dynamodb:GetItem": 1}},
+    "DELETE /liability/{liability_id}": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:DeleteItem": 1}, "warm": {"dynamodb:DeleteItem": 1}},
+    "GET /portfolio/": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:Query": 2}, "warm": {"dynamodb:Query": 2}},
+    # One Query per page of each table; the test user fits in one page
+    "GET /portfolio/export": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:Query": 2}, "warm": {"dynamodb:Query": 2}},
+    "POST /portfolio/import": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:BatchWriteItem": 1}, "warm": {"dynamodb:BatchWriteItem": 1}},
+    "GET /user/profile": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:GetItem": 1}, "warm": {}},
+    "GET /user/profile/picture": {"cold": {**IDENTITY_EXCHANGE, "dynamodb:GetItem": 1}, "warm": {}},
+    "GET /admin/users": {"cold": {**IDENTITY_EXCHANGE, "cognito-identity-provider:ListUsers": 1},
+                         "warm": {"cognito-identity-provider:ListUsers": 1}},
+}
+
+# (route, phase, calls, violations) collected while the tests run
+REPORT = []
+
+
+def check(route: str, phase: str, calls: dict) -> list:
+    """
+    Returns the budget violations for the calls one request made.
+    """
+    budgets = BUDGETS[route]
+    budget = budgets.get(phase, budgets["cold"])
+    violations = []
+    per_service = {}
+    for (service, operation), count in calls.items():
+        per_service[service] = per_service.get(service, 0) + count
+        limit = budget.get(f"{service}:{operation}")
+        if limit is None and f"{service}:*" not in budget:
+            violations.append(f"{service}:{operation} x{count} is not budgeted")
+        elif limit is not None and count > limit:
+            violations.append(f"{service}:{operation} x{count} exceeds {limit}")
+    for key, limit in budget.items():
+        service, operation = key.split(":")
+        if operation == "*" and per_service.get(service, 0) > limit:
+            violations.append(f"{service}:* x{per_service[service]} exceeds {limit}")
+    REPORT.append((route, phase, dict(calls), violations))
+    return violations
+
+
+def format_report() -> list:
+    lines = []
+    for route, phase, calls, violations in REPORT:
+        summary = ", ".join(f"{s}:{o} x{n}" for (s, o), n in sorted(calls.items())) or "no AWS calls"
+        status = "OVER BUDGET: " + "; ".join(violations) if violations else "ok"
+        lines.append(f"{route:<34}{phase:<6}{summary}  [{status}]")
+    return lines
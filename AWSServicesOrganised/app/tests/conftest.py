@@ -6,9 +6,33 @@ from httpx import AsyncClient, ASGITransport
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
+from benchmarks.harness import configure_environment, start_fake_aws, stop_fake_aws
+
+configure_environment()
+
 from app.main import app
+from app import cache
+from app.tests import aws_budgets
 
 @pytest_asyncio.fixture
 async def async_test_client():
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
         yield client
+
+@pytest.fixture
+def fake_aws():
+    """
+    Routes every AWS call to in-process fakes and verifies real ID tokens.
+    """
+    app.dependency_overrides.clear()
+    for c in cache.all_caches().values():
+        c.clear()
+    fake = start_fake_aws()
+    yield fake
+    stop_fake_aws(fake)
+
+def pytest_terminal_summary(terminalreporter):
+    if aws_budgets.REPORT:
+        terminalreporter.write_sep("-", "AWS calls per route")
+        for line in aws_budgets.format_report():
+            terminalreporter.write_line(line)
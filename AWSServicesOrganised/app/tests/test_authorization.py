@@ -0,0 +1,95 @@
+import uuid
+
+import pytest
+
+from app import clients, config
+from app.metrics import aws as aws_metrics
+from app.storage import repository as storage
+from app.tests.test_jobs import wait_for_job
+from benchmarks.harness import seed_user, auth_headers
+
+
+@pytest.fixture(params=[("identity", "tables"), ("identity", "single"), ("pooled", "tables"), ("pooled", "single")],
+                ids=lambda p: "-".join(p))
+def access(request, mocker):
+    mode, layout = request.param
+    mocker.patch.object(clients, "DATA_ACCESS_MODE", mode)
+    mocker.patch.object(storage, "STORAGE_LAYOUT", layout)
+    return mode, layout
+
+
+async def create_holdings(client, user: dict) -> dict:
+    await client.post("/asset/", headers=auth_headers(user), json={"category": "stocks", "title": "mine", "asset_value": 10})
+    await client.post("/liability/", headers=auth_headers(user), json={"category": "loan", "title": "mine", "liability_value": 4})
+    assets = (await client.get("/asset/", headers=auth_headers(user))).json()
+    liabilities = (await client.get("/liability/", headers=auth_headers(user))).json()
+    return {"asset": assets[0]["asset_id"], "liability": liabilities[0]["liability_id"]}
+
+
+@pytest.mark.asyncio
+async def test_users_cannot_reach_each_others_items(async_test_client, fake_aws, access):
+    """
+    Test that another user can neither read, list, export nor delete a user's assets and liabilities.
+    """
+    owner = seed_user(fake_aws, "owner")
+    intruder = seed_user(fake_aws, "intruder")
+    ids = await create_holdings(async_test_client, owner)
+
+    for kind, item_id in ids.items():
+        response = await async_test_client.get(f"/{kind}/{item_id}", headers=auth_headers(intruder))
+        assert response.status_code == 404
+        await async_test_client.delete(f"/{kind}/{item_id}", headers=auth_headers(intruder))
+    job_id = (await async_test_client.delete("/liability/", headers=auth_headers(intruder))).json()["job_id"]
+    assert (await wait_for_job(async_test_client, intruder, job_id))["result"] == {"deleted": 0}
+
+    assert (await async_test_client.get("/asset/", headers=auth_headers(intruder))).json() == []
+    assert (await async_test_client.get("/liability/", headers=auth_headers(intruder))).json() == []
+    portfolio = (await async_test_client.get("/portfolio/", headers=auth_headers(intruder))).json()
+    assert portfolio["net_worth"] == 0 and portfolio["assets"] == []
+    export = await async_test_client.get("/portfolio/export?format=ndjson", headers=auth_headers(intruder))
+    assert export.text == ""
+
+    for kind, item_id in ids.items():
+        response = await async_test_client.get(f"/{kind}/{item_id}", headers=auth_headers(owner))
+        assert response.status_code == 200
+    assert (await async_test_client.get("/portfolio/", headers=auth_headers(owner))).json()["net_worth"] == 6
+
+
+@pytest.mark.asyncio
+async def test_pooled_index_queries_are_scoped_by_sub(async_test_client, fake_aws, mocker):
+    """
+    Test that in pooled mode an item carrying the user's username but someone else's sub is not listed.
+    """
+    mocker.patch.object(clients, "DATA_ACCESS_MODE", "pooled")
+    user = seed_user(fake_aws, "pooled-user")
+    fake_aws.dynamodb.put(config.DynamoDB_ASSET_DETAILS_TABLE, {
+        "asset_id": {"S": str(uuid.uuid4())}, "username": {"S": "pooled-user"}, "sub": {"S": "someone-else"},
+        "category": {"S": "stocks"}, "title": {"S": "foreign"}, "asset_value": {"N": "1"},
+    })
+
+    response = await async_test_client.get("/asset/", headers=auth_headers(user))
+
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_pooled_hot_paths_make_no_cognito_identity_calls(async_test_client, fake_aws, mocker):
+    """
+    Test that in pooled mode reads never call Cognito Identity, and creates look the identity id up once per user.
+    """
+    mocker.patch.object(clients, "DATA_ACCESS_MODE", "pooled")
+    user = seed_user(fake_aws, "hot-user", holdings=2)
+    asset_id = fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE)[0]["asset_id"]["S"]
+
+    with aws_metrics.record_calls() as calls:
+        for path in ("/asset/", f"/asset/{asset_id}", "/liability/", "/portfolio/", "/portfolio/export"):
+            response = await async_test_client.get(path, headers=auth_headers(user))
+            assert response.status_code == 200
+    assert not [call for call in calls if call[0] == "cognito-identity"]
+
+    with aws_metrics.record_calls() as calls:
+        for i in range(3):
+            await async_test_client.post("/asset/", headers=auth_headers(user), json={"category": "cash", "title": f"n{i}", "asset_value": 1})
+    assert {call: n for call, n in calls.items() if call[0] == "cognito-identity"} == {("cognito-identity", "GetId"): 1}
+    created = [item for item in fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE) if item["title"]["S"].startswith("n")]
+    assert {item["identity_id"]["S"] for item in created} == {user["identity_id"]}
@@ -0,0 +1,139 @@
+import json
+import time
+
+import boto3
+import pytest
+
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError
+from fastapi import HTTPException
+
+from app import aws_breakers, aws_policy
+
+
+class RawBody:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+@pytest.fixture
+def dynamodb(mocker):
+    mocker.patch("botocore.endpoint.time.sleep")
+    mocker.patch.dict(aws_breakers._breakers, {"dynamodb": aws_breakers.CircuitBreaker("dynamodb", failure_threshold=3, reset_timeout=60)})
+    mocker.patch.dict(aws_breakers._bulkheads, {"dynamodb": aws_breakers.Bulkhead(2, wait=0.01)})
+    client = boto3.client("dynamodb", region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="y",
+                          config=Config(retries={"max_attempts": 0}))
+    aws_breakers.install(client.meta.events)
+    return client
+
+
+def timing_out(request, **kwargs):
+    raise ConnectTimeoutError(endpoint_url=request.url)
+
+
+def test_circuit_opens_after_consecutive_failures_and_fails_fast(dynamodb):
+    """
+    Test that once the threshold of timeouts is reached, calls fail without reaching the network and map to a 503.
+    """
+    attempts = []
+    dynamodb.meta.events.register("before-send.dynamodb.GetItem", lambda request, **kwargs: attempts.append(request) or timing_out(request))
+
+    for _ in range(3):
+        with pytest.raises(ConnectTimeoutError):
+            dynamodb.get_item(TableName="t", Key={"id": {"S": "1"}})
+    with pytest.raises(aws_breakers.DependencyUnavailable) as error:
+        dynamodb.get_item(TableName="t", Key={"id": {"S": "1"}})
+
+    assert len(attempts) == 3
+    assert aws_breakers._breakers["dynamodb"].state == aws_breakers.OPEN
+    assert aws_breakers._bulkheads["dynamodb"].in_use == 0
+    with pytest.raises(HTTPException) as http_error:
+        aws_policy.raise_if_throttled(error.value)
+    assert http_error.value.status_code == 503
+    assert int(http_error.value.headers["Retry-After"]) > 0
+
+
+def test_error_answers_below_500_keep_the_circuit_closed(dynamodb):
+    """
+    Test that client errors such as a missing table do not count as the dependency failing.
+    """
+    body = json.dumps({"__type": "com.amazonaws.dynamodb.v20120810#ResourceNotFoundException", "message": "no table"}).encode()
+    dynamodb.meta.events.register("before-send.dynamodb.GetItem", lambda request, **kwargs: AWSResponse(request.url, 400, {}, RawBody(body)))
+
+    for _ in range(5):
+        with pytest.raises(ClientError):
+            dynamodb.get_item(TableName="t", Key={"id": {"S": "1"}})
+
+    assert aws_breakers._breakers["dynamodb"].state == aws_breakers.CLOSED
+
+
+def test_trial_call_after_the_reset_timeout_closes_the_circuit(mocker):
+    """
+    Test that an open circuit lets one trial through after the reset timeout, and closes when it succeeds.
+    """
+    breaker = aws_breakers.CircuitBreaker("dynamodb", failure_threshold=3, reset_timeout=60)
+    for _ in range(3):
+        breaker.record(False)
+    assert not breaker.allow()
+
+    mocker.patch("app.aws_breakers.time.monotonic", return_value=time.monotonic() + 61)
+    assert breaker.allow()
+    assert breaker.state == aws_breakers.HALF_OPEN
+    # Only one trial at a time
+    assert not breaker.allow()
+
+    breaker.record(True)
+    assert breaker.state == aws_breakers.CLOSED
+    assert breaker.allow()
+
+
+def test_full_bulkhead_fails_fast():
+    """
+    Test that a call beyond the bulkhead's limit is refused after the short wait instead of queueing.
+    """
+    bulkhead = aws_breakers.Bulkhead(1, wait=0.01)
+    assert bulkhead.acquire()
+
+    started = time.monotonic()
+    assert not bulkhead.acquire()
+    assert time.monotonic() - started < 0.5
+
+    bulkhead.release()
+    assert bulkhead.acquire()
+    assert bulkhead.in_use == 1
+
+
+def test_clients_get_tight_timeouts():
+    """
+    Test that every dependency's clients are built with its connect and read timeouts.
+    """
+    for name in aws_breakers.DEFAULT_READ_TIMEOUTS:
+        config = Config(**aws_breakers.client_config(name))
+        assert config.connect_timeout == aws_breakers.AWS_CONNECT_TIMEOUT
+        assert config.read_timeout == aws_breakers.READ_TIMEOUTS[name]
+
+
+def test_admin_cognito_clients_get_timeouts_and_breakers(fake_aws, mocker):
+    """
+    Test that an admin's repeat requests reuse one credential exchange and client, built with the dependency's timeouts and breaker.
+    """
+    from starlette.requests import Request
+
+    from app.admin import utils as admin_utils
+    from benchmarks.harness import seed_user
+
+    admin = seed_user(fake_aws, "breaker-admin", groups=["admin"])
+    request = Request({"type": "http", "headers": [(b"cookie", f"id_token={admin['id_token']}".encode())]})
+
+    client = admin_utils.get_admin_cognito_client(request)
+
+    assert client is admin_utils.get_admin_cognito_client(request)
+    assert fake_aws.calls[("cognito-identity", "GetCredentialsForIdentity")] == 1
+    assert client.meta.config.read_timeout == aws_breakers.READ_TIMEOUTS["cognito-idp"]
+    mocker.patch.object(aws_breakers._breakers["cognito-idp"], "allow", return_value=False)
+    with pytest.raises(aws_breakers.DependencyUnavailable):
+        client.list_users(UserPoolId="pool")
@@ -0,0 +1,51 @@
+import pytest
+
+from app import config
+from app.metrics import aws as aws_metrics
+from app.tests import aws_budgets
+from app.user import presign
+from app.user import service as user_service
+from benchmarks.harness import seed_user, auth_headers
+
+
+def first_id(fake, table: str, id_field: str) -> str:
+    return fake.dynamodb.items(table)[0][id_field]["S"]
+
+
+REQUESTS = {
+    "POST /auth/signup": lambda fake, user: ("POST", "/auth/signup", {"json": {"username": "newuser", "password": "Bench@12345", "email": "new@example.com"}}),
+    "POST /auth/signin": lambda fake, user: ("POST", "/auth/signin", {"json": {"username": user["Username"], "password": "Bench@12345"}}),
+    "POST /asset/": lambda fake, user: ("POST", "/asset/", {"json": {"category": "stocks", "title": "t", "asset_value": 1.5}}),
+    "GET /asset/": lambda fake, user: ("GET", "/asset/", {}),
+    "GET /asset/{asset_id}": lambda fake, user: ("GET", f"/asset/{first_id(fake, config.DynamoDB_ASSET_DETAILS_TABLE, 'asset_id')}", {}),
+    "DELETE /asset/{asset_id}": lambda fake, user: ("DELETE", "/asset/missing", {}),
+    "POST /liability/": lambda fake, user: ("POST", "/liability/", {"json": {"category": "loan", "title": "t", "liability_value": 1.5}}),
+    "GET /liability/": lambda fake, user: ("GET", "/liability/", {}),
+    "GET /liability/{liability_id}": lambda fake, user: ("GET", f"/liability/{first_id(fake, config.DynamoDB_LIABILITY_DETAILS_TABLE, 'liability_id')}", {}),
+    "DELETE /liability/{liability_id}": lambda fake, user: ("DELETE", "/liability/missing", {}),
+    "GET /portfolio/": lambda fake, user: ("GET", "/portfolio/", {}),
+    "GET /portfolio/export": lambda fake, user: ("GET", "/portfolio/export", {}),
+    "POST /portfolio/import": lambda fake, user: ("POST", "/portfolio/import", {"files": {"file": ("holdings.csv", b"kind,category,title,value\nasset,stocks,t,1.5\n", "text/csv")}}),
+    "GET /user/profile": lambda fake, user: ("GET", "/user/profile", {}),
+    "GET /user/profile/picture": lambda fake, user: ("GET", "/user/profile/picture", {}),
+    "GET /admin/users": lambda fake, user: ("GET", "/admin/users", {}),
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("route", list(aws_budgets.BUDGETS))
+async def test_route_stays_within_aws_call_budget(async_test_client, fake_aws, route):
+    """
+    Test that a cold and a warm request each stay within the route's AWS call budget.
+    """
+    user_service._profile_cache.clear()
+    presign.invalidate_profile_picture_url("budget-user")
+    user = seed_user(fake_aws, "budget-user", holdings=2, groups=["admin"])
+    method, path, kwargs = REQUESTS[route](fake_aws, user)
+
+    for phase in ("cold", "warm"):
+        with aws_metrics.record_calls() as calls:
+            response = await async_test_client.request(method, path, headers=auth_headers(user), **kwargs)
+        assert response.status_code < 500, response.text
+        violations = aws_budgets.check(route, phase, calls)
+        assert not violations, f"{route} ({phase}): " + "; ".join(violations)
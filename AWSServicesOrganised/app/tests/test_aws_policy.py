@@ -0,0 +1,95 @@
+import json
+
+import boto3
+import pytest
+
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+
+from app import aws_policy
+from app.config import AWS_THROTTLE_MAX_ATTEMPTS
+
+
+class RawBody:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def throttled_then_ok(throttled_attempts: int):
+    """
+    A before-send hook answering the first attempts with DynamoDB throttling errors.
+    """
+    attempts = []
+
+    def handler(request, **kwargs):
+        attempts.append(request)
+        if len(attempts) <= throttled_attempts:
+            body = {"__type": "com.amazonaws.dynamodb.v20120810#ProvisionedThroughputExceededException", "message": "slow down"}
+            return AWSResponse(request.url, 400, {}, RawBody(json.dumps(body).encode()))
+        return AWSResponse(request.url, 200, {}, RawBody(b'{"Item": {"id": {"S": "1"}}}'))
+
+    return handler, attempts
+
+
+@pytest.fixture
+def dynamodb(mocker):
+    mocker.patch("botocore.endpoint.time.sleep")
+    client = boto3.client("dynamodb", region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="y")
+    aws_policy.install(client.meta.events)
+    return client
+
+
+def test_token_bucket_paces_beyond_its_burst():
+    """
+    Test that callers beyond the burst are told to wait for the next token.
+    """
+    bucket = aws_policy.TokenBucket(rate=10, capacity=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+
+def test_retry_delays_use_decorrelated_jitter():
+    """
+    Test that each delay lies between the base and three times the previous delay, within the cap.
+    """
+    previous = 0.0
+    for _ in range(20):
+        delay = aws_policy.retry_delay(previous)
+        assert aws_policy.AWS_RETRY_BASE <= delay <= min(aws_policy.AWS_RETRY_CAP, max(previous, aws_policy.AWS_RETRY_BASE) * 3)
+        previous = delay
+
+
+def test_throttled_call_is_retried_until_it_succeeds(dynamodb):
+    """
+    Test that a burst of throttling errors turns into retries instead of an error.
+    """
+    handler, attempts = throttled_then_ok(2)
+    dynamodb.meta.events.register("before-send.dynamodb.GetItem", handler)
+
+    response = dynamodb.get_item(TableName="t", Key={"id": {"S": "1"}})
+
+    assert response["Item"] == {"id": {"S": "1"}}
+    assert len(attempts) == 3
+
+
+def test_throttling_stops_after_the_attempt_limit(dynamodb):
+    """
+    Test that the policy gives up after AWS_THROTTLE_MAX_ATTEMPTS and the error maps to a 429.
+    """
+    handler, attempts = throttled_then_ok(100)
+    dynamodb.meta.events.register("before-send.dynamodb.GetItem", handler)
+
+    with pytest.raises(ClientError) as error:
+        dynamodb.get_item(TableName="t", Key={"id": {"S": "1"}})
+
+    assert len(attempts) == AWS_THROTTLE_MAX_ATTEMPTS
+    with pytest.raises(HTTPException) as http_error:
+        aws_policy.raise_if_throttled(error.value)
+    assert http_error.value.status_code == 429
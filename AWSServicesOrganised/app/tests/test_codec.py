@@ -0,0 +1,47 @@
+import pytest
+
+from app.storage import codec
+from benchmarks.harness import seed_user, auth_headers
+
+
+def test_decode_item_maps_attribute_values_without_decimals():
+    """
+    Test that every DynamoDB type decodes to a plain value, and amounts to floats as the models declare them.
+    """
+    item = {
+        "asset_id": {"S": "a1"}, "asset_value": {"N": "12"}, "count": {"N": "3"}, "ratio": {"N": "0.5"},
+        "active": {"BOOL": True}, "note": {"NULL": True}, "tags": {"SS": ["x", "y"]},
+        "history": {"L": [{"N": "1"}, {"M": {"title": {"S": "t"}}}]},
+    }
+
+    assert codec.decode_item(item) == {
+        "asset_id": "a1", "asset_value": 12.0, "count": 3, "ratio": 0.5, "active": True, "note": None,
+        "tags": {"x", "y"}, "history": [1, {"title": "t"}],
+    }
+    assert type(codec.decode_item(item)["asset_value"]) is float
+
+
+@pytest.mark.parametrize("raw, fixed", [
+    ("0.1", 100000), ("-2.5", -2500000), ("1000", 1000000000), ("0.0000015", 2), ("0.0000025", 2), ("1E+2", 100000000),
+])
+def test_to_fixed_parses_exactly(raw, fixed):
+    """
+    Test that number strings become millionths exactly, rounding half to even past six decimals.
+    """
+    assert codec.to_fixed(raw) == fixed
+
+
+@pytest.mark.asyncio
+async def test_portfolio_totals_are_summed_exactly(async_test_client, fake_aws):
+    """
+    Test that portfolio totals are exact sums of the stored amounts, not float sums.
+    """
+    user = seed_user(fake_aws, "codec-user")
+    for value in (0.1, 0.2):
+        await async_test_client.post("/asset/", headers=auth_headers(user), json={"category": "cash", "title": "t", "asset_value": value})
+    await async_test_client.post("/liability/", headers=auth_headers(user), json={"category": "loan", "title": "l", "liability_value": 0.3})
+
+    body = (await async_test_client.get("/portfolio/", headers=auth_headers(user))).json()
+
+    assert body["total_assets"] == 0.3 and body["net_worth"] == 0
+    assert sorted(a["asset_value"] for a in body["assets"]) == [0.1, 0.2]
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+import itertools
+
+import pytest
+
+from app.portfolio import export
+from benchmarks.harness import seed_user, auth_headers
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_walks_every_page(async_test_client, fake_aws, mocker):
+    """
+    Test that the NDJSON export returns every asset and liability, reading them page by page.
+    """
+    mocker.patch.object(export, "EXPORT_PAGE_SIZE", 2)
+    user = seed_user(fake_aws, "export-user", holdings=5)
+
+    response = await async_test_client.get("/portfolio/export?format=ndjson", headers=auth_headers(user))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"].startswith('attachment; filename="portfolio-')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["kind"] for r in rows] == ["asset"] * 5 + ["liability"] * 5
+    assert sorted(r["value"] for r in rows if r["kind"] == "asset") == [1000.5 + i for i in range(5)]
+    # 3 pages per table
+    assert fake_aws.calls[("dynamodb", "Query")] == 6
+
+
+@pytest.mark.asyncio
+async def test_csv_export_has_header_and_exact_values(async_test_client, fake_aws):
+    """
+    Test that the CSV export writes a header row and the stored decimal values unchanged.
+    """
+    user = seed_user(fake_aws, "csv-user", holdings=2)
+
+    response = await async_test_client.get("/portfolio/export?format=csv", headers=auth_headers(user))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert tuple(rows[0]) == export.COLUMNS
+    assert sorted(r["value"] for r in rows if r["kind"] == "liability") == ["250.25", "251.25"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_format_and_missing_parquet_support_are_rejected(async_test_client, fake_aws, mocker):
+    """
+    Test that an unknown format is a 422, and Parquet is a 501 when pyarrow is not installed.
+    """
+    user = seed_user(fake_aws, "format-user", holdings=1)
+
+    response = await async_test_client.get("/portfolio/export?format=xlsx", headers=auth_headers(user))
+    assert response.status_code == 422
+
+    mocker.patch.object(export, "pyarrow", None)
+    response = await async_test_client.get("/portfolio/export?format=parquet", headers=auth_headers(user))
+    assert response.status_code == 501
+    assert fake_aws.calls[("dynamodb", "Query")] == 0
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_encoders_stream_without_consuming_all_rows(fmt):
+    """
+    Test that an encoder hands out its first chunk long before the rows run out.
+    """
+    consumed = 0
+
+    def endless_rows():
+        nonlocal consumed
+        for i in itertools.count():
+            consumed += 1
+            yield {"kind": "asset", "id": str(i), "category": "stocks", "title": f"Asset {i}", "value": i, "created_at": None}
+
+    first = next(export.export_chunks(endless_rows(), fmt))
+
+    assert len(first) >= export.CHUNK_SIZE
+    assert consumed < 5000
+
+
+def test_parquet_export_is_written_in_row_groups():
+    """
+    Test that Parquet rows come out in row groups of the configured size and read back intact.
+    """
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    rows = [{"kind": "asset", "id": str(i), "category": "stocks", "title": f"Asset {i}", "value": i, "created_at": None}
+            for i in range(25)]
+    chunks = list(export._parquet_chunks(iter(rows), row_group_size=10))
+
+    table_file = pyarrow.parquet.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert table_file.metadata.num_row_groups == 3
+    assert table_file.read().column("value").to_pylist() == [float(i) for i in range(25)]
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from app import batch_write, config
+from benchmarks.harness import seed_user, auth_headers
+
+
+def upload(content: str) -> dict:
+    return {"file": ("holdings.csv", content.encode("utf-8"), "text/csv")}
+
+
+def report(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_import_writes_valid_rows_in_batches_and_reports_the_rest(async_test_client, fake_aws):
+    """
+    Test that valid rows are batch-written, and invalid ones are reported with their line number.
+    """
+    user = seed_user(fake_aws, "import-user")
+    lines = ["kind,category,title,value"]
+    lines += [f"asset,stocks,Asset {i},{1000 + i}" for i in range(30)]
+    lines += ["liability,loan,Mortgage,250000", "asset,stocks,Broken,not-a-number", "pension,fund,Unknown,5"]
+    lines += ["asset,stocks,Undefined,nan", "liability,loan,Endless,-inf"]
+
+    response = await async_test_client.post("/portfolio/import", headers=auth_headers(user), files=upload("\n".join(lines)))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    *errors, summary = report(response)
+    assert summary == {"status": "done", "assets": 30, "liabilities": 1, "rejected": 4, "failed": 0}
+    assert [(e["row"], e["status"]) for e in errors] == [(33, "rejected"), (34, "rejected"), (35, "rejected"), (36, "rejected")]
+    assert errors[0]["errors"][0].startswith("value:")
+    assert errors[1]["errors"] == ["kind: must be one of asset, liability"]
+    assert errors[2]["errors"] == errors[3]["errors"] == ["value: Input should be a finite number"]
+    # 25 + 5 assets and 1 liability
+    assert fake_aws.calls[("dynamodb", "BatchWriteItem")] == 3
+    assets = fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE)
+    assert len(assets) == 30 and {a["sub"]["S"] for a in assets} == {user["sub"]}
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_upload_without_required_columns(async_test_client, fake_aws):
+    """
+    Test that a CSV without the required columns is a 400 before anything is written.
+    """
+    user = seed_user(fake_aws, "bad-import-user")
+
+    response = await async_test_client.post("/portfolio/import", headers=auth_headers(user), files=upload("name,amount\nx,1\n"))
+
+    assert response.status_code == 400
+    assert "kind" in response.json()["detail"]
+    assert fake_aws.calls[("dynamodb", "BatchWriteItem")] == 0
+
+
+@pytest.mark.asyncio
+async def test_exported_csv_can_be_imported_again(async_test_client, fake_aws):
+    """
+    Test that a CSV export imports back as the same number of holdings.
+    """
+    user = seed_user(fake_aws, "roundtrip-user", holdings=3)
+    exported = await async_test_client.get("/portfolio/export?format=csv", headers=auth_headers(user))
+
+    response = await async_test_client.post("/portfolio/import", headers=auth_headers(user), files=upload(exported.text))
+
+    assert report(response)[-1] == {"status": "done", "assets": 3, "liabilities": 3, "rejected": 0, "failed": 0}
+    assert len(fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE)) == 6
+
+
+class FlakyTable:
+    """
+    Leaves items unprocessed for the first rounds; with `stuck`, only items whose id is in it, for good.
+    """
+
+    def __init__(self, unprocessed_rounds: int = 0, stuck: set = None):
+        self.unprocessed_rounds = unprocessed_rounds
+        self.stuck = stuck or set()
+        self.calls = 0
+        self.written = []
+
+    def batch_write_item(self, RequestItems):
+        self.calls += 1
+        if self.calls <= self.unprocessed_rounds:
+            return {"UnprocessedItems": RequestItems}
+        unprocessed = {}
+        for table, requests in RequestItems.items():
+            # Copies, as DynamoDB returns them
+            left = [{"PutRequest": {"Item": dict(r["PutRequest"]["Item"])}} for r in requests if r["PutRequest"]["Item"]["id"] in self.stuck]
+            self.written += [r["PutRequest"]["Item"]["id"] for r in requests if r["PutRequest"]["Item"]["id"] not in self.stuck]
+            if left:
+                unprocessed[table] = left
+        return {"UnprocessedItems": unprocessed}
+
+
+def test_unprocessed_items_are_retried_then_reported(mocker):
+    """
+    Test that unprocessed items are sent again, and a batch that never gets through fails every row in it.
+    """
+    mocker.patch.object(batch_write.time, "sleep")
+    table = FlakyTable(unprocessed_rounds=2)
+    batch_write.write_batch(table, "t", [{"id": "1"}])
+    assert table.calls == 3
+
+    writer = batch_write.BatchWriter(FlakyTable(unprocessed_rounds=100))
+    for i in range(3):
+        assert writer.put("t", {"id": str(i)}, tag=i) == []
+    failures = writer.flush()
+    assert [tag for tag, _ in failures] == [0, 1, 2]
+    assert "unprocessed" in failures[0][1]
+    assert writer.written == 0
+
+
+def test_only_rows_left_unprocessed_are_reported_failed(mocker):
+    """
+    Test that when part of a batch stays unprocessed, only those rows fail and the written ones count as written.
+    """
+    mocker.patch.object(batch_write.time, "sleep")
+    table = FlakyTable(stuck={"1"})
+
+    writer = batch_write.BatchWriter(table)
+    for i in range(3):
+        writer.put("t", {"id": str(i)}, tag=i)
+    failures = writer.flush()
+
+    assert [tag for tag, _ in failures] == [1]
+    assert writer.written == 2
+    assert sorted(set(table.written)) == ["0", "2"]
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import config
+from app.jobs import service as job_service
+from app.jobs import store as job_store
+from benchmarks.harness import seed_user, auth_headers
+
+
+async def wait_for_job(client, user: dict, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = (await client.get(f"/jobs/{job_id}", headers=auth_headers(user))).json()
+        if job["status"] in job_store.FINISHED or time.monotonic() > deadline:
+            return job
+        await asyncio.sleep(0.02)
+
+
+def liabilities_of(fake, username: str) -> list:
+    return [i for i in fake.dynamodb.items(config.DynamoDB_LIABILITY_DETAILS_TABLE) if i["username"]["S"] == username]
+
+
+@pytest.mark.asyncio
+async def test_delete_all_liabilities_runs_as_a_job(async_test_client, fake_aws):
+    """
+    Test that deleting all liabilities answers 202 at once, and the job deletes only the caller's items.
+    """
+    user = seed_user(fake_aws, "job-user", holdings=30)
+    other = seed_user(fake_aws, "bystander", holdings=2)
+
+    response = await async_test_client.delete("/liability/", headers=auth_headers(user))
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["location"] == f"/jobs/{job_id}"
+    job = await wait_for_job(async_test_client, user, job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"deleted": 30} and job["done"] == job["total"] == 30
+    assert liabilities_of(fake_aws, "job-user") == []
+    assert len(liabilities_of(fake_aws, "bystander")) == 2
+    # Single-item deletes would have been 30 calls
+    assert fake_aws.calls[("dynamodb", "BatchWriteItem")] == 2
+
+    response = await async_test_client.get(f"/jobs/{job_id}", headers=auth_headers(other))
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_running_job_can_be_cancelled(async_test_client, fake_aws):
+    """
+    Test that DELETE /jobs/{id} stops a running job at its next check.
+    """
+    user = seed_user(fake_aws, "cancel-user")
+    started = threading.Event()
+
+    def slow_job(job):
+        for i in range(500):
+            started.set()
+            job.check_cancelled()
+            job.progress(i, 500)
+            time.sleep(0.01)
+        return {"finished": True}
+
+    record = job_service.submit("slow", user["sub"], slow_job)
+    await asyncio.to_thread(started.wait, 5)
+
+    response = await async_test_client.delete(f"/jobs/{record['job_id']}", headers=auth_headers(user))
+    assert response.status_code == 200 and response.json()["cancel_requested"] is True
+
+    job = await wait_for_job(async_test_client, user, record["job_id"])
+    assert job["status"] == "cancelled"
+    assert job["done"] < 500 and job["result"] is None
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_refused(async_test_client, fake_aws, mocker):
+    """
+    Test that a new job is refused with 503 once every slot is taken.
+    """
+    user = seed_user(fake_aws, "busy-user", holdings=1)
+    mocker.patch.object(job_service, "_slots", threading.Semaphore(0))
+
+    response = await async_test_client.delete("/liability/", headers=auth_headers(user))
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "dynamodb"])
+def test_store_round_trips_progress_and_cancellation(backend, fake_aws, tmp_path):
+    """
+    Test that both stores keep progress, results and a cancel request made by another process.
+    """
+    if backend == "sqlite":
+        path = str(tmp_path / "jobs.sqlite3")
+        store, other_process = job_store.SQLiteJobStore(path), job_store.SQLiteJobStore(path)
+    else:
+        store = other_process = job_store.DynamoDBJobStore()
+
+    store.create(job_store.new_record("job-1", "owner-sub", "test"))
+    other_process.update("job-1", cancel_requested=True)
+    record = store.update("job-1", status="succeeded", done=3, total=3, result={"deleted": 3})
+
+    assert record["cancel_requested"] is True
+    assert (record["status"], record["done"], record["total"], record["result"]) == ("succeeded", 3, 3, {"deleted": 3})
+    assert store.get("missing") is None
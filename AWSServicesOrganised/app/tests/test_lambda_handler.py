@@ -0,0 +1,102 @@
+import gzip
+import json
+import base64
+
+from benchmarks.harness import seed_user
+
+
+def rest_event(method: str, path: str, headers: dict = None, query: dict = None, body: str = None) -> dict:
+    return {
+        "httpMethod": method,
+        "path": path,
+        "headers": headers or {},
+        "multiValueHeaders": None,
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": None,
+        "requestContext": {"identity": {"sourceIp": "203.0.113.10"}},
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+def http_event(method: str, path: str, headers: dict = None, cookies: list = None, body: bytes = None) -> dict:
+    return {
+        "version": "2.0",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": headers or {},
+        "cookies": cookies or [],
+        "requestContext": {"http": {"method": method, "path": path, "sourceIp": "203.0.113.10"}},
+        "body": base64.b64encode(body).decode() if body else None,
+        "isBase64Encoded": bool(body),
+    }
+
+
+def test_rest_api_event_is_served(fake_aws):
+    """
+    Test that a payload 1.0 event is routed through the app and answered in the REST API format.
+    """
+    from app.lambda_handler import handler
+
+    user = seed_user(fake_aws, "lambda-user", holdings=2)
+
+    response = handler(rest_event("GET", "/asset/", headers={"Authorization": user["id_token"]}), None)
+
+    assert response["statusCode"] == 200, response["body"]
+    assert response["multiValueHeaders"]["content-type"] == ["application/json"]
+    assert response["isBase64Encoded"] is False
+    assert len(json.loads(response["body"])) == 2
+
+
+def test_compressed_response_is_returned_base64_encoded(fake_aws):
+    """
+    Test that a gzipped JSON body is passed back base64 encoded instead of being decoded as text.
+    """
+    from app.lambda_handler import handler
+
+    user = seed_user(fake_aws, "lambda-gzip-user", holdings=20)
+    headers = {"Authorization": user["id_token"], "Accept-Encoding": "gzip, deflate, br"}
+
+    response = handler(rest_event("GET", "/asset/", headers=headers), None)
+
+    assert response["statusCode"] == 200
+    assert response["isBase64Encoded"] is True
+    encoding = response["multiValueHeaders"]["content-encoding"][0]
+    body = base64.b64decode(response["body"])
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    else:
+        import brotli
+        body = brotli.decompress(body)
+    assert len(json.loads(body)) == 20
+
+
+def test_http_api_event_returns_cookies_separately(fake_aws):
+    """
+    Test that a payload 2.0 event with a base64 body is decoded and Set-Cookie headers come back as cookies.
+    """
+    from app.lambda_handler import handler
+
+    user = seed_user(fake_aws, "lambda-user")
+    body = json.dumps({"username": user["Username"], "password": "Bench@12345"}).encode()
+
+    response = handler(http_event("POST", "/auth/signin", headers={"content-type": "application/json"}, body=body), None)
+
+    assert response["statusCode"] == 200
+    assert "set-cookie" not in response["headers"]
+    assert {cookie.split("=", 1)[0] for cookie in response["cookies"]} == {"id_token", "access_token", "refresh_token"}
+
+
+def test_http_api_event_reads_id_token_from_cookies(fake_aws):
+    """
+    Test that cookies from a payload 2.0 event reach the app as a Cookie header.
+    """
+    from app.lambda_handler import handler
+
+    user = seed_user(fake_aws, "lambda-user")
+
+    response = handler(http_event("GET", "/user/profile", headers={"authorization": user["id_token"]},
+                                  cookies=[f"id_token={user['id_token']}"]), None)
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["userName"] == "lambda-user"
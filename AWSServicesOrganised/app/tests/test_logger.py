@@ -0,0 +1,32 @@
+import json
+import logging
+
+from app.logger import JsonFormatter, SamplingFilter
+
+
+def make_record(name: str, level: int, msg: str, args: tuple = ()) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_interpolates_arguments():
+    """
+    Test that %-style arguments are formatted into the JSON message.
+    """
+    record = make_record("app.asset.service", logging.INFO, "Listing assets for user: %s", ("testuser",))
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Listing assets for user: testuser"
+    assert entry["logger"] == "app.asset.service"
+    assert entry["level"] == "INFO"
+
+
+def test_sampling_filter_only_drops_info_for_configured_loggers():
+    """
+    Test that sampling applies to configured loggers' info lines, never to warnings.
+    """
+    sampler = SamplingFilter("app.asset.service=0")
+
+    assert not sampler.filter(make_record("app.asset.service", logging.INFO, "info"))
+    assert sampler.filter(make_record("app.asset.service", logging.WARNING, "warning"))
+    assert sampler.filter(make_record("app.liability.service", logging.INFO, "info"))
@@ -0,0 +1,48 @@
+import boto3
+import pytest
+
+from botocore.stub import Stubber
+
+from app.metrics import aws as aws_metrics
+
+
+"""
+Metrics Endpoint Tests
+"""
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_latency(async_test_client):
+    """
+    Test that requests are recorded under their route template.
+    """
+    await async_test_client.get("/metrics")
+    response = await async_test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'app_request_duration_seconds_count{method="GET",route="/metrics",status="200"}' in response.text
+    assert "app_cache_entries" in response.text
+
+
+"""
+AWS Call Timing Tests
+"""
+
+def test_aws_calls_are_timed_by_service_and_operation():
+    """
+    Test that botocore hooks time each call and count errors.
+    """
+    client = boto3.client("dynamodb", region_name="us-east-1", aws_access_key_id="x", aws_secret_access_key="y")
+    aws_metrics.instrument(client.meta.events)
+    labels = ("dynamodb", "GetItem")
+    before = aws_metrics.AWS_CALL_SECONDS.count(labels)
+    errors_before = aws_metrics.AWS_CALL_ERRORS.value(labels)
+
+    with Stubber(client) as stubber:
+        stubber.add_response("get_item", {}, {"TableName": "t", "Key": {"id": {"S": "1"}}})
+        stubber.add_client_error("get_item", service_error_code="ProvisionedThroughputExceededException", http_status_code=400)
+        client.get_item(TableName="t", Key={"id": {"S": "1"}})
+        with pytest.raises(client.exceptions.ProvisionedThroughputExceededException):
+            client.get_item(TableName="t", Key={"id": {"S": "1"}})
+
+    assert aws_metrics.AWS_CALL_SECONDS.count(labels) == before + 2
+    assert aws_metrics.AWS_CALL_ERRORS.value(labels) == errors_before + 1
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.main import app
+from app.profiling import service as profiling_service
+from app.profiling.sampler import StackSampler, profiled_request
+from app.user import utils as user_utils
+
+
+def get_fake_admin():
+    return {"username": "admin", "sub": "admin-sub", "cognito:groups": ["admin"]}
+
+
+@pytest.fixture
+def profile_dir(tmp_path, mocker):
+    mocker.patch("app.profiling.service.PROFILE_DIR", str(tmp_path))
+    app.dependency_overrides[user_utils.require_admin] = get_fake_admin
+    yield tmp_path
+    app.dependency_overrides.pop(user_utils.require_admin, None)
+
+
+@pytest.mark.asyncio
+async def test_admin_header_request_is_profiled(async_test_client, mocker, profile_dir):
+    """
+    Test that an admin request carrying the profile header produces a capture.
+    """
+    mocker.patch("app.profiling.middleware._is_admin_request", return_value=True)
+
+    await async_test_client.get("/metrics", headers={"X-Profile-Request": "1"})
+    response = await async_test_client.get("/admin/profiles")
+
+    profiles = response.json()["profiles"]
+    assert len(profiles) == 1
+    assert "GET-metrics" in profiles[0]["name"]
+
+    download = await async_test_client.get(f"/admin/profiles/{profiles[0]['name']}")
+    assert download.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_capture_is_stopped_and_saved_off_the_event_loop(async_test_client, mocker, profile_dir):
+    """
+    Test that joining the sampler and writing the capture run in the threadpool, not on the loop thread.
+    """
+    mocker.patch("app.profiling.middleware._is_admin_request", return_value=True)
+    threads = {}
+    stop = StackSampler.stop
+
+    def recording_stop(self):
+        threads["stop"] = threading.get_ident()
+        stop(self)
+
+    def recording_save(*args):
+        threads["save"] = threading.get_ident()
+
+    mocker.patch.object(StackSampler, "stop", recording_stop)
+    mocker.patch.object(profiling_service, "save_capture", recording_save)
+
+    await async_test_client.get("/metrics", headers={"X-Profile-Request": "1"})
+
+    assert set(threads) == {"stop", "save"}
+    assert threading.get_ident() not in threads.values()
+
+
+@pytest.mark.asyncio
+async def test_profiling_is_off_when_worker_contexts_are_unavailable(async_test_client, mocker, profile_dir):
+    """
+    Test that without anyio's worker context the request is served unprofiled instead of failing.
+    """
+    mocker.patch("app.profiling.middleware._is_admin_request", return_value=True)
+    mocker.patch("app.profiling.middleware.WORKER_CONTEXTS_SUPPORTED", False)
+
+    response = await async_test_client.get("/metrics", headers={"X-Profile-Request": "1"})
+
+    assert response.status_code == 200
+    assert profiling_service.list_captures() == []
+
+
+@pytest.mark.asyncio
+async def test_non_admin_header_is_ignored(async_test_client, profile_dir):
+    """
+    Test that the profile header without an admin token does not profile the request.
+    """
+    await async_test_client.get("/metrics", headers={"X-Profile-Request": "1"})
+
+    assert profiling_service.list_captures() == []
+
+
+def profiled_work():
+    time.sleep(0.2)
+
+
+def other_request_work():
+    time.sleep(0.2)
+
+
+@pytest.mark.asyncio
+async def test_sampler_skips_workers_serving_other_requests():
+    """
+    Test that only threadpool calls made under the profiled request's context are sampled.
+    """
+    sampler = StackSampler(threading.get_ident(), 0.005)
+
+    async def profiled():
+        profiled_request.set(sampler)
+        await run_in_threadpool(profiled_work)
+
+    sampler.start()
+    try:
+        await asyncio.gather(asyncio.create_task(profiled()), run_in_threadpool(other_request_work))
+    finally:
+        sampler.stop()
+
+    stacks = sampler.collapsed()
+    assert "profiled_work" in stacks
+    assert "other_request_work" not in stacks
+
+
+def test_old_captures_are_rotated(profile_dir, mocker):
+    """
+    Test that only the newest PROFILE_MAX_FILES captures are kept.
+    """
+    mocker.patch("app.profiling.service.PROFILE_MAX_FILES", 2)
+
+    for i in range(4):
+        profiling_service.save_capture("GET", f"/asset/{i}", 0.01, "a;b 1\n")
+
+    assert len(profiling_service.list_captures()) == 2
+
+
+def test_capture_names_cannot_escape_profile_dir(profile_dir):
+    """
+    Test that path traversal in the capture name is rejected.
+    """
+    with pytest.raises(HTTPException):
+        profiling_service.get_capture_path("../config.py")
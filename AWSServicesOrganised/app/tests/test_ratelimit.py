@@ -0,0 +1,143 @@
+import pytest
+
+from fastapi import Depends, FastAPI
+from httpx import AsyncClient, ASGITransport
+from jose import jwt
+from starlette.requests import Request
+
+from app.ratelimit import middleware as ratelimit
+from app.user import utils as user_utils
+from benchmarks.harness import seed_user, auth_headers
+
+
+def make_client(**options) -> AsyncClient:
+    app = FastAPI()
+
+    @app.get("/asset/")
+    def list_assets(current_user: dict = Depends(user_utils.get_current_user_id)):
+        return []
+
+    @app.post("/auth/signin")
+    def signin():
+        return {}
+
+    app.add_middleware(ratelimit.RateLimitMiddleware, enabled=True, **options)
+    return AsyncClient(transport=ASGITransport(app=app, client=("203.0.113.10", 1234)), base_url="http://test")
+
+
+def sign_in(user: dict):
+    # What the user's earlier requests leave behind: their token in the verified token cache
+    user_utils.get_current_user_id(Request({"type": "http", "headers": [(b"authorization", user["id_token"].encode())]}))
+
+
+@pytest.mark.asyncio
+async def test_user_over_their_bucket_gets_429_without_affecting_others(fake_aws):
+    """
+    Test that buckets are per user and the rejection carries Retry-After.
+    """
+    noisy = seed_user(fake_aws, "noisy-user")
+    quiet = seed_user(fake_aws, "quiet-user")
+    sign_in(noisy)
+    sign_in(quiet)
+
+    async with make_client(limits={"/asset": (1, 2)}, max_loop_lag=0) as client:
+        statuses = [(await client.get("/asset/", headers=auth_headers(noisy))).status_code for _ in range(3)]
+        limited = await client.get("/asset/", headers=auth_headers(noisy))
+        other = await client.get("/asset/", headers=auth_headers(quiet))
+
+    assert statuses == [200, 200, 429]
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert other.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_auth_routes_are_limited_per_ip():
+    """
+    Test that unauthenticated auth routes share a bucket per client IP.
+    """
+    async with make_client(limits={"/auth": (1, 1)}, max_loop_lag=0) as client:
+        first = await client.post("/auth/signin")
+        second = await client.post("/auth/signin")
+
+    assert (first.status_code, second.status_code) == (200, 429)
+
+
+def test_unverified_token_is_keyed_by_ip_without_verifying_it(fake_aws, mocker):
+    """
+    Test that the middleware never verifies a token itself: one not verified yet is keyed by the client IP.
+    """
+    verify = mocker.spy(user_utils, "get_current_user_id")
+    jwks = mocker.spy(user_utils, "get_jwks")
+    user = seed_user(fake_aws, "unverified-user")
+    middleware = ratelimit.RateLimitMiddleware(None, enabled=True)
+    scope = {"type": "http", "headers": [(b"authorization", user["id_token"].encode())], "client": ("203.0.113.10", 1234)}
+
+    assert middleware._client_key(scope, "/asset") == "ip:203.0.113.10"
+    verify.assert_not_called()
+    jwks.assert_not_called()
+    sign_in(user)
+    assert middleware._client_key(scope, "/asset") == "sub:" + user["sub"]
+
+
+@pytest.mark.asyncio
+async def test_forged_token_cannot_spend_another_users_bucket(fake_aws):
+    """
+    Test that a forged token naming a victim's sub is limited by IP, and the victim keeps their own bucket.
+    """
+    victim = seed_user(fake_aws, "victim-user")
+    sign_in(victim)
+    forged = jwt.encode({**jwt.get_unverified_claims(victim["id_token"])}, "not-the-pool-key", algorithm="HS256",
+                        headers={"kid": jwt.get_unverified_header(victim["id_token"])["kid"]})
+
+    async with make_client(limits={"/asset": (1, 2)}, max_loop_lag=0) as client:
+        attempts = [(await client.get("/asset/", headers={"Authorization": forged})).status_code for _ in range(4)]
+        mine = [(await client.get("/asset/", headers=auth_headers(victim))).status_code for _ in range(2)]
+
+    assert attempts == [401, 401, 429, 429]
+    assert mine == [200, 200]
+
+
+@pytest.mark.asyncio
+async def test_auth_routes_key_on_the_trusted_forwarded_address():
+    """
+    Test that with a client IP header configured, clients behind one proxy get their own buckets.
+    """
+    async with make_client(limits={"/auth": (1, 1)}, max_loop_lag=0, client_ip_header="X-Forwarded-For") as client:
+        first = await client.post("/auth/signin", headers={"X-Forwarded-For": "198.51.100.1"})
+        other = await client.post("/auth/signin", headers={"X-Forwarded-For": "198.51.100.2"})
+        spoofed = await client.post("/auth/signin", headers={"X-Forwarded-For": "192.0.2.9, 198.51.100.1"})
+
+    assert (first.status_code, other.status_code, spoofed.status_code) == (200, 200, 429)
+
+
+@pytest.mark.asyncio
+async def test_requests_are_shed_when_too_many_are_in_flight(mocker):
+    """
+    Test that requests beyond the in-flight threshold get 503 with Retry-After.
+    """
+    mocker.patch("app.ratelimit.middleware._in_flight", 5)
+
+    async with make_client(limits={}, max_in_flight=5, max_loop_lag=0) as client:
+        response = await client.get("/asset/")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_requests_are_shed_when_the_event_loop_lags(mocker):
+    """
+    Test that a lagging event loop sheds load before routing.
+    """
+    mocker.patch("app.ratelimit.middleware._loop_lag", 2.0)
+    mocker.patch("app.ratelimit.middleware._monitor_loop_lag", mocker.AsyncMock())
+
+    async with make_client(limits={}, max_in_flight=0, max_loop_lag=0.5) as client:
+        response = await client.get("/asset/")
+
+    assert response.status_code == 503
+
+
+def test_limits_spec_is_parsed():
+    assert ratelimit.parse_limits("/asset/=5/10, /admin=1") == {"/asset": (5.0, 10.0), "/admin": (1.0, 1.0)}
@@ -0,0 +1,114 @@
+import gzip
+import json
+
+import pytest
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from httpx import AsyncClient, ASGITransport
+from pydantic import TypeAdapter
+
+from app import config
+from app.models import Asset
+from app.responses import compression
+from app.responses.compression import CompressionMiddleware
+from benchmarks.harness import seed_user, auth_headers
+
+
+@pytest.mark.asyncio
+async def test_fast_list_path_matches_the_response_model(async_test_client, fake_aws):
+    """
+    Test that the trimmed, orjson-encoded asset list equals what response_model=list[Asset] produced.
+    """
+    user = seed_user(fake_aws, "fast-json-user", holdings=3)
+    stored = [item for item in fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE)]
+    adapter = TypeAdapter(list[Asset])
+    expected = json.loads(adapter.dump_json(adapter.validate_python(
+        [{k: list(v.values())[0] for k, v in item.items()} for item in stored])))
+
+    response = await async_test_client.get("/asset/", headers=auth_headers(user))
+
+    assert response.status_code == 200
+    assert sorted(response.json(), key=lambda a: a["asset_id"]) == sorted(expected, key=lambda a: a["asset_id"])
+
+
+@pytest.mark.asyncio
+async def test_portfolio_is_serialized_from_validated_models(async_test_client, fake_aws):
+    """
+    Test that the portfolio keeps its shape when serialized straight from the validated models.
+    """
+    user = seed_user(fake_aws, "fast-portfolio-user", holdings=2)
+
+    response = await async_test_client.get("/portfolio/", headers=auth_headers(user))
+
+    body = response.json()
+    assert body["total_assets"] == pytest.approx(1000.50 * 2 + 1)
+    assert set(body["assets"][0]) == {"category", "title", "asset_value"}
+
+
+def make_client(minimum_size: int = 100) -> AsyncClient:
+    app = FastAPI()
+
+    @app.get("/big")
+    def big():
+        return [{"title": f"Asset {i}", "asset_value": i} for i in range(200)]
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("x" * 5000, headers={"content-encoding": "identity"})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f'{{"n": {i}}}\n' for i in range(100)), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped_when_accepted(mocker):
+    """
+    Test that gzip is negotiated above the threshold and skipped below it or when not accepted.
+    """
+    mocker.patch.object(compression, "brotli", None)
+    async with make_client() as client:
+        big = await client.get("/big", headers={"Accept-Encoding": "br, gzip"})
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        refused = await client.get("/big", headers={"Accept-Encoding": "gzip;q=0"})
+        encoded = await client.get("/text", headers={"Accept-Encoding": "gzip"})
+
+    assert big.headers["content-encoding"] == "gzip"
+    assert len(big.json()) == 200
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in refused.headers
+    assert encoded.headers["content-encoding"] == "identity"
+
+
+@pytest.mark.asyncio
+async def test_streamed_response_is_compressed_incrementally(mocker):
+    """
+    Test that a streamed NDJSON body is gzipped chunk by chunk into one valid stream.
+    """
+    mocker.patch.object(compression, "brotli", None)
+    async with make_client() as client:
+        async with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    assert response.headers["content-encoding"] == "gzip"
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert len(lines) == 100 and json.loads(lines[-1]) == {"n": 99}
+
+
+def test_brotli_is_preferred_when_installed(mocker):
+    """
+    Test that br wins over gzip only when the package is available and the client accepts it.
+    """
+    mocker.patch.object(compression, "brotli", object())
+    assert compression.choose_encoding("gzip, br") == "br"
+    assert compression.choose_encoding("gzip, br;q=0") == "gzip"
+    mocker.patch.object(compression, "brotli", None)
+    assert compression.choose_encoding("br") is None
@@ -0,0 +1,46 @@
+import pytest
+
+from fastapi import FastAPI
+
+from app import routers
+
+
+@pytest.fixture
+def fresh_app(mocker):
+    mocker.patch("app.routers._loaded", set())
+    app = FastAPI()
+    app.add_middleware(routers.LazyRouterMiddleware, target=app)
+    return app
+
+
+def route_paths(app: FastAPI) -> set:
+    return set(app.openapi()["paths"])
+
+
+def test_router_is_included_on_first_request_under_its_prefix(fresh_app):
+    """
+    Test that only the router matching the request path gets loaded.
+    """
+    routers.load_for_path(fresh_app, "/asset/123")
+
+    assert "/asset/{asset_id}" in route_paths(fresh_app)
+    assert "/liability/" not in route_paths(fresh_app)
+
+    routers.load_for_path(fresh_app, "/assets-elsewhere")
+    routers.load_for_path(fresh_app, "/asset/")
+    assert len(routers._loaded) == 1
+
+
+@pytest.mark.asyncio
+async def test_openapi_loads_every_router(fresh_app):
+    """
+    Test that the OpenAPI schema lists routes from every lazily loaded router.
+    """
+    from httpx import AsyncClient, ASGITransport
+
+    async with AsyncClient(transport=ASGITransport(app=fresh_app), base_url="http://test") as client:
+        response = await client.get("/openapi.json")
+
+    paths = response.json()["paths"]
+    for prefix, _, _ in routers.ROUTERS:
+        assert any(path.startswith(prefix + "/") for path in paths)
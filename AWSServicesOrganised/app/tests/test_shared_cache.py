@@ -0,0 +1,115 @@
+import os
+import time
+import tempfile
+import threading
+
+from multiprocessing.connection import Listener
+
+import pytest
+
+from app import shared_cache
+from app.cache import TTLCache
+
+
+@pytest.fixture
+def daemon(mocker):
+    # Unix socket paths are length limited, so keep it short. The listener removes the socket at exit.
+    address = os.path.join(tempfile.mkdtemp(prefix="cache-test-"), "cache.sock")
+    ready = threading.Event()
+    threading.Thread(target=shared_cache.serve, args=(address, b"test-key", ready), daemon=True).start()
+    ready.wait(5)
+    client = shared_cache.SharedCacheClient(address, b"test-key")
+    mocker.patch("app.shared_cache._client", client)
+    return client
+
+
+def test_entry_set_by_one_worker_is_a_hit_for_another(daemon):
+    """
+    Test that a local miss is answered by the daemon, with the remaining TTL carried over.
+    """
+    worker_a = TTLCache("shared_test_a", ttl=60, shared=True)
+    worker_b = TTLCache("shared_test_b", ttl=60, shared=True)
+    worker_b.name = worker_a.name
+
+    worker_a.set("token-hash", {"sub": "user-1"}, ttl=30)
+
+    value, remaining = worker_b.get_with_ttl("token-hash")
+    assert value == {"sub": "user-1"}
+    assert 0 < remaining <= 30
+    assert worker_b.shared_hits == 1
+    # The entry is now local to worker_b as well
+    assert worker_b.get("token-hash") == {"sub": "user-1"}
+    assert worker_b.shared_hits == 1
+
+
+def test_write_through_cache_never_serves_another_workers_old_value(daemon):
+    """
+    Test that with local_ttl=0 an update or pop on one worker is seen by the others at once.
+    """
+    worker_a = TTLCache("shared_test_wt_a", ttl=60, shared=True, local_ttl=0)
+    worker_b = TTLCache("shared_test_wt_b", ttl=60, shared=True, local_ttl=0)
+    worker_b.name = worker_a.name
+
+    worker_a.set("user-1", {"name": "Old"})
+    assert worker_b.get("user-1") == {"name": "Old"}
+    worker_a.set("user-1", {"name": "New"})
+    assert worker_b.get("user-1") == {"name": "New"}
+    worker_a.pop("user-1")
+    assert worker_b.get("user-1") is None
+
+
+def test_write_through_cache_keeps_local_entries_without_a_daemon(mocker):
+    """
+    Test that a single process without a daemon still caches locally.
+    """
+    mocker.patch("app.shared_cache._client", None)
+    mocker.patch("app.shared_cache.SHARED_CACHE_ADDRESS", "")
+    cache = TTLCache("shared_test_wt_local", ttl=60, shared=True, local_ttl=0)
+
+    cache.set("user-1", "value")
+
+    assert cache.get("user-1") == "value"
+
+
+def test_pop_removes_entry_for_every_worker(daemon):
+    """
+    Test that invalidating an entry also drops it from the daemon.
+    """
+    cache = TTLCache("shared_test_pop", ttl=60, shared=True)
+    cache.set("key", "value")
+    cache.pop("key")
+
+    assert daemon.get("shared_test_pop:key") is None
+
+
+def test_unreachable_daemon_falls_back_to_local_cache(mocker):
+    """
+    Test that a missing daemon only costs a miss, not an error.
+    """
+    mocker.patch("app.shared_cache._client", shared_cache.SharedCacheClient("/nonexistent/cache.sock", b"key"))
+    cache = TTLCache("shared_test_down", ttl=60, shared=True)
+
+    assert cache.get("key") is None
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+
+def test_slow_daemon_falls_back_to_local_cache(mocker):
+    """
+    Test that a daemon that accepts but never answers costs at most the timeout, then local caches are used.
+    """
+    address = os.path.join(tempfile.mkdtemp(prefix="cache-test-"), "cache.sock")
+    listener = Listener(address, family="AF_UNIX", authkey=b"test-key")
+    accepted = []
+    threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+    client = shared_cache.SharedCacheClient(address, b"test-key", timeout=0.05)
+    mocker.patch("app.shared_cache._client", client)
+    cache = TTLCache("shared_test_slow", ttl=60, shared=True)
+
+    start = time.monotonic()
+    assert cache.get("key") is None
+    assert time.monotonic() - start < 1
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    assert client._local.conn is None
+    listener.close()
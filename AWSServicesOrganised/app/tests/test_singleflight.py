@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import routers
+from app.main import app
+from app.singleflight import SingleFlight
+from benchmarks.harness import seed_user, auth_headers
+
+
+def slow_call(calls: list, result="value", delay: float = 0.05):
+    def fn():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return result
+    return fn
+
+
+def test_concurrent_threads_share_one_call():
+    """
+    Test that overlapping calls with the same key run the function once.
+    """
+    flight = SingleFlight("test_threads")
+    calls, results = [], []
+    fn = slow_call(calls)
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", fn))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == ["value"] * 8
+
+
+def test_error_is_shared_and_not_remembered():
+    """
+    Test that every caller of a failed flight sees the error, and the next call runs again.
+    """
+    flight = SingleFlight("test_errors")
+
+    def boom():
+        raise ValueError("downstream failed")
+
+    with pytest.raises(ValueError):
+        flight.do("key", boom)
+    assert flight.do("key", lambda: "recovered") == "recovered"
+
+
+@pytest.mark.asyncio
+async def test_coroutines_and_threads_share_one_flight():
+    """
+    Test that a coroutine joins a call a thread already started, and coroutines coalesce among themselves.
+    """
+    flight = SingleFlight("test_mixed")
+    calls = []
+    thread_result = []
+    thread = threading.Thread(target=lambda: thread_result.append(flight.do("key", slow_call(calls, delay=0.2))))
+    thread.start()
+    await asyncio.sleep(0.05)
+
+    async def never_called():
+        calls.append("coroutine")
+
+    assert await flight.do_async("key", never_called) == "value"
+    thread.join()
+    assert calls == [calls[0]] and thread_result == ["value"]
+
+    async def slow_coroutine():
+        calls.append("coroutine")
+        await asyncio.sleep(0.05)
+        return "async value"
+
+    results = await asyncio.gather(*(flight.do_async("other", slow_coroutine) for _ in range(5)))
+    assert results == ["async value"] * 5
+    assert calls.count("coroutine") == 1
+
+
+@pytest.mark.asyncio
+async def test_dashboard_fan_out_costs_one_exchange_and_one_query_per_table(async_test_client, fake_aws):
+    """
+    Test that /portfolio/, /asset/, /liability/ and /user/profile fired together share the identity exchange and queries.
+    """
+    # Routers load on first use; an import mid-gather could push one request past the others
+    routers.load_all(app)
+    user = seed_user(fake_aws, "dashboard-user", holdings=3)
+    # Wide enough that the four requests overlap on every downstream call
+    fake_aws.latency = 0.2
+
+    responses = await asyncio.gather(*(
+        async_test_client.get(path, headers=auth_headers(user))
+        for path in ("/portfolio/", "/asset/", "/liability/", "/user/profile")
+    ))
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert fake_aws.calls[("cognito-identity", "GetId")] == 1
+    assert fake_aws.calls[("cognito-identity", "GetCredentialsForIdentity")] == 1
+    assert fake_aws.calls[("dynamodb", "Query")] == 2
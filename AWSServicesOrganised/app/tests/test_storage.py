@@ -0,0 +1,112 @@
+import pytest
+
+from app import clients, config
+from app.storage import backfill
+from app.storage import repository as storage
+from benchmarks.harness import seed_user, auth_headers
+
+
+def single_items(fake) -> list:
+    return fake.dynamodb.items(config.DynamoDB_PORTFOLIO_TABLE)
+
+
+async def create_holdings(client, user: dict, count: int):
+    for i in range(count):
+        await client.post("/asset/", headers=auth_headers(user), json={"category": "stocks", "title": f"a{i}", "asset_value": i + 1})
+        await client.post("/liability/", headers=auth_headers(user), json={"category": "loan", "title": f"l{i}", "liability_value": 1})
+
+
+@pytest.mark.asyncio
+async def test_single_table_serves_a_portfolio_with_one_query(async_test_client, fake_aws, mocker):
+    """
+    Test that in the single layout items are keyed by the owner and a portfolio is one base-table query.
+    """
+    mocker.patch.object(storage, "STORAGE_LAYOUT", "single")
+    user = seed_user(fake_aws, "single-user")
+    await create_holdings(async_test_client, user, 3)
+
+    items = single_items(fake_aws)
+    assert len(items) == 6
+    assert {item["PK"]["S"] for item in items} == {f"USER#{user['sub']}"}
+    assert fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE) == []
+
+    fake_aws.reset_calls()
+    response = await async_test_client.get("/portfolio/", headers=auth_headers(user))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total_assets"], body["total_liabilities"], body["net_worth"]) == (6, 3, 3)
+    assert fake_aws.calls[("dynamodb", "Query")] == 1
+
+    response = await async_test_client.get("/portfolio/export?format=ndjson", headers=auth_headers(user))
+    kinds = [line.split('"kind":"')[1].split('"')[0] for line in response.text.splitlines()]
+    assert kinds == ["asset"] * 3 + ["liability"] * 3
+
+
+@pytest.mark.asyncio
+async def test_single_table_only_reaches_the_users_own_items(async_test_client, fake_aws, mocker):
+    """
+    Test that another user's item id is neither found nor deleted in the single layout.
+    """
+    mocker.patch.object(storage, "STORAGE_LAYOUT", "single")
+    owner = seed_user(fake_aws, "owner")
+    other = seed_user(fake_aws, "other")
+    await create_holdings(async_test_client, owner, 1)
+    asset_id = next(item["asset_id"]["S"] for item in single_items(fake_aws) if item["SK"]["S"].startswith("ASSET#"))
+
+    response = await async_test_client.get(f"/asset/{asset_id}", headers=auth_headers(other))
+    assert response.status_code == 404
+    await async_test_client.delete(f"/asset/{asset_id}", headers=auth_headers(other))
+    assert len(single_items(fake_aws)) == 2
+
+    response = await async_test_client.get(f"/asset/{asset_id}", headers=auth_headers(owner))
+    assert response.status_code == 200 and "PK" not in response.json()
+
+
+def test_backfill_copies_each_item_once(fake_aws):
+    """
+    Test that the backfill copies every old item, and a second run finds them all present.
+    """
+    seed_user(fake_aws, "legacy-user", holdings=5)
+
+    results = backfill.backfill(segments=3, page_size=2)
+
+    assert results["asset"]["copied"] == 5 and results["liability"]["copied"] == 5
+    assert len(single_items(fake_aws)) == 10
+    again = backfill.backfill(segments=3)
+    assert again["asset"] == {"present": 5} and again["liability"] == {"present": 5}
+
+
+def test_backfill_does_not_resurrect_a_concurrent_delete(fake_aws):
+    """
+    Test that an item deleted from the old table after it was scanned is removed from the single table again.
+    """
+    seed_user(fake_aws, "deleting-user", holdings=1)
+    item = fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE)[0]
+    fake_aws.dynamodb.tables[config.DynamoDB_ASSET_DETAILS_TABLE].clear()
+
+    assert backfill.copy_item(clients.get_client("dynamodb"), "asset", item) == "deleted"
+    assert single_items(fake_aws) == []
+
+
+@pytest.mark.asyncio
+async def test_dual_read_merges_items_not_yet_backfilled(async_test_client, fake_aws, mocker):
+    """
+    Test that with dual reads on, items only in the old tables still show up, and new ones go to both layouts.
+    """
+    mocker.patch.multiple(storage, STORAGE_LAYOUT="single", STORAGE_DUAL_WRITE=True, STORAGE_DUAL_READ=True)
+    user = seed_user(fake_aws, "migrating-user", holdings=2)
+    misses = storage.DUAL_READ_MISSES.value(("asset",))
+    await async_test_client.post("/asset/", headers=auth_headers(user), json={"category": "stocks", "title": "new", "asset_value": 1})
+
+    response = await async_test_client.get("/asset/", headers=auth_headers(user))
+
+    assert len(response.json()) == 3
+    assert storage.DUAL_READ_MISSES.value(("asset",)) == misses + 2
+    assert len(fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE)) == 3
+    new_id = single_items(fake_aws)[0]["asset_id"]["S"]
+
+    await async_test_client.delete(f"/asset/{new_id}", headers=auth_headers(user))
+
+    assert single_items(fake_aws) == []
+    assert len(fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE)) == 2
@@ -0,0 +1,408 @@
+import io
+import hashlib
+import pytest
+
+from app.main import app
+from app.user import utils as user_utils
+from app.user import presign
+from app.user import service as user_service
+
+
+def get_fake_current_user_id():
+    return {
+        "username": "testuser",
+        "sub": "fake-sub",
+        "id_token": "fake_id_token"
+    }
+
+
+@pytest.fixture(autouse=True)
+def fake_user():
+    app.dependency_overrides[user_utils.get_current_user_id] = get_fake_current_user_id
+    presign.invalidate_profile_picture_url("testuser")
+    user_service._profile_cache.clear()
+    yield
+    app.dependency_overrides.pop(user_utils.get_current_user_id, None)
+
+
+"""
+Profile Picture Tests
+"""
+
+@pytest.mark.asyncio
+async def test_get_profile_picture_uses_stored_key(async_test_client, mocker):
+    """
+    Test that the presigned URL is signed for the key stored in the user's profile.
+    """
+    mocker.patch("app.user.service.get_profile_details", return_value={"profile_pic_key": "profile_pic/id-1/profile_pic.png"})
+    signer = mocker.Mock()
+    signer.generate_presigned_url.return_value = "https://signed/url"
+    mocker.patch("app.user.presign.get_signer", return_value=signer)
+
+    response = await async_test_client.get("/user/profile/picture")
+
+    assert response.status_code == 200
+    assert response.json()["profile_pic_url"] == "https://signed/url"
+    params = signer.generate_presigned_url.call_args.kwargs["Params"]
+    assert params["Key"] == "profile_pic/id-1/profile_pic.png"
+
+
+@pytest.mark.asyncio
+async def test_get_profile_picture_is_cached(async_test_client, mocker):
+    """
+    Test that repeat requests are served from the presigned URL cache.
+    """
+    profile = mocker.patch("app.user.service.get_profile_details", return_value={"profile_pic_key": "profile_pic/id-1/profile_pic.png"})
+    signer = mocker.Mock()
+    signer.generate_presigned_url.return_value = "https://signed/url"
+    mocker.patch("app.user.presign.get_signer", return_value=signer)
+
+    await async_test_client.get("/user/profile/picture")
+    response = await async_test_client.get("/user/profile/picture")
+
+    assert response.status_code == 200
+    assert profile.call_count == 1
+    assert signer.generate_presigned_url.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_get_profile_picture_missing_key(async_test_client, mocker):
+    """
+    Test that a profile without a stored picture key returns 404.
+    """
+    mocker.patch("app.user.service.get_profile_details", return_value={"userName": "testuser"})
+
+    response = await async_test_client.get("/user/profile/picture")
+
+    assert response.status_code == 404
+
+
+"""
+Direct Upload Tests
+"""
+
+@pytest.mark.asyncio
+async def test_create_upload_url_scoped_to_user_prefix(async_test_client, mocker):
+    """
+    Test that the presigned POST is issued for a key under the user's identity prefix.
+    """
+    mocker.patch("app.user.service.S3_PROFILE_PIC_FOLDER", "profile_pic")
+    mocker.patch("app.user.service.user_utils.get_identity_credentials_with_userpool_token", return_value=(mocker.Mock(), "id-1"))
+    signer = mocker.Mock()
+    signer.generate_presigned_post.return_value = {"url": "https://bucket", "fields": {"key": "k"}}
+    mocker.patch("app.user.presign.get_signer", return_value=signer)
+
+    response = await async_test_client.post("/user/profile/picture/upload-url", json={"filename": "me.png", "content_type": "image/png"})
+
+    assert response.status_code == 200
+    assert response.json()["s3_key"] == "profile_pic/id-1/profile_pic.png"
+    conditions = signer.generate_presigned_post.call_args.kwargs["Conditions"]
+    assert {"Content-Type": "image/png"} in conditions
+
+
+@pytest.mark.asyncio
+async def test_create_upload_url_rejects_non_images(async_test_client):
+    """
+    Test that non-image content types are rejected before signing.
+    """
+    response = await async_test_client.post("/user/profile/picture/upload-url", json={"filename": "notes.txt", "content_type": "text/plain"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_complete_upload_rejects_foreign_key(async_test_client, mocker):
+    """
+    Test that a user cannot record a key outside their own prefix.
+    """
+    mocker.patch("app.user.service.S3_PROFILE_PIC_FOLDER", "profile_pic")
+    mocker.patch("app.user.service.user_utils.get_identity_credentials_with_userpool_token", return_value=(mocker.Mock(), "id-1"))
+
+    response = await async_test_client.post("/user/profile/picture/complete", json={"s3_key": "profile_pic/id-2/profile_pic.png"})
+
+    assert response.status_code == 403
+
+
+"""
+Profile Update Tests
+"""
+
+@pytest.mark.asyncio
+async def test_patch_profile_sends_only_changed_attributes(async_test_client, mocker):
+    """
+    Test that PATCH builds an UpdateExpression from the provided fields only.
+    """
+    session = mocker.Mock()
+    table = session.resource.return_value.Table.return_value
+    table.update_item.return_value = {"Attributes": {"userName": "testuser", "sub": "fake-sub", "name": "Test", "height": "180"}}
+    mocker.patch("app.user.service.user_utils.get_identity_credentials_with_userpool_token", return_value=(session, "id-1"))
+
+    response = await async_test_client.patch("/user/profile", json={"height": "180"})
+
+    assert response.status_code == 200
+    kwargs = table.update_item.call_args.kwargs
+    assert "#height = :height" in kwargs["UpdateExpression"]
+    assert "#name" not in kwargs["UpdateExpression"]
+    assert kwargs["ReturnValues"] == "ALL_NEW"
+
+
+@pytest.mark.asyncio
+async def test_profile_read_served_from_cache_after_patch(async_test_client, mocker):
+    """
+    Test that a profile read after a PATCH costs no identity exchange or DynamoDB call.
+    """
+    session = mocker.Mock()
+    table = session.resource.return_value.Table.return_value
+    table.update_item.return_value = {"Attributes": {
+        "userName": "testuser", "sub": "fake-sub", "name": "Test",
+        "profile_pic_key": None, "profile_pic_url": None}}
+    exchange = mocker.patch("app.user.service.user_utils.get_identity_credentials_with_userpool_token", return_value=(session, "id-1"))
+
+    await async_test_client.patch("/user/profile", json={"name": "Test"})
+    response = await async_test_client.get("/user/profile")
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "Test"
+    assert exchange.call_count == 1
+    table.get_item.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_patch_without_profile_is_404_and_creates_no_item(async_test_client, fake_aws):
+    """
+    Test that PATCH on a user with no profile row returns 404 instead of creating a partial profile.
+    """
+    from app import config
+    from benchmarks.harness import seed_user, auth_headers
+
+    app.dependency_overrides.pop(user_utils.get_current_user_id, None)
+    user = seed_user(fake_aws, "patch-no-profile")
+    fake_aws.dynamodb.handle("DeleteItem", {"TableName": config.DynamoDB_USER_DETAILS_TABLE, "Key": {"userName": {"S": "patch-no-profile"}}})
+
+    response = await async_test_client.patch("/user/profile", headers=auth_headers(user), json={"height": "180"})
+
+    assert response.status_code == 404
+    assert fake_aws.dynamodb.items(config.DynamoDB_USER_DETAILS_TABLE) == []
+
+
+@pytest.mark.asyncio
+async def test_patch_rejects_null_name(async_test_client, mocker):
+    """
+    Test that PATCH refuses to clear the name, which every stored profile must have.
+    """
+    exchange = mocker.patch("app.user.service.user_utils.get_identity_credentials_with_userpool_token")
+
+    response = await async_test_client.patch("/user/profile", json={"name": None})
+
+    assert response.status_code == 422
+    exchange.assert_not_called()
+
+"""
+Profile Picture Upload Tests
+"""
+
+@pytest.mark.asyncio
+async def test_upload_same_picture_skips_s3_put(async_test_client, mocker):
+    """
+    Test that re-uploading the current picture short-circuits on the content hash.
+    """
+    content = b"fake-image-bytes"
+    mocker.patch("app.user.service.get_profile_details", return_value={
+        "profile_pic_key": "profile_pic/id-1/profile_pic.png",
+        "profile_pic_sha256": hashlib.sha256(content).hexdigest()})
+    exchange = mocker.patch("app.user.service.user_utils.get_identity_credentials_with_userpool_token")
+
+    response = await async_test_client.post("/user/profile/picture", files={"file": ("me.png", content, "image/png")})
+
+    assert response.status_code == 200
+    assert response.json()["s3_key"] == "profile_pic/id-1/profile_pic.png"
+    exchange.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_upload_new_picture_stores_hash(async_test_client, mocker):
+    """
+    Test that a changed picture is uploaded with its hash as metadata and in the profile.
+    """
+    mocker.patch("app.user.service.get_profile_details", return_value={"profile_pic_sha256": "old"})
+    session = mocker.Mock()
+    s3_client = session.client.return_value
+    table = session.resource.return_value.Table.return_value
+    table.update_item.return_value = {"Attributes": {"userName": "testuser"}}
+    mocker.patch("app.user.service.user_utils.get_identity_credentials_with_userpool_token", return_value=(session, "id-1"))
+
+    response = await async_test_client.post("/user/profile/picture", files={"file": ("me.png", b"new-bytes", "image/png")})
+
+    assert response.status_code == 200
+    s3_client.upload_fileobj.assert_called_once()
+    metadata = s3_client.upload_fileobj.call_args.kwargs["ExtraArgs"]["Metadata"]
+    assert metadata["sha256"] == table.update_item.call_args.kwargs["ExpressionAttributeValues"][":sha256"]
+
+
+@pytest.mark.asyncio
+async def test_put_profile_keeps_uploaded_picture(async_test_client, fake_aws):
+    """
+    Test that a PUT after an upload replaces the profile fields but keeps the picture key, URL and hash.
+    """
+    from app import config
+    from benchmarks.harness import seed_user, auth_headers
+
+    app.dependency_overrides.pop(user_utils.get_current_user_id, None)
+    user = seed_user(fake_aws, "put-user")
+    upload = await async_test_client.post("/user/profile/picture", headers=auth_headers(user),
+                                          files={"file": ("me.gif", b"gif-bytes", "image/gif")})
+    assert upload.status_code == 200
+
+    response = await async_test_client.put("/user/profile", headers=auth_headers(user),
+                                           json={"userName": "put-user", "name": "New Name", "height": "170"})
+
+    assert response.status_code == 200
+    stored = fake_aws.dynamodb.items(config.DynamoDB_USER_DETAILS_TABLE)[0]
+    assert stored["name"] == {"S": "New Name"} and stored["height"] == {"S": "170"}
+    assert stored["profile_pic_key"] == {"S": upload.json()["s3_key"]}
+    assert stored["profile_pic_key"]["S"].endswith("profile_pic.gif")
+    assert stored["profile_pic_sha256"] == {"S": hashlib.sha256(b"gif-bytes").hexdigest()}
+    profile = (await async_test_client.get("/user/profile", headers=auth_headers(user))).json()
+    assert profile["profile_pic_url"] == upload.json()["url"] and profile["name"] == "New Name"
+
+
+@pytest.mark.asyncio
+async def test_picture_without_profile_is_404_and_creates_no_item(async_test_client, fake_aws):
+    """
+    Test that recording a picture for a user with no profile row returns 404 instead of creating a partial profile.
+    """
+    from app import config
+    from benchmarks.harness import seed_user, auth_headers
+
+    app.dependency_overrides.pop(user_utils.get_current_user_id, None)
+    user = seed_user(fake_aws, "no-profile-user")
+    fake_aws.dynamodb.handle("DeleteItem", {"TableName": config.DynamoDB_USER_DETAILS_TABLE, "Key": {"userName": {"S": "no-profile-user"}}})
+    key = f"{user_service.profile_picture_prefix(user['identity_id'])}profile_pic.png"
+    fake_aws.backends["s3"].handle("PutObject", {"Bucket": config.S3_BUCKET_NAME, "Key": key, "Body": b"png-bytes"})
+
+    upload = await async_test_client.post("/user/profile/picture", headers=auth_headers(user),
+                                          files={"file": ("me.png", b"png-bytes", "image/png")})
+    complete = await async_test_client.post("/user/profile/picture/complete", headers=auth_headers(user), json={"s3_key": key})
+
+    assert (upload.status_code, complete.status_code) == (404, 404)
+    assert fake_aws.dynamodb.items(config.DynamoDB_USER_DETAILS_TABLE) == []
+    assert (await async_test_client.get("/user/profile", headers=auth_headers(user))).status_code == 404
+
+
+def test_identity_session_and_clients_are_reused(fake_aws):
+    """
+    Test that repeat requests with the same token reuse one session and client instead of building new ones.
+    """
+    from benchmarks.harness import seed_user
+
+    user = seed_user(fake_aws, "session-user")
+    first, identity_id = user_utils.get_identity_credentials_with_userpool_token(user["id_token"])
+    second, _ = user_utils.get_identity_credentials_with_userpool_token(user["id_token"])
+
+    assert first is second and identity_id == user["identity_id"]
+    assert first.client("dynamodb") is second.client("dynamodb")
+    # Resources are per call, but wrap a shared client of their own, so client() stays low-level
+    assert first.resource("dynamodb").meta.client is second.resource("dynamodb").meta.client
+    assert first.resource("dynamodb").meta.client is not first.client("dynamodb")
+
+
+def test_known_user_gets_credentials_with_one_call(fake_aws):
+    """
+    Test that once a user's identity id is in the identity map, a new worker exchanges the token with one call.
+    """
+    from app import cache
+    from app.metrics import aws as aws_metrics
+    from app.user import identity_map
+    from benchmarks.harness import seed_user
+
+    user = seed_user(fake_aws, "mapped-user")
+    user_utils.get_identity_credentials_with_userpool_token(user["id_token"])
+    assert identity_map.get_store().get(user["sub"]) == user["identity_id"]
+    # What a fresh worker starts with
+    for c in cache.all_caches().values():
+        c.clear()
+
+    with aws_metrics.record_calls() as calls:
+        _, identity_id = user_utils.get_identity_credentials_with_userpool_token(user["id_token"])
+
+    assert identity_id == user["identity_id"]
+    assert dict(calls) == {("cognito-identity", "GetCredentialsForIdentity"): 1}
+
+
+def test_stale_identity_map_entry_is_replaced(fake_aws):
+    """
+    Test that an identity id the token doesn't belong to is looked up again and corrected in the map.
+    """
+    from app.user import identity_map
+    from benchmarks.harness import seed_user
+
+    user = seed_user(fake_aws, "stale-user")
+    identity_map.get_store().put(user["sub"], "us-east-1:replaced-pool-identity")
+
+    _, identity_id = user_utils.get_identity_credentials_with_userpool_token(user["id_token"])
+
+    assert identity_id == user["identity_id"]
+    assert identity_map.get_store().get(user["sub"]) == user["identity_id"]
+    assert fake_aws.calls[("cognito-identity", "GetId")] == 1
+
+
+def test_sqlite_identity_map_survives_a_restart(tmp_path):
+    """
+    Test that the SQLite identity map keeps its entries for the next process.
+    """
+    from app.user import identity_map
+
+    path = str(tmp_path / "identity_map.sqlite3")
+    identity_map.SQLiteIdentityMap(path).put("sub-1", "us-east-1:identity-1")
+
+    reopened = identity_map.SQLiteIdentityMap(path)
+    assert reopened.get("sub-1") == "us-east-1:identity-1"
+    reopened.forget("sub-1")
+    assert reopened.get("sub-1") is None
+
+
+def test_dynamodb_identity_map_is_filled_on_first_sight(fake_aws, mocker):
+    """
+    Test that with IDENTITY_MAP_STORE=dynamodb the first exchange records the user's identity id in the table.
+    """
+    from app import config
+    from app.user import identity_map
+    from benchmarks.harness import seed_user
+
+    mocker.patch.object(identity_map, "IDENTITY_MAP_STORE", "dynamodb")
+    identity_map.reset_store()
+    user = seed_user(fake_aws, "table-user")
+
+    user_utils.get_identity_credentials_with_userpool_token(user["id_token"])
+
+    assert fake_aws.dynamodb.items(config.DynamoDB_IDENTITY_MAP_TABLE) == [
+        {"sub": {"S": user["sub"]}, "identity_id": {"S": user["identity_id"]}}]
+    identity_map.reset_store()
+
+
+def test_picture_is_hashed_in_the_single_read(mocker):
+    """
+    Test that the upload is read once, hashed as it is read, and never rewound for a second pass.
+    """
+    mocker.patch("app.user.service.HASH_CHUNK_SIZE", 4)
+    fileobj = mocker.Mock(wraps=io.BytesIO(b"picture-bytes"))
+
+    content, sha256 = user_service._read_picture(fileobj)
+
+    assert content == b"picture-bytes"
+    assert sha256 == hashlib.sha256(b"picture-bytes").hexdigest()
+    fileobj.seek.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_upload_larger_than_the_limit_is_413(async_test_client, mocker):
+    """
+    Test that an upload over PROFILE_PIC_MAX_BYTES is refused before anything is sent to S3.
+    """
+    mocker.patch("app.user.service.PROFILE_PIC_MAX_BYTES", 8)
+    exchange = mocker.patch("app.user.service.user_utils.get_identity_credentials_with_userpool_token")
+
+    response = await async_test_client.post("/user/profile/picture", files={"file": ("me.png", b"too-many-bytes", "image/png")})
+
+    assert response.status_code == 413
+    exchange.assert_not_called()
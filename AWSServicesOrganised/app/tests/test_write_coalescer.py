@@ -0,0 +1,137 @@
+import asyncio
+import threading
+
+import pytest
+
+from botocore.exceptions import ClientError
+
+from app import batch_write, config, write_coalescer
+from app.storage import repository as storage
+from benchmarks.harness import seed_user, auth_headers
+
+
+class StubDynamoDB:
+    """
+    Records BatchWriteItem sizes; items with a "bad" field fail validation.
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.single_puts = []
+
+    def batch_write_item(self, RequestItems):
+        unprocessed = {}
+        for table, requests in RequestItems.items():
+            items = [r["PutRequest"]["Item"] for r in requests]
+            if any("bad" in item for item in items):
+                raise ClientError({"Error": {"Code": "ValidationException", "Message": "bad item"}}, "BatchWriteItem")
+            self.batches.append((table, len(items)))
+            # Items marked "throttled" are never accepted; DynamoDB hands back copies
+            left = [{"PutRequest": {"Item": dict(item)}} for item in items if "throttled" in item]
+            if left:
+                unprocessed[table] = left
+        return {"UnprocessedItems": unprocessed}
+
+    def Table(self, name):
+        stub = self
+
+        class Table:
+            def put_item(self, Item):
+                if "bad" in Item:
+                    raise ClientError({"Error": {"Code": "ValidationException", "Message": "bad item"}}, "PutItem")
+                stub.single_puts.append(Item["id"])
+        return Table()
+
+
+def put_concurrently(coalescer, dynamodb, items: list, group="identity-1") -> list:
+    outcomes = [None] * len(items)
+
+    def put(i, item):
+        try:
+            coalescer.put(dynamodb, "table", item, group)
+            outcomes[i] = "ok"
+        except ClientError as e:
+            outcomes[i] = e.response["Error"]["Code"]
+        except batch_write.UnprocessedItemsError:
+            outcomes[i] = "unprocessed"
+
+    threads = [threading.Thread(target=put, args=(i, item)) for i, item in enumerate(items)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outcomes
+
+
+def test_concurrent_puts_share_batches_of_at_most_25():
+    """
+    Test that 30 concurrent puts go out as a full batch of 25 and one of 5.
+    """
+    dynamodb = StubDynamoDB()
+    outcomes = put_concurrently(write_coalescer.WriteCoalescer(window=0.2), dynamodb, [{"id": str(i)} for i in range(30)])
+
+    assert outcomes == ["ok"] * 30
+    assert sorted(size for _, size in dynamodb.batches) == [5, 25]
+
+
+def test_groups_are_never_mixed():
+    """
+    Test that puts with different credentials groups are sent in separate batches.
+    """
+    dynamodb = StubDynamoDB()
+    coalescer = write_coalescer.WriteCoalescer(window=0.1)
+    threads = [threading.Thread(target=coalescer.put, args=(dynamodb, "table", {"id": str(i)}, f"identity-{i % 2}")) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(size for _, size in dynamodb.batches) == [3, 3]
+
+
+def test_rejected_batch_gives_each_caller_its_own_answer():
+    """
+    Test that one invalid item fails only its own caller, while the rest are still written.
+    """
+    dynamodb = StubDynamoDB()
+    items = [{"id": "0"}, {"id": "1", "bad": True}, {"id": "2"}]
+
+    outcomes = put_concurrently(write_coalescer.WriteCoalescer(window=0.1), dynamodb, items)
+
+    assert outcomes == ["ok", "ValidationException", "ok"]
+    assert sorted(dynamodb.single_puts) == ["0", "2"]
+
+
+def test_unprocessed_items_fail_only_their_own_callers(mocker):
+    """
+    Test that when DynamoDB keeps some items of a batch unprocessed, only those callers get the error.
+    """
+    mocker.patch.object(batch_write.time, "sleep")
+    dynamodb = StubDynamoDB()
+    items = [{"id": "0"}, {"id": "1", "throttled": True}, {"id": "2"}]
+
+    outcomes = put_concurrently(write_coalescer.WriteCoalescer(window=0.1), dynamodb, items)
+
+    assert outcomes == ["ok", "unprocessed", "ok"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_creates_of_one_user_become_one_batch(async_test_client, fake_aws, mocker):
+    """
+    Test that concurrent POST /asset/ with coalescing on are written with a single BatchWriteItem.
+    """
+    mocker.patch.object(storage, "WRITE_COALESCING", True)
+    mocker.patch.object(write_coalescer._coalescer, "window", 0.2)
+    user = seed_user(fake_aws, "coalesce-user")
+    # Exchange credentials first, so the creates reach the coalescer together
+    await async_test_client.get("/asset/", headers=auth_headers(user))
+
+    responses = await asyncio.gather(*(
+        async_test_client.post("/asset/", headers=auth_headers(user), json={"category": "stocks", "title": f"t{i}", "asset_value": i})
+        for i in range(5)
+    ))
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert fake_aws.calls[("dynamodb", "BatchWriteItem")] == 1
+    assert fake_aws.calls[("dynamodb", "PutItem")] == 0
+    assert len(fake_aws.dynamodb.items(config.DynamoDB_ASSET_DETAILS_TABLE)) == 5
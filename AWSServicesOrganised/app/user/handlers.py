@@ -3,21 +3,37 @@ from fastapi.security import OAuth2PasswordBearer
 
 from app.user import service as user_service
 from app.user import utils as user_utils
-from app.models import UserProfile, UserProfileFull
+from app.models import UserProfile, UserProfileUpdate, UserProfileFull, ProfilePictureUploadRequest, ProfilePictureUploadComplete
 
 router = APIRouter()
 
 
 @router.post("/profile/picture", response_model=dict)
-async def upload_profile_picture(
+def upload_profile_picture(
     file: UploadFile = File(...),
     current_user: dict = Depends(user_utils.get_current_user_id)
     ):
     return user_service.upload_pic(file, current_user)
 
 
+@router.post("/profile/picture/upload-url", response_model=dict)
+def create_profile_picture_upload_url(
+    upload: ProfilePictureUploadRequest,
+    current_user: dict = Depends(user_utils.get_current_user_id)
+    ):
+    return user_service.create_profile_picture_upload_url(upload, current_user)
+
+
+@router.post("/profile/picture/complete", response_model=dict)
+def complete_profile_picture_upload(
+    upload: ProfilePictureUploadComplete,
+    current_user: dict = Depends(user_utils.get_current_user_id)
+    ):
+    return user_service.complete_profile_picture_upload(upload, current_user)
+
+
 @router.get("/profile/picture", response_model=dict)
-async def get_profile_picture(
+def get_profile_picture(
      request: Request,
     current_user: dict = Depends(user_utils.get_current_user_id)
     ):
@@ -25,15 +41,23 @@ async def get_profile_picture(
 
 
 @router.put("/profile", response_model=dict)
-async def update_profile_details(
+def update_profile_details(
     profile: UserProfile,
     current_user: dict = Depends(user_utils.get_current_user_id)
     ):
     return user_service.update_profile_details(profile, current_user)
 
 
+@router.patch("/profile", response_model=dict)
+def patch_profile_details(
+    profile: UserProfileUpdate,
+    current_user: dict = Depends(user_utils.get_current_user_id)
+    ):
+    return user_service.patch_profile_details(profile, current_user)
+
+
 @router.get("/profile", response_model=UserProfileFull)
-async def get_profile_details(
+def get_profile_details(
     current_user: dict = Depends(user_utils.get_current_user_id)
     ):
     return user_service.get_profile_details(current_user)
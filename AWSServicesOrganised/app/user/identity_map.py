@@ -0,0 +1,111 @@
+"""
+Durable map of user pool sub -> Cognito Identity identity id.
+
+A user's identity id never changes, so GetId only has to run the first time
+a user is seen; after that the exchange is a single GetCredentialsForIdentity.
+SQLiteIdentityMap keeps the map in a local file shared by the workers of one
+host; DynamoDBIdentityMap keeps it in a table shared by every instance.
+Select one with IDENTITY_MAP_STORE ("none" turns the map off). app.user.utils
+keeps the ids it has seen in memory on top.
+
+A wrong entry can't hand out someone else's credentials: Cognito only
+returns credentials for an identity the presented ID token belongs to.
+"""
+import sqlite3
+import threading
+
+from app.config import IDENTITY_MAP_STORE, IDENTITY_MAP_DB_PATH, DynamoDB_IDENTITY_MAP_TABLE
+
+
+class SQLiteIdentityMap:
+    """
+    The map in SQLite. One connection is shared behind a lock; WAL lets other
+    processes read while one writes.
+    """
+
+    def __init__(self, path: str = IDENTITY_MAP_DB_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS identity_ids (sub TEXT PRIMARY KEY, identity_id TEXT)")
+
+    def get(self, sub: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT identity_id FROM identity_ids WHERE sub = ?", (sub,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, sub: str, identity_id: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO identity_ids VALUES (?, ?)", (sub, identity_id))
+
+    def forget(self, sub: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM identity_ids WHERE sub = ?", (sub,))
+
+
+class DynamoDBIdentityMap:
+    """
+    The map in a DynamoDB table keyed by sub, written with the service's own
+    credentials.
+    """
+
+    def __init__(self, table_name: str = DynamoDB_IDENTITY_MAP_TABLE):
+        from app import clients
+
+        self.table_name = table_name
+        self._client = clients.get_client("dynamodb")
+
+    def get(self, sub: str) -> str:
+        response = self._client.get_item(TableName=self.table_name, Key={"sub": {"S": sub}}, ProjectionExpression="identity_id")
+        item = response.get("Item")
+        return item["identity_id"]["S"] if item else None
+
+    def put(self, sub: str, identity_id: str):
+        self._client.put_item(TableName=self.table_name, Item={"sub": {"S": sub}, "identity_id": {"S": identity_id}})
+
+    def forget(self, sub: str):
+        self._client.delete_item(TableName=self.table_name, Key={"sub": {"S": sub}})
+
+
+class NoIdentityMap:
+    """
+    Remembers nothing, so every new process calls GetId again.
+    """
+
+    def get(self, sub: str) -> str:
+        return None
+
+    def put(self, sub: str, identity_id: str):
+        pass
+
+    def forget(self, sub: str):
+        pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if IDENTITY_MAP_STORE == "dynamodb":
+                    _store = DynamoDBIdentityMap()
+                elif IDENTITY_MAP_STORE == "none":
+                    _store = NoIdentityMap()
+                else:
+                    _store = SQLiteIdentityMap()
+    return _store
+
+
+def reset_store():
+    """
+    Drops the open store, mainly for tests.
+    """
+    global _store
+    with _store_lock:
+        _store = None
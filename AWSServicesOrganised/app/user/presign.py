@@ -0,0 +1,72 @@
+import logging
+
+from app import clients
+from app.cache import TTLCache
+from app.config import S3_BUCKET_NAME, S3_REGION, PRESIGNED_URL_EXPIRES_IN, PRESIGNED_URL_REFRESH_MARGIN, PROFILE_PIC_MAX_BYTES, PRESIGNED_POST_EXPIRES_IN
+
+
+logger = logging.getLogger(__name__)
+
+# username -> (s3 key, presigned url), dropped shortly before the URL expires. Shared and read
+# through the daemon, so a new picture uploaded on one worker invalidates the URL for all of them.
+_url_cache = TTLCache("presigned_urls", ttl=PRESIGNED_URL_EXPIRES_IN - PRESIGNED_URL_REFRESH_MARGIN, shared=True, local_ttl=0)
+
+
+def get_signer():
+    """
+    Returns the pooled S3 client used for signing URLs.
+    """
+    return clients.get_client("s3", S3_REGION, signature_version="s3v4")
+
+
+def get_cached_profile_picture_url(username: str, key: str = None):
+    """
+    Returns the cached presigned URL for a user's profile picture, if still fresh.
+    When key is given the cached URL is only returned if it was signed for that key.
+    """
+    entry = _url_cache.get(username)
+    if entry is None:
+        return None
+    cached_key, url = entry
+    if key is not None and cached_key != key:
+        return None
+    return url
+
+
+def sign_profile_picture_url(username: str, key: str) -> str:
+    """
+    Signs a GET URL for the given profile picture key and caches it for the user.
+    """
+    url = get_signer().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': S3_BUCKET_NAME, 'Key': key},
+        ExpiresIn=PRESIGNED_URL_EXPIRES_IN
+    )
+    _url_cache.set(username, (key, url))
+    logger.debug("Signed profile picture URL for %s", username)
+    return url
+
+
+def invalidate_profile_picture_url(username: str):
+    """
+    Forgets the cached URL, e.g. after the user uploads a new picture.
+    """
+    _url_cache.pop(username)
+
+
+def sign_profile_picture_upload(key: str, content_type: str) -> dict:
+    """
+    Builds a presigned POST policy that lets the browser upload one image
+    straight to S3 under the given key, bounded in type and size.
+    """
+    return get_signer().generate_presigned_post(
+        Bucket=S3_BUCKET_NAME,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["starts-with", "$Content-Type", "image/"],
+            ["content-length-range", 1, PROFILE_PIC_MAX_BYTES],
+        ],
+        ExpiresIn=PRESIGNED_POST_EXPIRES_IN
+    )
@@ -1,18 +1,68 @@
 import boto3
 import botocore
+import io
 import uuid
+import hashlib
 import logging
 
 from boto3.session import Session
 from fastapi import HTTPException, Depends, UploadFile, File
 
-from app.config import CLIENT_ID, REGION, USERPOOL_ID, S3_BUCKET_NAME, S3_REGION, S3_BASE_URL, S3_PROFILE_PIC_FOLDER, DynamoDB_USER_DETAILS_TABLE, AWS_ACCOUNT_ID, IDENTITYPOOL_ID
+from app.config import CLIENT_ID, REGION, USERPOOL_ID, S3_BUCKET_NAME, S3_REGION, S3_BASE_URL, S3_PROFILE_PIC_FOLDER, DynamoDB_USER_DETAILS_TABLE, AWS_ACCOUNT_ID, IDENTITYPOOL_ID, PROFILE_CACHE_TTL, PROFILE_PIC_MAX_BYTES
+from app import aws_policy
 from app.user import utils as user_utils
-from app.models import UserProfile
+from app.user import presign
+from app.cache import TTLCache
+from app.models import UserProfile, UserProfileUpdate, ProfilePictureUploadRequest, ProfilePictureUploadComplete
 
 
 logger = logging.getLogger(__name__)
 
+# username -> profile item, written through on every profile update. Shared and read through
+# the daemon, so no worker serves a profile another worker has since changed.
+_profile_cache = TTLCache("profiles", ttl=PROFILE_CACHE_TTL, shared=True, local_ttl=0)
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _read_picture(fileobj) -> tuple:
+    """
+    Reads an uploaded picture once, hashing each chunk as it is read, and
+    returns (content, sha256). The content is sent to S3 from memory, so the
+    spooled upload is never read a second time; pictures are capped at
+    PROFILE_PIC_MAX_BYTES, as direct uploads are.
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        size += len(chunk)
+        if size > PROFILE_PIC_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Profile picture is too large.")
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+def _update_existing_profile(table, current_user: dict, **update) -> dict:
+    """
+    Updates attributes of an existing profile, raising 404 rather than
+    creating a partial profile item that GET /profile can't return.
+    """
+    try:
+        return table.update_item(
+            Key={"userName": current_user['username']},
+            ConditionExpression="attribute_exists(userName)",
+            ReturnValues="ALL_NEW",
+            **update
+        )
+    except botocore.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            logger.warning("[%s] User profile not found", current_user['username'])
+            raise HTTPException(status_code=404, detail="User profile not found")
+        raise
+
 
 def upload_pic(
     file: UploadFile = File(...),
@@ -20,14 +70,26 @@ def upload_pic(
     ):
     """
     Uploads a profile picture to S3 and returns the S3 key and public URL.
+    Re-uploads of the current picture are detected by SHA-256 and skip the S3 PUT.
     """
-    logger.info(f"[{current_user['username']}] Uploading profile picture: {file.filename}")
+    logger.info("[%s] Uploading profile picture: %s", current_user['username'], file.filename)
     try:
         if not file.content_type.startswith("image/"):
-            logger.warning(f"[{current_user['username']}] Invalid file type: {file.content_type}")
+            logger.warning("[%s] Invalid file type: %s", current_user['username'], file.content_type)
             raise HTTPException(status_code=400, detail="Invalid file type. Only images are allowed.")
+
+        content, content_sha256 = _read_picture(file.file)
+        # A picture can only be added to an existing profile; raises 404 before anything is uploaded
+        existing = get_profile_details(current_user)
+
+        if existing.get("profile_pic_key") and existing.get("profile_pic_sha256") == content_sha256:
+            logger.info("[%s] Profile picture unchanged, skipping upload", current_user['username'])
+            return {
+                "message": "Profile picture unchanged",
+                "s3_key": existing["profile_pic_key"],
+                "url": existing.get("profile_pic_url")}
         
-        session,identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])        
+        session,identity_id = user_utils.get_user_session(current_user, with_identity_id=True)
         s3_client = session.client("s3", region_name=S3_REGION)
 
         file_extension = file.filename.split('.')[-1]
@@ -35,54 +97,154 @@ def upload_pic(
         S3_BASE_URL = f"https://{S3_BUCKET_NAME}.s3.{S3_REGION}.amazonaws.com"
 
         s3_client.upload_fileobj(
-            file.file,
+            io.BytesIO(content),
             S3_BUCKET_NAME,
             unique_filename,
+            ExtraArgs={
+                "ContentType": file.content_type,
+                "Metadata": {"sha256": content_sha256}
+            }
         )
         
         file_public_url = f"{S3_BASE_URL}/{unique_filename}"
+
+        dynamodb = session.resource('dynamodb', region_name=REGION)
+        table = dynamodb.Table(DynamoDB_USER_DETAILS_TABLE)
+        response = _update_existing_profile(
+            table, current_user,
+            UpdateExpression="SET profile_pic_key = :key, profile_pic_url = :url, profile_pic_sha256 = :sha256",
+            ExpressionAttributeValues={
+                ":key": unique_filename,
+                ":url": file_public_url,
+                ":sha256": content_sha256
+            }
+        )
+        _profile_cache.set(current_user['username'], response['Attributes'])
+        presign.invalidate_profile_picture_url(current_user['username'])
         
-        logger.info(f"[{current_user['username']}] Profile picture uploaded successfully: {file_public_url}")
+        logger.info("[%s] Profile picture uploaded successfully: %s", current_user['username'], file_public_url)
         return {
             "message": "Profile picture uploaded successfully", 
             "s3_key": unique_filename,
             "url": file_public_url}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"[{current_user['username']}] Error uploading profile picture: {str(e)}")
+        logger.error("[%s] Error uploading profile picture: %s", current_user['username'], e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
  
 
-def get_profile_picture (
+def profile_picture_prefix(identity_id: str) -> str:
+    """
+    Returns the S3 prefix that holds a user's profile pictures.
+    """
+    return f"{S3_PROFILE_PIC_FOLDER}/{identity_id}/"
+
+
+def create_profile_picture_upload_url(
+    upload: ProfilePictureUploadRequest,
     current_user: dict = Depends(user_utils.get_current_user_id)
     ):
     """
-    Retrieves the profile picture URL from S3 for the current user.
+    Returns a presigned POST policy so the client uploads the picture directly to S3.
     """
-    logger.info(f"[{current_user['username']}] Fetching profile picture")
+    logger.info("[%s] Creating profile picture upload URL", current_user['username'])
     try:
-        key = f"profile_pic/eu-north-1:35185232-0d9f-c39d-baf9-59ace0bb1539/profile_pic.jpeg"
+        if not upload.content_type.startswith("image/"):
+            logger.warning("[%s] Invalid file type: %s", current_user['username'], upload.content_type)
+            raise HTTPException(status_code=400, detail="Invalid file type. Only images are allowed.")
+
+        _, identity_id = user_utils.get_user_session(current_user, with_identity_id=True)
+        file_extension = upload.filename.split('.')[-1]
+        key = f"{profile_picture_prefix(identity_id)}profile_pic.{file_extension}"
+
+        post = presign.sign_profile_picture_upload(key, upload.content_type)
+        logger.info("[%s] Profile picture upload URL created", current_user['username'])
+        return {
+            "message": "Profile picture upload URL created successfully",
+            "s3_key": key,
+            "url": post["url"],
+            "fields": post["fields"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("[%s] Error creating profile picture upload URL: %s", current_user['username'], e)
+        aws_policy.raise_if_throttled(e)
+        raise HTTPException(status_code=500, detail=str(e))
 
+
+def complete_profile_picture_upload(
+    upload: ProfilePictureUploadComplete,
+    current_user: dict = Depends(user_utils.get_current_user_id)
+    ):
+    """
+    Records a directly uploaded profile picture key in the user's DynamoDB profile.
+    """
+    logger.info("[%s] Completing profile picture upload", current_user['username'])
+    try:
+        session, identity_id = user_utils.get_user_session(current_user, with_identity_id=True)
+        if not upload.s3_key.startswith(profile_picture_prefix(identity_id)):
+            logger.warning("[%s] Upload key outside user prefix: %s", current_user['username'], upload.s3_key)
+            raise HTTPException(status_code=403, detail="Profile picture key does not belong to this user.")
+
+        s3_client = session.client("s3", region_name=S3_REGION)
         try:
-            session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
-            s3_client = session.client("s3", region_name=S3_REGION)
+            s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=upload.s3_key)
         except botocore.exceptions.ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code in ("404", "403"):
-                logger.warning(f"[{current_user['username']}] Profile picture does not exist or access forbidden: {str(e)}")
-                raise HTTPException(status_code=404, detail="Profile picture does not exist or access to profile picture forbidden.")
-            else:
-                logger.error(f"[{current_user['username']}] Error accessing S3: {str(e)}")
-                raise HTTPException(status_code=400, detail=str(e))
-
-        url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': S3_BUCKET_NAME, 'Key': key},
-            ExpiresIn=3600  # 1 hour
+            logger.warning("[%s] Uploaded profile picture not found: %s", current_user['username'], e)
+            raise HTTPException(status_code=404, detail="Uploaded profile picture does not exist.")
+
+        S3_BASE_URL = f"https://{S3_BUCKET_NAME}.s3.{S3_REGION}.amazonaws.com"
+        dynamodb = session.resource('dynamodb', region_name=REGION)
+        table = dynamodb.Table(DynamoDB_USER_DETAILS_TABLE)
+        response = _update_existing_profile(
+            table, current_user,
+            UpdateExpression="SET profile_pic_key = :key, profile_pic_url = :url, identity_id = :identity_id REMOVE profile_pic_sha256",
+            ExpressionAttributeValues={
+                ":key": upload.s3_key,
+                ":url": f"{S3_BASE_URL}/{upload.s3_key}",
+                ":identity_id": identity_id
+            }
         )
-        logger.info(f"[{current_user['username']}] Profile picture fetched successfully: {url}")
+        _profile_cache.set(current_user['username'], response['Attributes'])
+        presign.invalidate_profile_picture_url(current_user['username'])
+        logger.info("[%s] Profile picture recorded: %s", current_user['username'], upload.s3_key)
+        return {"message": "Profile picture uploaded successfully", "s3_key": upload.s3_key}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("[%s] Error completing profile picture upload: %s", current_user['username'], e)
+        aws_policy.raise_if_throttled(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def get_profile_picture (
+    current_user: dict = Depends(user_utils.get_current_user_id)
+    ):
+    """
+    Retrieves a presigned URL for the current user's profile picture.
+    The S3 key comes from the user's stored profile and signed URLs are cached
+    until shortly before they expire.
+    """
+    logger.info("[%s] Fetching profile picture", current_user['username'])
+    try:
+        url = presign.get_cached_profile_picture_url(current_user['username'])
+        if url is None:
+            profile = get_profile_details(current_user)
+            key = profile.get("profile_pic_key")
+            if not key:
+                logger.warning("[%s] No profile picture stored in profile", current_user['username'])
+                raise HTTPException(status_code=404, detail="Profile picture does not exist.")
+            url = presign.sign_profile_picture_url(current_user['username'], key)
+
+        logger.info("[%s] Profile picture fetched successfully", current_user['username'])
         return {"message": "Profile picture fetched succesfully", "profile_pic_url": url}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"[{current_user['username']}] Error fetching profile picture: {str(e)}")
+        logger.error("[%s] Error fetching profile picture: %s", current_user['username'], e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))    
 
 
@@ -94,36 +256,78 @@ def update_profile_details(
     Updates the user profile details in DynamoDB.
     """
     try:
-        logger.info(f"[{current_user['username']}] Updating profile details")
-        session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
+        logger.info("[%s] Updating profile details", current_user['username'])
+        session, identity_id = user_utils.get_user_session(current_user, with_identity_id=True)
         dynamodb = session.resource('dynamodb', region_name=REGION)
         table = dynamodb.Table(DynamoDB_USER_DETAILS_TABLE)
 
-        profile_pic_key = f"{S3_PROFILE_PIC_FOLDER}/{identity_id}/profile_pic.jpeg"
-        S3_BASE_URL = f"https://{S3_BUCKET_NAME}.s3.{S3_REGION}.amazonaws.com"        
-        profile_pic_url = f"{S3_BASE_URL}/{profile_pic_key}"
-
-        item = {
-            "userName": current_user['username'],
+        fields = {
             "sub": current_user['sub'],
             "name": profile.name,
             "height": profile.height,
             "gender": profile.gender,
             "dob": profile.dob,
-            "profile_pic_key":profile_pic_key,
-            "profile_pic_url": profile_pic_url,
             "identity_id": identity_id
         }
-
-        table.put_item(Item=item)
-        logger.info(f"[{current_user['username']}] Profile updated successfully")
+        # Only the profile fields are replaced; the picture attributes are set by the upload
+        # paths and are only initialised here, so a PUT never loses the stored key or hash
+        response = table.update_item(
+            Key={"userName": current_user['username']},
+            UpdateExpression="SET " + ", ".join(f"#{field} = :{field}" for field in fields)
+                + ", profile_pic_key = if_not_exists(profile_pic_key, :no_pic)"
+                + ", profile_pic_url = if_not_exists(profile_pic_url, :no_pic)",
+            ExpressionAttributeNames={f"#{field}": field for field in fields},
+            ExpressionAttributeValues={**{f":{field}": value for field, value in fields.items()}, ":no_pic": None},
+            ReturnValues="ALL_NEW"
+        )
+        _profile_cache.set(current_user['username'], response['Attributes'])
+        logger.info("[%s] Profile updated successfully", current_user['username'])
         return {"message": "Profile updated successfully"}
 
     except Exception as e:
-        logger.error(f"[{current_user['username']}] Error updating profile: {str(e)}")
+        logger.error("[%s] Error updating profile: %s", current_user['username'], e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))    
 
 
+def patch_profile_details(
+    profile: UserProfileUpdate,
+    current_user: dict = Depends(user_utils.get_current_user_id)
+    ):
+    """
+    Updates only the provided profile attributes in DynamoDB and caches the updated profile.
+    """
+    try:
+        logger.info("[%s] Patching profile details", current_user['username'])
+        changes = profile.model_dump(exclude_unset=True)
+        if not changes:
+            raise HTTPException(status_code=400, detail="No profile attributes to update.")
+
+        session, identity_id = user_utils.get_user_session(current_user, with_identity_id=True)
+        dynamodb = session.resource('dynamodb', region_name=REGION)
+        table = dynamodb.Table(DynamoDB_USER_DETAILS_TABLE)
+
+        changes["sub"] = current_user['sub']
+        changes["identity_id"] = identity_id
+        response = _update_existing_profile(
+            table, current_user,
+            UpdateExpression="SET " + ", ".join(f"#{field} = :{field}" for field in changes),
+            ExpressionAttributeNames={f"#{field}": field for field in changes},
+            ExpressionAttributeValues={f":{field}": value for field, value in changes.items()}
+        )
+        item = response['Attributes']
+        _profile_cache.set(current_user['username'], item)
+        logger.info("[%s] Profile patched successfully", current_user['username'])
+        return item
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("[%s] Error patching profile: %s", current_user['username'], e)
+        aws_policy.raise_if_throttled(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 def get_profile_details(
     current_user: dict = Depends(user_utils.get_current_user_id)
     ):
@@ -131,17 +335,25 @@ def get_profile_details(
     Retrieves the user profile details from DynamoDB.
     """
     try:
-        logger.info(f"[{current_user['username']}] Fetching user profile details")
+        logger.info("[%s] Fetching user profile details", current_user['username'])
         username = current_user['username']
-        session, identity_id = user_utils.get_identity_credentials_with_userpool_token(current_user['id_token'])
+        item = _profile_cache.get(username)
+        if item is not None:
+            return item
+
+        session, _ = user_utils.get_user_session(current_user)
         dynamodb = session.resource('dynamodb', region_name=REGION)
         table = dynamodb.Table(DynamoDB_USER_DETAILS_TABLE)
         response = table.get_item(Key={"userName": username})
         if 'Item' not in response:
-            logger.warning(f"[{current_user['username']}] User profile not found")
+            logger.warning("[%s] User profile not found", current_user['username'])
             raise HTTPException(status_code=404, detail="User profile not found")
+        _profile_cache.set(username, response['Item'])
         return response['Item']
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"[{current_user['username']}] Error fetching user profile details: {str(e)}")
+        logger.error("[%s] Error fetching user profile details: %s", current_user['username'], e)
+        aws_policy.raise_if_throttled(e)
         raise HTTPException(status_code=500, detail=str(e))
 
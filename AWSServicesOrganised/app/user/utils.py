@@ -1,29 +1,65 @@
-import requests
-import boto3
+import time
+import hashlib
+import logging
+import datetime
 
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from botocore.exceptions import ClientError
 
-from app.auth import service as auth_service
-from app.config import REGION, USERPOOL_ID, CLIENT_ID, IDENTITYPOOL_ID
+from app import clients
+from app.cache import TTLCache
+from app.singleflight import SingleFlight
+from app.user import identity_map
+from app.config import REGION, USERPOOL_ID, CLIENT_ID, IDENTITYPOOL_ID, TOKEN_CACHE_TTL, CREDENTIALS_REFRESH_MARGIN
 
 
+logger = logging.getLogger(__name__)
 _jwks = None
+# Both are keyed by the token's SHA-256 and shared across workers when app.server runs the cache daemon
+_token_cache = TTLCache("verified_tokens", ttl=TOKEN_CACHE_TTL, shared=True)
+_credentials_cache = TTLCache("identity_credentials", ttl=3600, shared=True)
+_exchange_flight = SingleFlight("identity_exchange")
+# sub -> Cognito identity id, which never changes for a user; backed by app.user.identity_map
+_identity_ids = TTLCache("identity_ids", ttl=86400, shared=True)
+_identity_id_flight = SingleFlight("identity_id")
+# What GetCredentialsForIdentity answers for an identity id that doesn't belong to the token
+STALE_IDENTITY_ERRORS = ("NotAuthorizedException", "ResourceNotFoundException")
 JWKS_URL = f"https://cognito-idp.{REGION}.amazonaws.com/{USERPOOL_ID}/.well-known/jwks.json"
 
 
 def get_jwks() -> dict:
     global _jwks
     if not _jwks:
+        import requests
+
         _jwks = requests.get(JWKS_URL).json()
     return _jwks
 
 
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_verified_user(token: str) -> dict:
+    """
+    Returns the user of a token this process has already verified, or None.
+    It never verifies the token or asks the shared cache, so it is cheap
+    enough for the event loop.
+    """
+    return _token_cache.get_local(token_key(token))
+
+
 def get_current_user_id(request: Request) -> dict:
     token = request.cookies.get("id_token") or request.headers.get("Authorization")
     if not token:
         raise HTTPException(status_code=401, detail="Id token missing in cookies or Authorization header")
+
+    cache_key = token_key(token)
+    cached = _token_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached, id_token=token)
     try:
         # Decode as usual (assumes ID token passed in Authorization header)
         jwks = get_jwks()
@@ -47,13 +83,15 @@ def get_current_user_id(request: Request) -> dict:
         else:
             cognito_groups = None
 
-        return {
+        current_user = {
             "username": payload.get("cognito:username"),
             "sub": payload.get("sub"),
             "scope": payload.get("scope"),
             "cognito:groups": cognito_groups,
-            "id_token": token
         }
+        # Never cache a verified token past its own expiry
+        _token_cache.set(cache_key, current_user, min(TOKEN_CACHE_TTL, payload["exp"] - time.time()))
+        return dict(current_user, id_token=token)
 
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Token error: {str(e)}")
@@ -66,8 +104,8 @@ def require_admin(current_user: dict = Depends(get_current_user_id)):
     return current_user
 
 
-def get_identity_credentials_with_userpool_token(user_pool_token: str):
-    cognito_identity_client = boto3.client("cognito-identity", region_name=REGION)
+def _get_identity_id(user_pool_token: str) -> str:
+    cognito_identity_client = clients.get_client("cognito-identity", REGION)
     USER_POOL_PROVIDER = f"cognito-idp.{REGION}.amazonaws.com/{USERPOOL_ID}"
 
     identity_response = cognito_identity_client.get_id(
@@ -76,21 +114,87 @@ def get_identity_credentials_with_userpool_token(user_pool_token: str):
             USER_POOL_PROVIDER: user_pool_token
         }
     )
-    identity_id = identity_response['IdentityId']
+    return identity_response['IdentityId']
 
-    credentials_response = cognito_identity_client.get_credentials_for_identity(
-        IdentityId=identity_id,
-        Logins={
-            USER_POOL_PROVIDER: user_pool_token
-        }
-    )
-    creds = credentials_response['Credentials']
 
-    session = boto3.Session(
-        aws_access_key_id=creds['AccessKeyId'],
-        aws_secret_access_key=creds['SecretKey'],
-        aws_session_token=creds['SessionToken']
-    )
+def _load_identity_id(user_pool_token: str, sub: str) -> str:
+    store = identity_map.get_store()
+    identity_id = store.get(sub)
+    if identity_id is None:
+        identity_id = _get_identity_id(user_pool_token)
+        store.put(sub, identity_id)
+    _identity_ids.set(sub, identity_id)
+    return identity_id
+
+
+def get_identity_id(user_pool_token: str, sub: str) -> str:
+    """
+    Returns the user's Cognito identity id from memory or the identity map,
+    calling GetId only for a user seen for the first time.
+    """
+    identity_id = _identity_ids.get(sub)
+    if identity_id is None:
+        identity_id = _identity_id_flight.do(sub, _load_identity_id, user_pool_token, sub)
+    return identity_id
 
-    return session, identity_id
 
+def _exchange_identity_credentials(user_pool_token: str) -> tuple:
+    cognito_identity_client = clients.get_client("cognito-identity", REGION)
+    USER_POOL_PROVIDER = f"cognito-idp.{REGION}.amazonaws.com/{USERPOOL_ID}"
+    sub = jwt.get_unverified_claims(user_pool_token)["sub"]
+
+    for attempt in range(2):
+        identity_id = get_identity_id(user_pool_token, sub)
+        try:
+            credentials_response = cognito_identity_client.get_credentials_for_identity(
+                IdentityId=identity_id,
+                Logins={
+                    USER_POOL_PROVIDER: user_pool_token
+                }
+            )
+            return identity_id, credentials_response['Credentials']
+        except ClientError as e:
+            if attempt or e.response.get("Error", {}).get("Code") not in STALE_IDENTITY_ERRORS:
+                raise
+            # A remembered id that no longer fits the token, e.g. after the identity pool was replaced
+            logger.warning("Identity id %s rejected for sub %s, looking it up again: %s", identity_id, sub, e)
+            _identity_ids.pop(sub)
+            identity_map.get_store().forget(sub)
+
+
+def _exchange_and_cache(user_pool_token: str, cache_key: str) -> tuple:
+    identity_id, creds = _exchange_identity_credentials(user_pool_token)
+    cached = (identity_id, {name: creds[name] for name in ("AccessKeyId", "SecretKey", "SessionToken")})
+    # Refresh ahead of the credentials' expiry, and never outlive the token that was exchanged
+    now = datetime.datetime.now(datetime.timezone.utc)
+    ttl = (creds['Expiration'] - now).total_seconds() - CREDENTIALS_REFRESH_MARGIN
+    ttl = min(ttl, jwt.get_unverified_claims(user_pool_token)["exp"] - time.time())
+    _credentials_cache.set(cache_key, cached, ttl)
+    return cached
+
+
+def get_identity_credentials_with_userpool_token(user_pool_token: str):
+    cache_key = token_key(user_pool_token)
+    cached = _credentials_cache.get(cache_key)
+    if cached is None:
+        # Concurrent requests with the same token (e.g. dashboard fan-out) share one exchange
+        cached = _exchange_flight.do(cache_key, _exchange_and_cache, user_pool_token, cache_key)
+    identity_id, creds = cached
+
+    # Reused while the credentials last; a new boto3.Session per request reloads every service model
+    return clients.get_identity_session(creds), identity_id
+
+
+def get_user_session(current_user: dict, with_identity_id: bool = False) -> tuple:
+    """
+    Returns (session, identity_id) for reaching the user's data.
+
+    In the default identity mode that is the user's own Cognito Identity
+    session. With DATA_ACCESS_MODE=pooled it is the service session shared by
+    every user, and the identity id (used in item attributes and S3 keys) is
+    only looked up when asked for; otherwise it is None.
+    """
+    if not clients.pooled_access():
+        return get_identity_credentials_with_userpool_token(current_user['id_token'])
+    identity_id = get_identity_id(current_user['id_token'], current_user['sub']) if with_identity_id else None
+    return clients.get_service_session(), identity_id
@@ -0,0 +1,139 @@
+"""
+Write coalescing: single puts from concurrent requests are held for up to
+WRITE_COALESCE_WINDOW seconds and sent together as one BatchWriteItem of up
+to 25 items.
+
+put() only returns once DynamoDB has accepted the caller's item (unprocessed
+items are retried first), and raises that item's own error otherwise, so a
+coalesced put is exactly as durable as a put_item. The first caller of a
+batch waits out the window and sends it; the caller that fills it to 25
+sends it at once. No extra threads are involved.
+
+Puts are only batched within a group, which must share credentials: every
+user writes with their own identity credentials, so the group is the
+identity id.
+"""
+import time
+import logging
+import threading
+
+from concurrent.futures import Future
+from typing import Hashable
+
+from botocore.exceptions import ClientError
+
+from app.batch_write import MAX_BATCH_SIZE, UnprocessedItemsError, write_batch
+from app.metrics.registry import Histogram
+from app.config import WRITE_COALESCE_WINDOW
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = Histogram(
+    "app_coalesced_write_batch_size",
+    "Items per BatchWriteItem sent by the write coalescer.",
+    ("table",),
+    buckets=(1, 2, 5, 10, 15, 20, 25),
+)
+
+
+class _Batch:
+    def __init__(self, dynamodb, table_name: str):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.entries = []
+
+
+class WriteCoalescer:
+    """
+    Pending batches keyed by (group, table). Thread-safe; callers block in
+    put() until their batch is written.
+    """
+
+    def __init__(self, window: float = WRITE_COALESCE_WINDOW):
+        self.window = window
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def put(self, dynamodb, table_name: str, item: dict, group: Hashable):
+        """
+        Puts one item through a boto3 DynamoDB resource, batched with
+        concurrent puts of the same group and table. Items of one batch must
+        have distinct keys, which holds for newly generated ids.
+        """
+        key = (group, table_name)
+        future = Future()
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = _Batch(dynamodb, table_name)
+            batch.entries.append((item, future))
+            full = len(batch.entries) >= MAX_BATCH_SIZE
+            if full:
+                del self._pending[key]
+
+        if full:
+            self._send(batch)
+        elif leader:
+            time.sleep(self.window)
+            with self._lock:
+                # Unless a follower filled the batch and sent it meanwhile
+                send = self._pending.get(key) is batch
+                if send:
+                    del self._pending[key]
+            if send:
+                self._send(batch)
+        future.result()
+
+    def _send(self, batch: _Batch):
+        items = [item for item, _ in batch.entries]
+        WRITE_BATCH_SIZE.observe((batch.table_name,), len(items))
+        try:
+            write_batch(batch.dynamodb, batch.table_name, items)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ValidationException" and len(items) > 1:
+                # One invalid item fails the whole batch, so give every caller its own answer
+                logger.warning("Coalesced batch of %s items was rejected, retrying them one by one: %s", len(items), e)
+                self._send_one_by_one(batch)
+                return
+            self._fail(batch, e)
+            return
+        except UnprocessedItemsError as e:
+            # The rest were written; failing them too would make their callers retry into duplicates
+            logger.error("Coalesced write to %s left %s of %s items unprocessed", batch.table_name, len(e.items), len(items))
+            for item, future in batch.entries:
+                if any(item is left for left in e.items):
+                    future.set_exception(e)
+                else:
+                    future.set_result(None)
+            return
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        for _, future in batch.entries:
+            future.set_result(None)
+
+    def _send_one_by_one(self, batch: _Batch):
+        table = batch.dynamodb.Table(batch.table_name)
+        for item, future in batch.entries:
+            try:
+                table.put_item(Item=item)
+                future.set_result(None)
+            except Exception as e:
+                future.set_exception(e)
+
+    def _fail(self, batch: _Batch, error: Exception):
+        logger.error("Coalesced write of %s items to %s failed: %s", len(batch.entries), batch.table_name, error)
+        for _, future in batch.entries:
+            future.set_exception(error)
+
+
+_coalescer = WriteCoalescer()
+
+
+def put(dynamodb, table_name: str, item: dict, group: Hashable):
+    """
+    Puts an item through the shared coalescer.
+    """
+    _coalescer.put(dynamodb, table_name, item, group)
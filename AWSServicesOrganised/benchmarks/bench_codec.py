@@ -0,0 +1,94 @@
+"""
+Compares decoding a page of DynamoDB items the way the boto3 resource layer
+does (TypeDeserializer into Decimal, then Decimal(str(...)) for totals) with
+app.storage.codec, for the list path (plain dicts) and the portfolio path
+(models and exact totals).
+
+Both start from the attribute values botocore parses off the wire, so only
+the decoding is timed.
+
+Run from AWSServicesOrganised/:
+    python -m benchmarks.bench_codec --items 10000 --repeat 10
+"""
+import argparse
+import datetime
+import time
+import uuid
+
+from decimal import Decimal
+
+from benchmarks.harness import configure_environment
+
+configure_environment()
+
+from boto3.dynamodb.types import TypeDeserializer  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.models import AssetBase  # noqa: E402
+from app.storage import codec  # noqa: E402
+
+
+def wire_items(count: int) -> list:
+    """
+    A page of asset items as the low-level client returns them.
+    """
+    created_at = datetime.datetime.utcnow().isoformat()
+    return [{
+        "asset_id": {"S": str(uuid.uuid4())}, "category": {"S": "stocks"}, "title": {"S": f"Asset {i}"},
+        "asset_value": {"N": f"{1000.5 + i}"}, "created_at": {"S": created_at},
+    } for i in range(count)]
+
+
+def resource_list(items: list) -> list:
+    deserializer = TypeDeserializer()
+    return [{name: deserializer.deserialize(value) for name, value in item.items()} for item in items]
+
+
+def codec_list(items: list) -> list:
+    return [codec.decode_item(item) for item in items]
+
+
+_assets_adapter = TypeAdapter(list[AssetBase])
+
+
+def resource_portfolio(items: list) -> tuple:
+    assets = _assets_adapter.validate_python(resource_list(items))
+    return assets, float(sum(Decimal(str(a.asset_value)) for a in assets))
+
+
+def codec_portfolio(items: list) -> tuple:
+    assets, total = codec.decode_holdings("asset", items)
+    return assets, codec.from_fixed(total)
+
+
+def items_per_second(decode, items: list, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(items)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return len(items) / timings[len(timings) // 2]
+
+
+def run(counts: list, repeat: int):
+    print(f"{'items':>7} {'path':<12}{'resource/s':>14}{'codec/s':>14}{'speedup':>9}")
+    for count in counts:
+        items = wire_items(count)
+        assert resource_portfolio(items)[1] == codec_portfolio(items)[1]
+        for path, resource, fast in (("list", resource_list, codec_list), ("portfolio", resource_portfolio, codec_portfolio)):
+            slow_rate = items_per_second(resource, items, repeat)
+            fast_rate = items_per_second(fast, items, repeat)
+            print(f"{count:>7} {path:<12}{slow_rate:>14,.0f}{fast_rate:>14,.0f}{fast_rate / slow_rate:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", default="1000,10000", help="comma separated page sizes")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run([int(c) for c in args.items.split(",")], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
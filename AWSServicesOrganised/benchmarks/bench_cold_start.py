@@ -0,0 +1,153 @@
+"""
+Measures cold start: `import app.main` time (via python -X importtime) and the
+latency of the first request, each in a fresh interpreter, as the median of
+several runs. Can be tracked against a saved baseline as a regression metric.
+
+Run from AWSServicesOrganised/:
+    python -m benchmarks.bench_cold_start --runs 5
+    python -m benchmarks.bench_cold_start --save-baseline before
+    python -m benchmarks.bench_cold_start --compare before --max-regression 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.harness import BENCH_ENVIRONMENT
+
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST_SCRIPT = """
+import time, logging
+start = time.perf_counter()
+from benchmarks.harness import configure_environment, start_fake_aws, seed_user, auth_headers
+configure_environment()
+logging.disable(logging.INFO)
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+fake = start_fake_aws()
+user = seed_user(fake, "cold-start-user", holdings=1)
+ready = time.perf_counter()
+with TestClient(app) as client:
+    response = client.get("/asset/", headers=auth_headers(user))
+done = time.perf_counter()
+assert response.status_code == 200, response.text
+print((imported - start) * 1000, (done - ready) * 1000)
+"""
+
+
+def _environment() -> dict:
+    env = dict(os.environ)
+    for name, value in BENCH_ENVIRONMENT.items():
+        env.setdefault(name, value)
+    env.setdefault("AWS_DEFAULT_REGION", env["REGION"])
+    return env
+
+
+def measure_import(env: dict) -> tuple:
+    """
+    Returns the cumulative import time of app.main in ms and its slowest direct imports.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[1].strip().isdigit():
+            continue
+        entries.append((int(parts[1]), parts[2].rstrip()))
+    index = next(i for i, (_, name) in enumerate(entries) if name.strip() == "app.main")
+    total, main_name = entries[index]
+    depth = len(main_name) - len(main_name.lstrip())
+    # Children are printed before their parent, two spaces deeper
+    children = []
+    for cumulative, name in reversed(entries[:index]):
+        child_depth = len(name) - len(name.lstrip())
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 2:
+            children.append((cumulative, name.strip()))
+    top = sorted(children, reverse=True)[:5]
+    return total / 1000, [(name, cumulative / 1000) for cumulative, name in top]
+
+
+def measure_first_request(env: dict) -> tuple:
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST_SCRIPT],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    import_ms, first_request_ms = result.stdout.split()[-2:]
+    return float(import_ms), float(first_request_ms)
+
+
+def run(runs: int) -> tuple:
+    env = _environment()
+    import_times, first_requests, app_imports = [], [], []
+    top = []
+    for _ in range(runs):
+        total, top = measure_import(env)
+        import_times.append(total)
+        app_import, first_request = measure_first_request(env)
+        app_imports.append(app_import)
+        first_requests.append(first_request)
+    results = {
+        "import_ms": statistics.median(import_times),
+        "app_import_ms": statistics.median(app_imports),
+        "first_request_ms": statistics.median(first_requests),
+    }
+    return results, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--max-regression", type=float, metavar="PCT",
+                        help="exit non-zero if any metric is this many percent slower than the baseline")
+    args = parser.parse_args()
+
+    results, top = run(args.runs)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"cold_start_{args.compare}.json")) as f:
+            baseline = json.load(f)["results"]
+
+    regressions = []
+    print(f"{'metric':<20}{'ms':>10}" + (f"{'baseline':>10}{'Δ':>9}" if baseline else ""))
+    for name, value in results.items():
+        line = f"{name:<20}{value:>10.1f}"
+        if baseline and baseline.get(name):
+            change = (value / baseline[name] - 1) * 100
+            line += f"{baseline[name]:>10.1f}{change:>8.1f}%"
+            if args.max_regression is not None and change > args.max_regression:
+                regressions.append(name)
+        print(line)
+    print("\nslowest imports under app.main (cumulative ms):")
+    for name, ms in top:
+        print(f"  {name:<40}{ms:>8.1f}")
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"cold_start_{args.save_baseline}.json")
+        with open(path, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+        print(f"Saved baseline to {path}")
+
+    if regressions:
+        print(f"Cold start regressed beyond {args.max_regression}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
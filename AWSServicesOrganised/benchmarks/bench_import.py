@@ -0,0 +1,69 @@
+"""
+Measures POST /portfolio/import throughput (rows per second) against the
+in-process AWS fakes, for different BatchWriteItem latencies and write
+concurrencies.
+
+Run from AWSServicesOrganised/:
+    python -m benchmarks.bench_import --rows 20000 --latency-ms 0,10 --concurrency 1,4,8
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.harness import configure_environment, start_fake_aws, stop_fake_aws, seed_user, auth_headers
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.portfolio import importer  # noqa: E402
+
+
+def build_csv(rows: int) -> bytes:
+    lines = ["kind,category,title,value"]
+    for i in range(rows):
+        kind, category = ("asset", "stocks") if i % 2 else ("liability", "loan")
+        lines.append(f"{kind},{category},Holding {i},{1000 + i}.25")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def run_once(content: bytes, latency: float, concurrency: int) -> tuple:
+    fake = start_fake_aws(latency)
+    try:
+        user = seed_user(fake, "import-bench")
+        importer.IMPORT_WRITE_CONCURRENCY = concurrency
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            response = await client.post("/portfolio/import", headers=auth_headers(user),
+                                         files={"file": ("bench.csv", content, "text/csv")})
+            elapsed = time.perf_counter() - start
+        summary = json.loads(response.text.splitlines()[-1])
+        return elapsed, summary, fake.calls[("dynamodb", "BatchWriteItem")]
+    finally:
+        stop_fake_aws(fake)
+
+
+async def run(rows: int, latencies: list, concurrencies: list):
+    content = build_csv(rows)
+    print(f"{rows} rows, {len(content) / 1024:.0f} KiB")
+    print(f"{'latency ms':>11}{'concurrency':>13}{'seconds':>9}{'rows/s':>10}{'batches':>9}")
+    for latency in latencies:
+        for concurrency in concurrencies:
+            elapsed, summary, batches = await run_once(content, latency / 1000, concurrency)
+            imported = summary["assets"] + summary["liabilities"]
+            print(f"{latency:>11g}{concurrency:>13}{elapsed:>9.2f}{imported / elapsed:>10.0f}{batches:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--latency-ms", default="0,10", help="comma separated fake AWS latencies")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma separated BatchWriteItem calls in flight")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, [float(x) for x in args.latency_ms.split(",")], [int(x) for x in args.concurrency.split(",")]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Replays API Gateway event JSON files through the Lambda handler against the
+in-process AWS fakes and reports cold and warm invocation latency.
+
+Each run starts a fresh interpreter, so init_ms is the real init phase
+(importing app.lambda_handler, which warms routers, clients and JWKS) and the
+first invocation of each event is its cold latency. Warm latency is measured
+over --invocations repeats in the same environment.
+
+Event files may use the placeholders {{id_token}} and {{username}}, filled in
+from a seeded user.
+
+Run from AWSServicesOrganised/:
+    python -m benchmarks.bench_lambda --runs 3 --invocations 200
+    python -m benchmarks.bench_lambda --events benchmarks/events --latency-ms 5
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import logging
+
+from benchmarks.harness import BENCH_ENVIRONMENT
+
+
+EVENTS_DIR = os.path.join(os.path.dirname(__file__), "events")
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_events(events_dir: str, user: dict) -> dict:
+    events = {}
+    for path in sorted(glob.glob(os.path.join(events_dir, "*.json"))):
+        with open(path) as f:
+            text = f.read()
+        text = text.replace("{{id_token}}", user["id_token"]).replace("{{username}}", user["Username"])
+        events[os.path.splitext(os.path.basename(path))[0]] = json.loads(text)
+    return events
+
+
+def child(args):
+    """
+    Runs inside the fresh interpreter and prints the measurements as JSON.
+    """
+    from benchmarks.harness import configure_environment, build_fake_aws, seed_user
+
+    configure_environment()
+    logging.disable(logging.INFO)
+    fake = build_fake_aws(latency=args.latency_ms / 1000)
+    fake.install()
+    user = seed_user(fake, "lambda-bench-user", holdings=args.holdings)
+    events = load_events(args.events, user)
+
+    start = time.perf_counter()
+    # The JWKS would be fetched from Cognito during init; hand the fake one over instead
+    from app.user import utils as user_utils
+    user_utils._jwks = fake.tokens.jwks
+    from app.lambda_handler import handler
+    init_ms = (time.perf_counter() - start) * 1000
+
+    results = {"init_ms": init_ms, "events": {}}
+    for name, event in events.items():
+        start = time.perf_counter()
+        response = handler(event, None)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        warm = []
+        for _ in range(args.invocations):
+            start = time.perf_counter()
+            handler(event, None)
+            warm.append((time.perf_counter() - start) * 1000)
+        warm.sort()
+        results["events"][name] = {
+            "status": response["statusCode"],
+            "cold_ms": cold_ms,
+            "warm_p50_ms": warm[len(warm) // 2] if warm else 0.0,
+            "warm_p95_ms": warm[int(len(warm) * 0.95)] if warm else 0.0,
+        }
+    print(json.dumps(results))
+
+
+def _environment() -> dict:
+    env = dict(os.environ)
+    for name, value in BENCH_ENVIRONMENT.items():
+        env.setdefault(name, value)
+    env.setdefault("AWS_DEFAULT_REGION", env["REGION"])
+    return env
+
+
+def run(args) -> dict:
+    command = [sys.executable, "-m", "benchmarks.bench_lambda", "--child",
+               "--events", os.path.abspath(args.events), "--invocations", str(args.invocations),
+               "--latency-ms", str(args.latency_ms), "--holdings", str(args.holdings)]
+    runs = []
+    for _ in range(args.runs):
+        result = subprocess.run(command, cwd=PROJECT_DIR, env=_environment(), capture_output=True, text=True, check=True)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    merged = {"init_ms": statistics.median(r["init_ms"] for r in runs), "events": {}}
+    for name, first in runs[0]["events"].items():
+        merged["events"][name] = {"status": first["status"]}
+        for metric in ("cold_ms", "warm_p50_ms", "warm_p95_ms"):
+            merged["events"][name][metric] = statistics.median(r["events"][name][metric] for r in runs)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", default=EVENTS_DIR, help="directory of API Gateway event JSON files")
+    parser.add_argument("--runs", type=int, default=3, help="fresh execution environments to median over")
+    parser.add_argument("--invocations", type=int, default=100, help="warm invocations per event")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency injected into every AWS call")
+    parser.add_argument("--holdings", type=int, default=20, help="assets and liabilities seeded for the user")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    results = run(args)
+    print(f"init phase: {results['init_ms']:.1f} ms")
+    print(f"{'event':<24}{'status':>8}{'cold ms':>10}{'warm p50':>10}{'warm p95':>10}")
+    for name, r in results["events"].items():
+        print(f"{name:<24}{r['status']:>8}{r['cold_ms']:>10.2f}{r['warm_p50_ms']:>10.2f}{r['warm_p95_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
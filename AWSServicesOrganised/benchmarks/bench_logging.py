@@ -0,0 +1,65 @@
+"""
+Measures logging overhead per request for each logging mode.
+
+Run from AWSServicesOrganised/:
+    python -m benchmarks.bench_logging --requests 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+from app import logger as app_logger
+
+
+MODES = [
+    ("sync/text", "sync", "text", ""),
+    ("sync/json", "sync", "json", ""),
+    ("queue/json", "queue", "json", ""),
+    ("queue/json sampled 10%", "queue", "json", "bench.service=0.1"),
+]
+
+
+def simulated_request(log: logging.Logger, current_user: dict, item_id: str):
+    # Mirrors the lines a typical asset/liability request emits
+    log.info("Fetching asset with ID: %s for user: %s", item_id, current_user.get("username"))
+    log.debug("Raw item: %s", current_user)
+    log.info("Asset with ID: %s fetched successfully for user: %s", item_id, current_user.get("username"))
+
+
+def run_mode(label: str, mode: str, log_format: str, sampling: str, requests: int) -> float:
+    app_logger.setup_logger(mode=mode, log_format=log_format, sampling=sampling)
+    log = logging.getLogger("bench.service")
+    current_user = {"username": "bench-user", "sub": "bench-sub"}
+
+    start = time.perf_counter()
+    for i in range(requests):
+        simulated_request(log, current_user, str(i))
+    elapsed = time.perf_counter() - start
+
+    # Drain the queue so the next mode starts from an idle writer
+    app_logger._stop_listener()
+    return elapsed / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    real_stderr = sys.stderr
+    sys.stderr = open(os.devnull, "w")
+    try:
+        results = [(label, run_mode(label, *mode, args.requests)) for label, *mode in MODES]
+    finally:
+        sys.stderr.close()
+        sys.stderr = real_stderr
+
+    print(f"{'mode':<28}{'us/request':>12}")
+    for label, per_request in results:
+        print(f"{label:<28}{per_request:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
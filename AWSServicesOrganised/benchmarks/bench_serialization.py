@@ -0,0 +1,115 @@
+"""
+Compares the default FastAPI response path (response_model validation,
+jsonable_encoder, stdlib json) with the fast path used by the list and
+portfolio endpoints, and the cost and size of gzip/brotli compression.
+
+Run from AWSServicesOrganised/:
+    python -m benchmarks.bench_serialization --items 1000,5000 --repeat 20
+"""
+import argparse
+import asyncio
+import datetime
+import time
+import uuid
+
+from decimal import Decimal
+
+from benchmarks.harness import configure_environment
+
+configure_environment()
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Response  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.models import Asset, AssetBase, Portfolio  # noqa: E402
+from app.responses import compression  # noqa: E402
+from app.responses.encoding import FastJSONResponse, projector  # noqa: E402
+
+
+def stored_items(count: int) -> list:
+    """
+    Items as the boto3 resource layer returns them from the asset table.
+    """
+    created_at = datetime.datetime.utcnow().isoformat()
+    return [{
+        "asset_id": str(uuid.uuid4()), "username": "bench-user", "sub": "bench-sub", "identity_id": "bench-identity",
+        "category": "stocks", "title": f"Asset {i}", "asset_value": Decimal("1000.50") + i, "created_at": created_at,
+    } for i in range(count)]
+
+
+def build_app(items: list) -> FastAPI:
+    app = FastAPI()
+    project = projector(Asset)
+    assets_adapter = TypeAdapter(list[AssetBase])
+
+    @app.get("/default/assets", response_model=list[Asset])
+    def default_assets():
+        return items
+
+    @app.get("/fast/assets", response_model=list[Asset])
+    def fast_assets():
+        return FastJSONResponse(project(items))
+
+    def totals(assets):
+        total = sum(Decimal(str(a.asset_value)) for a in assets)
+        return {"total_assets": float(total), "total_liabilities": 0.0, "net_worth": float(total), "assets": assets, "liabilities": []}
+
+    @app.get("/default/portfolio")
+    def default_portfolio():
+        return totals([AssetBase(**a) for a in items])
+
+    @app.get("/fast/portfolio", response_model=Portfolio)
+    def fast_portfolio():
+        portfolio = Portfolio.model_construct(**totals(assets_adapter.validate_python(items)))
+        return Response(portfolio.model_dump_json(), media_type="application/json")
+
+    return app
+
+
+async def time_route(client, path: str, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, len(response.content)
+
+
+async def run(counts: list, repeat: int):
+    print(f"{'items':>7} {'route':<12}{'default ms':>12}{'fast ms':>10}{'speedup':>9}{'bytes':>10}")
+    bodies = {}
+    for count in counts:
+        app = build_app(stored_items(count))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for route in ("assets", "portfolio"):
+                default_ms, _ = await time_route(client, f"/default/{route}", repeat)
+                fast_ms, size = await time_route(client, f"/fast/{route}", repeat)
+                print(f"{count:>7} {route:<12}{default_ms:>12.2f}{fast_ms:>10.2f}{default_ms / fast_ms:>8.1f}x{size:>10}")
+            bodies[count] = (await client.get("/fast/assets")).content
+
+    print(f"\n{'items':>7} {'encoding':<10}{'ms':>8}{'bytes':>10}{'ratio':>8}")
+    encodings = ["gzip"] + (["br"] if compression.brotli is not None else [])
+    for count, body in bodies.items():
+        for encoding in encodings:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                compressed = compression.compress(body, encoding)
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"{count:>7} {encoding:<10}{elapsed:>8.2f}{len(compressed):>10}{len(body) / len(compressed):>7.1f}x")
+    if compression.brotli is None:
+        print("(install the brotli package to include br)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", default="100,1000,5000", help="comma separated item counts")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run([int(c) for c in args.items.split(",")], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measures create_asset throughput (puts per second) with and without write
+coalescing, for many concurrent writers against the in-process AWS fakes.
+
+Puts are only coalesced within one identity, so --users sets how many
+identities the writers are spread over.
+
+Run from AWSServicesOrganised/:
+    python -m benchmarks.bench_write_coalescing --writers 64 --puts 2000 --latency-ms 10 --users 1,8
+"""
+import argparse
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import configure_environment, start_fake_aws, stop_fake_aws, seed_user
+
+configure_environment()
+
+from app import write_coalescer  # noqa: E402
+from app.asset import service as asset_service  # noqa: E402
+from app.models import AssetBase  # noqa: E402
+
+
+def run_once(coalescing: bool, writers: int, puts: int, latency: float, users: int, window: float) -> tuple:
+    fake = start_fake_aws()
+    try:
+        accounts = []
+        for i in range(users):
+            user = seed_user(fake, f"writer-{i}")
+            # What get_current_user_id hands to the services
+            accounts.append({"username": user["Username"], "sub": user["sub"], "id_token": user["id_token"]})
+        for account in accounts:
+            # Exchange credentials up front, so only the writes are measured
+            asset_service.list_assets_per_user(account)
+        fake.latency = latency
+        asset_service.WRITE_COALESCING = coalescing
+        write_coalescer._coalescer.window = window
+        asset = AssetBase(category="stocks", title="bench", asset_value=1.5)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(writers) as pool:
+            list(pool.map(lambda i: asset_service.create_asset(asset, accounts[i % users]), range(puts)))
+        elapsed = time.perf_counter() - start
+        requests = fake.calls[("dynamodb", "PutItem")] + fake.calls[("dynamodb", "BatchWriteItem")]
+        return elapsed, requests
+    finally:
+        stop_fake_aws(fake)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=64, help="concurrent writer threads")
+    parser.add_argument("--puts", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=10, help="fake latency per AWS call")
+    parser.add_argument("--users", default="1,8", help="comma separated identity counts")
+    parser.add_argument("--window-ms", type=float, default=5)
+    args = parser.parse_args()
+    # Per-request INFO logs would cost more than the writes being compared
+    logging.disable(logging.INFO)
+
+    print(f"{args.puts} puts, {args.writers} writers, {args.latency_ms:g} ms per AWS call, {args.window_ms:g} ms window")
+    print(f"{'users':>6} {'mode':<11}{'seconds':>9}{'puts/s':>9}{'requests':>10}")
+    for users in (int(u) for u in args.users.split(",")):
+        for coalescing in (False, True):
+            elapsed, requests = run_once(coalescing, args.writers, args.puts, args.latency_ms / 1000, users, args.window_ms / 1000)
+            mode = "coalesced" if coalescing else "put_item"
+            print(f"{users:>6} {mode:<11}{elapsed:>9.2f}{args.puts / elapsed:>9.0f}{requests:>10}")
+
+
+if __name__ == "__main__":
+    main()
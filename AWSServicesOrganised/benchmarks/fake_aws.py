@@ -0,0 +1,620 @@
+"""
+In-process stand-ins for Cognito IDP, Cognito Identity, DynamoDB and S3.
+
+The fakes sit behind real botocore clients: a before-call hook answers each
+API call from in-memory state instead of sending it over HTTP. Everything
+above the wire (boto3 resources, parameter validation, DynamoDB type
+(de)serialization, our own botocore hooks) runs exactly as in production.
+Every answered call sleeps for an injectable latency first.
+"""
+import re
+import copy
+import json
+import time
+import uuid
+import zlib
+import threading
+import datetime
+
+from collections import Counter
+from decimal import Decimal
+
+import boto3
+import botocore.handlers
+from botocore.awsrequest import AWSResponse
+from jose import jwt as jose_jwt
+
+
+class FakeAWSError(Exception):
+    def __init__(self, code: str, message: str = "", status: int = 400):
+        super().__init__(message or code)
+        self.code = code
+        self.message = message or code
+        self.status = status
+
+
+"""
+DynamoDB expressions
+"""
+
+_token_re = re.compile(r"\s*(<>|<=|>=|=|<|>|\(|\)|,|\+|-|[#:]?[A-Za-z_][A-Za-z0-9_.\-]*)")
+
+
+def _tokenize(expression: str) -> list:
+    tokens, pos = [], 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _token_re.match(expression, pos)
+        if not match:
+            raise FakeAWSError("ValidationException", f"Invalid expression: {expression}")
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+def _number(value: dict) -> Decimal:
+    return Decimal(value["N"])
+
+
+def _compare(left, op, right) -> bool:
+    if left is None or right is None:
+        return op == "<>" and left != right
+    if "N" in left and "N" in right:
+        a, b = _number(left), _number(right)
+    else:
+        a, b = next(iter(left.values())), next(iter(right.values()))
+    return {
+        "=": a == b, "<>": a != b, "<": a < b,
+        "<=": a <= b, ">": a > b, ">=": a >= b,
+    }[op]
+
+
+class _Condition:
+    """
+    Recursive-descent evaluator for condition, key-condition and filter expressions.
+    """
+
+    def __init__(self, expression: str, names: dict, values: dict):
+        self.tokens = _tokenize(expression)
+        self.names = names or {}
+        self.values = values or {}
+
+    def evaluate(self, item: dict) -> bool:
+        self.pos = 0
+        self.item = item
+        result = self._or()
+        if self.pos != len(self.tokens):
+            raise FakeAWSError("ValidationException", "Unexpected token in expression")
+        return result
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _or(self) -> bool:
+        result = self._and()
+        while self._peek() and self._peek().upper() == "OR":
+            self._take()
+            right = self._and()
+            result = result or right
+        return result
+
+    def _and(self) -> bool:
+        result = self._not()
+        while self._peek() and self._peek().upper() == "AND":
+            self._take()
+            right = self._not()
+            result = result and right
+        return result
+
+    def _not(self) -> bool:
+        if self._peek() and self._peek().upper() == "NOT":
+            self._take()
+            return not self._not()
+        return self._primary()
+
+    def _primary(self) -> bool:
+        token = self._peek()
+        if token == "(":
+            self._take()
+            result = self._or()
+            self._take()
+            return result
+        if token in ("begins_with", "attribute_exists", "attribute_not_exists", "contains"):
+            self._take()
+            self._take()
+            first = self._operand_path()
+            second = None
+            if self._peek() == ",":
+                self._take()
+                second = self._operand()
+            self._take()
+            value = self.item.get(first)
+            if token == "attribute_exists":
+                return value is not None
+            if token == "attribute_not_exists":
+                return value is None
+            if value is None:
+                return False
+            if token == "begins_with":
+                return next(iter(value.values())).startswith(next(iter(second.values())))
+            return next(iter(second.values())) in next(iter(value.values()))
+        left = self._operand()
+        op = self._take()
+        if op.upper() == "BETWEEN":
+            low = self._operand()
+            self._take()
+            high = self._operand()
+            return _compare(left, ">=", low) and _compare(left, "<=", high)
+        right = self._operand()
+        return _compare(left, op, right)
+
+    def _operand_path(self) -> str:
+        token = self._take()
+        return self.names.get(token, token)
+
+    def _operand(self):
+        token = self._take()
+        if token.startswith(":"):
+            return self.values[token]
+        return self.item.get(self.names.get(token, token))
+
+
+def _split_top_level(text: str, sep: str = ",") -> list:
+    parts, depth, current = [], 0, ""
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == sep and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _apply_update(item: dict, expression: str, names: dict, values: dict):
+    names = names or {}
+    values = values or {}
+    clauses = re.split(r"\b(SET|REMOVE|ADD|DELETE)\b", expression)
+
+    def path(token):
+        return names.get(token.strip(), token.strip())
+
+    def value_of(term):
+        term = term.strip()
+        match = re.fullmatch(r"if_not_exists\((.+?),(.+)\)", term)
+        if match:
+            current = item.get(path(match.group(1)))
+            return current if current is not None else value_of(match.group(2))
+        for op in ("+", "-"):
+            if op in term:
+                left, right = term.split(op, 1)
+                a, b = _number(value_of(left)), _number(value_of(right))
+                return {"N": str(a + b if op == "+" else a - b)}
+        if term.startswith(":"):
+            return values[term]
+        return item.get(path(term))
+
+    for i in range(1, len(clauses), 2):
+        action, body = clauses[i], clauses[i + 1]
+        for part in _split_top_level(body):
+            if action == "SET":
+                target, term = part.split("=", 1)
+                item[path(target)] = value_of(term)
+            elif action == "REMOVE":
+                item.pop(path(part), None)
+            elif action == "ADD":
+                target, term = part.split(None, 1)
+                current = item.get(path(target), {"N": "0"})
+                item[path(target)] = {"N": str(_number(current) + _number(values[term.strip()]))}
+
+
+def _project(item: dict, projection: str, names: dict) -> dict:
+    if not projection:
+        return item
+    fields = [(names or {}).get(f.strip(), f.strip()) for f in projection.split(",")]
+    return {field: item[field] for field in fields if field in item}
+
+
+class FakeDynamoDB:
+    """
+    Tables are created on first use. Key schemas are given per table name,
+    anything else falls back to a hash key named "id".
+    """
+
+    def __init__(self, key_schemas: dict = None):
+        self.key_schemas = key_schemas or {}
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def _keys(self, table: str) -> list:
+        return self.key_schemas.get(table, ["id"])
+
+    def _table(self, table: str) -> dict:
+        return self.tables.setdefault(table, {})
+
+    def _key(self, table: str, item: dict) -> tuple:
+        try:
+            return tuple(json.dumps(item[k], sort_keys=True) for k in self._keys(table))
+        except KeyError:
+            raise FakeAWSError("ValidationException", "The provided key element does not match the schema")
+
+    def put(self, table: str, item: dict):
+        with self._lock:
+            self._table(table)[self._key(table, item)] = item
+
+    def items(self, table: str) -> list:
+        return list(self._table(table).values())
+
+    def handle(self, operation: str, params: dict) -> dict:
+        return getattr(self, f"_{operation}")(params)
+
+    def _check_condition(self, params: dict, item: dict):
+        expression = params.get("ConditionExpression")
+        if expression and not _Condition(expression, params.get("ExpressionAttributeNames"), params.get("ExpressionAttributeValues")).evaluate(item or {}):
+            raise FakeAWSError("ConditionalCheckFailedException", "The conditional request failed")
+
+    def _PutItem(self, params: dict) -> dict:
+        table, item = params["TableName"], params["Item"]
+        with self._lock:
+            existing = self._table(table).get(self._key(table, item))
+            self._check_condition(params, existing)
+            self._table(table)[self._key(table, item)] = item
+        return {}
+
+    def _GetItem(self, params: dict) -> dict:
+        table = params["TableName"]
+        item = self._table(table).get(self._key(table, params["Key"]))
+        if item is None:
+            return {}
+        return {"Item": _project(item, params.get("ProjectionExpression"), params.get("ExpressionAttributeNames"))}
+
+    def _DeleteItem(self, params: dict) -> dict:
+        table = params["TableName"]
+        with self._lock:
+            key = self._key(table, params["Key"])
+            existing = self._table(table).get(key)
+            self._check_condition(params, existing)
+            old = self._table(table).pop(key, None)
+        if params.get("ReturnValues") == "ALL_OLD" and old is not None:
+            return {"Attributes": old}
+        return {}
+
+    def _UpdateItem(self, params: dict) -> dict:
+        table = params["TableName"]
+        with self._lock:
+            key = self._key(table, params["Key"])
+            existing = self._table(table).get(key)
+            self._check_condition(params, existing)
+            item = dict(existing or params["Key"])
+            _apply_update(item, params.get("UpdateExpression", ""), params.get("ExpressionAttributeNames"), params.get("ExpressionAttributeValues"))
+            self._table(table)[key] = item
+        if params.get("ReturnValues") == "ALL_NEW":
+            return {"Attributes": item}
+        return {}
+
+    def _paginate(self, params: dict, matched: list) -> dict:
+        start = 0
+        if "ExclusiveStartKey" in params:
+            table = params["TableName"]
+            start_key = self._key(table, params["ExclusiveStartKey"])
+            keys = [self._key(table, item) for item in matched]
+            start = keys.index(start_key) + 1 if start_key in keys else len(matched)
+        limit = params.get("Limit")
+        page = matched[start:start + limit] if limit else matched[start:]
+        response = {
+            "Items": [_project(i, params.get("ProjectionExpression"), params.get("ExpressionAttributeNames")) for i in page],
+            "Count": len(page),
+            "ScannedCount": len(page),
+        }
+        if params.get("Select") == "COUNT":
+            response.pop("Items")
+        if limit and start + limit < len(matched):
+            response["LastEvaluatedKey"] = {k: page[-1][k] for k in self._keys(params["TableName"])}
+        return response
+
+    def _filter(self, params: dict, items: list, expression_key: str) -> list:
+        expression = params.get(expression_key)
+        if not expression:
+            return items
+        condition = _Condition(expression, params.get("ExpressionAttributeNames"), params.get("ExpressionAttributeValues"))
+        return [item for item in items if condition.evaluate(item)]
+
+    def _Query(self, params: dict) -> dict:
+        items = self._filter(params, self.items(params["TableName"]), "KeyConditionExpression")
+        items = self._filter(params, items, "FilterExpression")
+        keys = self._keys(params["TableName"])
+        if len(keys) > 1 and "IndexName" not in params:
+            # Base-table queries come back in sort key order
+            items.sort(key=lambda item: json.dumps(item.get(keys[1]), sort_keys=True))
+        return self._paginate(params, items)
+
+    def _Scan(self, params: dict) -> dict:
+        items = self._filter(params, self.items(params["TableName"]), "FilterExpression")
+        if "TotalSegments" in params:
+            # Parallel scans: each item belongs to one segment, chosen by its key
+            table = params["TableName"]
+            items = [i for i in items if zlib.crc32(repr(self._key(table, i)).encode()) % params["TotalSegments"] == params["Segment"]]
+        return self._paginate(params, items)
+
+    def _BatchWriteItem(self, params: dict) -> dict:
+        for table, requests in params["RequestItems"].items():
+            for request in requests:
+                if "PutRequest" in request:
+                    self.put(table, request["PutRequest"]["Item"])
+                else:
+                    with self._lock:
+                        self._table(table).pop(self._key(table, request["DeleteRequest"]["Key"]), None)
+        return {"UnprocessedItems": {}}
+
+    def _BatchGetItem(self, params: dict) -> dict:
+        responses = {}
+        for table, request in params["RequestItems"].items():
+            found = [self._table(table).get(self._key(table, key)) for key in request["Keys"]]
+            responses[table] = [item for item in found if item is not None]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+
+"""
+Cognito
+"""
+
+class FakeCognitoIdp:
+    """
+    User pool that issues real RS256 ID tokens signed with the harness key.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.users = {}
+        self._lock = threading.Lock()
+
+    def add_user(self, username: str, password: str, email: str, groups: list = None) -> dict:
+        user = {
+            "Username": username,
+            "password": password,
+            "sub": str(uuid.uuid5(uuid.NAMESPACE_DNS, username)),
+            "email": email,
+            "groups": groups or [],
+            "confirmed": True,
+        }
+        with self._lock:
+            self.users[username] = user
+        return user
+
+    def _as_listed(self, user: dict) -> dict:
+        return {
+            "Username": user["Username"],
+            "Attributes": [{"Name": "email", "Value": user["email"]}, {"Name": "sub", "Value": user["sub"]}],
+            "Enabled": True,
+            "UserStatus": "CONFIRMED" if user["confirmed"] else "UNCONFIRMED",
+        }
+
+    def handle(self, operation: str, params: dict) -> dict:
+        return getattr(self, f"_{operation}")(params)
+
+    def _ListUsers(self, params: dict) -> dict:
+        users = list(self.users.values())
+        match = re.fullmatch(r'\s*(\w+)\s*=\s*"(.*)"\s*', params.get("Filter", ""))
+        if match:
+            field = {"username": "Username", "email": "email"}.get(match.group(1), match.group(1))
+            users = [u for u in users if u.get(field) == match.group(2)]
+        return {"Users": [self._as_listed(u) for u in users[:params.get("Limit", 60)]]}
+
+    def _SignUp(self, params: dict) -> dict:
+        if params["Username"] in self.users:
+            raise FakeAWSError("UsernameExistsException", "User already exists")
+        email = next((a["Value"] for a in params.get("UserAttributes", []) if a["Name"] == "email"), "")
+        user = self.add_user(params["Username"], params["Password"], email)
+        user["confirmed"] = False
+        return {"UserConfirmed": False, "UserSub": user["sub"]}
+
+    def _ConfirmSignUp(self, params: dict) -> dict:
+        user = self.users.get(params["Username"])
+        if user is None:
+            raise FakeAWSError("UserNotFoundException", "User does not exist.")
+        user["confirmed"] = True
+        return {}
+
+    def _InitiateAuth(self, params: dict) -> dict:
+        auth = params["AuthParameters"]
+        user = self.users.get(auth["USERNAME"])
+        if user is None or user["password"] != auth["PASSWORD"]:
+            raise FakeAWSError("NotAuthorizedException", "Incorrect username or password.")
+        return {"AuthenticationResult": {
+            "IdToken": self.tokens.id_token(user),
+            "AccessToken": f"access-{user['sub']}",
+            "RefreshToken": f"refresh-{user['sub']}",
+            "ExpiresIn": 3600,
+            "TokenType": "Bearer",
+        }}
+
+    def _GlobalSignOut(self, params: dict) -> dict:
+        return {}
+
+
+class FakeCognitoIdentity:
+    def __init__(self, region: str):
+        self.region = region
+
+    def handle(self, operation: str, params: dict) -> dict:
+        return getattr(self, f"_{operation}")(params)
+
+    def _identity_id(self, logins: dict) -> str:
+        token = next(iter(logins.values()))
+        claims = jose_jwt.get_unverified_claims(token)
+        return f"{self.region}:{uuid.uuid5(uuid.NAMESPACE_URL, claims['sub'])}"
+
+    def _GetId(self, params: dict) -> dict:
+        return {"IdentityId": self._identity_id(params["Logins"])}
+
+    def _GetCredentialsForIdentity(self, params: dict) -> dict:
+        if params["IdentityId"] != self._identity_id(params["Logins"]):
+            raise FakeAWSError("NotAuthorizedException", "Invalid login token. Token does not belong to this identity")
+        return {
+            "IdentityId": params["IdentityId"],
+            "Credentials": {
+                # A new key on every call, as Cognito issues, so reuse bugs keyed on it show up
+                "AccessKeyId": f"ASIA{uuid.uuid4().hex[:16].upper()}",
+                "SecretKey": "fake-secret",
+                "SessionToken": "fake-session",
+                "Expiration": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1),
+            },
+        }
+
+
+"""
+S3
+"""
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def handle(self, operation: str, params: dict) -> dict:
+        return getattr(self, f"_{operation}")(params)
+
+    def _PutObject(self, params: dict) -> dict:
+        body = params.get("Body", b"")
+        data = body.read() if hasattr(body, "read") else body
+        self.objects[(params["Bucket"], params["Key"])] = {"Body": data, "Metadata": params.get("Metadata", {})}
+        return {"ETag": f'"{uuid.uuid4().hex}"'}
+
+    def _HeadObject(self, params: dict) -> dict:
+        obj = self.objects.get((params["Bucket"], params["Key"]))
+        if obj is None:
+            raise FakeAWSError("404", "Not Found", status=404)
+        return {"ContentLength": len(obj["Body"]), "Metadata": obj["Metadata"]}
+
+
+"""
+Tokens
+"""
+
+class TokenFactory:
+    """
+    Signs Cognito-shaped ID tokens and exposes the matching JWKS.
+    """
+
+    KID = "fake-aws-key"
+
+    def __init__(self, region: str, userpool_id: str, client_id: str, key_bits: int = 1024):
+        import rsa
+        from jose import jwk
+
+        public, private = rsa.newkeys(key_bits)
+        self.private_pem = private.save_pkcs1().decode()
+        public_jwk = jwk.construct(public.save_pkcs1().decode(), "RS256").to_dict()
+        public_jwk["kid"] = self.KID
+        self.jwks = {"keys": [public_jwk]}
+        self.issuer = f"https://cognito-idp.{region}.amazonaws.com/{userpool_id}"
+        self.client_id = client_id
+
+    def id_token(self, user: dict) -> str:
+        now = int(time.time())
+        claims = {
+            "sub": user["sub"],
+            "aud": self.client_id,
+            "iss": self.issuer,
+            "token_use": "id",
+            "cognito:username": user["Username"],
+            "email": user["email"],
+            "iat": now,
+            "exp": now + 3600,
+        }
+        if user.get("groups"):
+            claims["cognito:groups"] = user["groups"]
+        return jose_jwt.encode(claims, self.private_pem, algorithm="RS256", headers={"kid": self.KID})
+
+
+"""
+Wiring
+"""
+
+class FakeAWS:
+    """
+    Installs the fakes behind every botocore client created in this process.
+    calls counts answered operations as (service, operation).
+    """
+
+    def __init__(self, region: str, userpool_id: str, client_id: str, key_schemas: dict = None, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.tokens = TokenFactory(region, userpool_id, client_id)
+        self.dynamodb = FakeDynamoDB(key_schemas)
+        self.cognito_idp = FakeCognitoIdp(self.tokens)
+        self.backends = {
+            "dynamodb": self.dynamodb,
+            "cognito-identity-provider": self.cognito_idp,
+            "cognito-identity": FakeCognitoIdentity(region),
+            "s3": FakeS3(),
+        }
+        self._handlers = [
+            ("before-parameter-build", self._before_parameter_build),
+            ("before-call", self._before_call),
+        ]
+        self._lock = threading.Lock()
+
+    def _before_parameter_build(self, params, context, **kwargs):
+        context["fake_aws_params"] = params
+
+    def _before_call(self, model, params, context, **kwargs):
+        service = model.service_model.service_id.hyphenize()
+        backend = self.backends.get(service)
+        if backend is None:
+            return None
+        if model.service_model.protocol == "json":
+            api_params = json.loads(params["body"] or b"{}")
+        else:
+            api_params = context.get("fake_aws_params", {})
+
+        with self._lock:
+            self.calls[(service, model.name)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        try:
+            # Callers (e.g. the boto3 resource layer) deserialize responses in place
+            status, parsed = 200, copy.deepcopy(backend.handle(model.name, api_params))
+        except FakeAWSError as e:
+            status, parsed = e.status, {"Error": {"Code": e.code, "Message": e.message}}
+        parsed["ResponseMetadata"] = {"HTTPStatusCode": status, "HTTPHeaders": {}, "RetryAttempts": 0}
+        return AWSResponse(None, status, {}, None), parsed
+
+    def register(self, events):
+        for event, handler in self._handlers:
+            events.register(f"{event}.*.*", handler, unique_id=f"fake-aws-{event}")
+
+    def install(self, *existing_clients):
+        """
+        Hooks every session created from now on, the default boto3 session and
+        any clients that were already built (e.g. module-level pooled clients).
+        """
+        for handler in self._handlers:
+            botocore.handlers.BUILTIN_HANDLERS.append(handler)
+        if boto3.DEFAULT_SESSION is not None:
+            self.register(boto3.DEFAULT_SESSION.events)
+        for client in existing_clients:
+            self.register(client.meta.events)
+
+    def uninstall(self, *existing_clients):
+        for handler in self._handlers:
+            if handler in botocore.handlers.BUILTIN_HANDLERS:
+                botocore.handlers.BUILTIN_HANDLERS.remove(handler)
+        sessions = [boto3.DEFAULT_SESSION.events] if boto3.DEFAULT_SESSION is not None else []
+        for events in sessions + [client.meta.events for client in existing_clients]:
+            for event, handler in self._handlers:
+                events.unregister(f"{event}.*.*", handler, unique_id=f"fake-aws-{event}")
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
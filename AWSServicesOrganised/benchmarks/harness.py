@@ -0,0 +1,125 @@
+"""
+Shared setup for benchmarks and AWS-call tests: config defaults, fake AWS
+wiring and seeded users.
+"""
+import os
+import uuid
+import datetime
+
+from decimal import Decimal
+
+
+BENCH_ENVIRONMENT = {
+    "REGION": "us-east-1",
+    "CLIENT_ID": "bench-client-id",
+    "CLIENT_SECRET": "bench-client-secret",
+    "USERPOOL_ID": "us-east-1_bench",
+    "IDENTITYPOOL_ID": "us-east-1:bench-identity-pool",
+    "ADMIN_IDENTITYPOOL_ID": "us-east-1:bench-admin-identity-pool",
+    "AWS_ACCESS_KEY_ID": "bench-access-key",
+    "AWS_SECRET_ACCESS_KEY": "bench-secret-key",
+    "S3_BUCKET_NAME": "bench-bucket",
+    "S3_REGION": "us-east-1",
+    "S3_PROFILE_PIC_FOLDER": "profile_pic",
+    "DynamoDB_USER_DETAILS_TABLE": "bench-user-details",
+    "DynamoDB_ASSET_DETAILS_TABLE": "bench-asset-details",
+    "DynamoDB_LIABILITY_DETAILS_TABLE": "bench-liability-details",
+    "DynamoDB_JOBS_TABLE": "bench-jobs",
+    "DynamoDB_PORTFOLIO_TABLE": "bench-portfolio",
+    "JOBS_DB_PATH": ":memory:",
+    "DynamoDB_IDENTITY_MAP_TABLE": "bench-identity-map",
+    "IDENTITY_MAP_DB_PATH": ":memory:",
+    # Load tests drive a handful of users far past the per-user limits
+    "RATE_LIMITING": "false",
+}
+
+
+def configure_environment():
+    """
+    Fills in config defaults. Must run before anything imports app.config.
+    """
+    for name, value in BENCH_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["REGION"])
+
+
+def build_fake_aws(latency: float = 0.0):
+    """
+    Creates the fakes for the configured user pool and tables, without installing them.
+    """
+    from benchmarks.fake_aws import FakeAWS
+    from app import config
+
+    return FakeAWS(
+        config.REGION,
+        config.USERPOOL_ID,
+        config.CLIENT_ID,
+        key_schemas={
+            config.DynamoDB_USER_DETAILS_TABLE: ["userName"],
+            config.DynamoDB_ASSET_DETAILS_TABLE: ["asset_id"],
+            config.DynamoDB_LIABILITY_DETAILS_TABLE: ["liability_id"],
+            config.DynamoDB_JOBS_TABLE: ["job_id"],
+            config.DynamoDB_PORTFOLIO_TABLE: ["PK", "SK"],
+            config.DynamoDB_IDENTITY_MAP_TABLE: ["sub"],
+        },
+        latency=latency,
+    )
+
+
+def start_fake_aws(latency: float = 0.0):
+    """
+    Routes every AWS call made by the app to in-process fakes.
+    """
+    from app import clients
+    from app.auth import service as auth_service
+    from app.user import identity_map
+    from app.user import utils as user_utils
+
+    fake = build_fake_aws(latency)
+    clients.reset_clients()
+    identity_map.reset_store()
+    fake.install(auth_service.cognito_client)
+    user_utils._jwks = fake.tokens.jwks
+    return fake
+
+
+def stop_fake_aws(fake):
+    from app.auth import service as auth_service
+    from app.user import utils as user_utils
+
+    fake.uninstall(auth_service.cognito_client)
+    user_utils._jwks = None
+
+
+def _typed(value) -> dict:
+    if isinstance(value, (int, float, Decimal)):
+        return {"N": str(value)}
+    return {"S": str(value)}
+
+
+def seed_user(fake, username: str, holdings: int = 0, groups: list = None) -> dict:
+    """
+    Creates a user in the fake user pool with `holdings` assets and liabilities,
+    and returns the user with a signed ID token.
+    """
+    from app import config
+
+    user = fake.cognito_idp.add_user(username, "Bench@12345", f"{username}@example.com", groups)
+    identity_id = fake.backends["cognito-identity"]._identity_id({"token": fake.tokens.id_token(user)})
+    created_at = datetime.datetime.utcnow().isoformat()
+    for i in range(holdings):
+        common = {"username": username, "sub": user["sub"], "identity_id": identity_id, "created_at": created_at}
+        fake.dynamodb.put(config.DynamoDB_ASSET_DETAILS_TABLE, {k: _typed(v) for k, v in dict(
+            common, asset_id=str(uuid.uuid4()), category="stocks", title=f"Asset {i}", asset_value=Decimal("1000.50") + i).items()})
+        fake.dynamodb.put(config.DynamoDB_LIABILITY_DETAILS_TABLE, {k: _typed(v) for k, v in dict(
+            common, liability_id=str(uuid.uuid4()), category="loan", title=f"Liability {i}", liability_value=Decimal("250.25") + i).items()})
+    fake.dynamodb.put(config.DynamoDB_USER_DETAILS_TABLE, {k: _typed(v) for k, v in {
+        "userName": username, "sub": user["sub"], "name": username, "identity_id": identity_id,
+        "profile_pic_key": f"{config.S3_PROFILE_PIC_FOLDER}/{identity_id}/profile_pic.png",
+        "profile_pic_url": f"https://{config.S3_BUCKET_NAME}.s3.amazonaws.com/{config.S3_PROFILE_PIC_FOLDER}/{identity_id}/profile_pic.png",
+    }.items()})
+    return dict(user, id_token=fake.tokens.id_token(user), identity_id=identity_id)
+
+
+def auth_headers(user: dict) -> dict:
+    return {"Authorization": user["id_token"], "Cookie": f"id_token={user['id_token']}"}
@@ -0,0 +1,229 @@
+"""
+Offline load test for every router, driven through ASGI against in-process
+AWS fakes with injectable latency.
+
+Run from AWSServicesOrganised/:
+    python -m benchmarks.run --requests 100 --concurrency 16 --latency-ms 5
+    python -m benchmarks.run --save-baseline before
+    python -m benchmarks.run --compare before
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import logging
+
+from benchmarks.harness import configure_environment, start_fake_aws, seed_user, auth_headers
+
+configure_environment()
+
+import httpx  # noqa: E402
+
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+class Context:
+    """
+    Users and seeded ids shared by the scenarios of one run.
+    """
+
+    def __init__(self, fake, users: list, admin: dict):
+        self.fake = fake
+        self.users = users
+        self.admin = admin
+        self.counter = 0
+
+    def user(self) -> dict:
+        return random.choice(self.users)
+
+    def next_id(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+def _first_item_id(ctx: Context, table_name: str, id_field: str, user: dict) -> str:
+    for item in ctx.fake.dynamodb.items(table_name):
+        if item["username"]["S"] == user["Username"]:
+            return item[id_field]["S"]
+    return "missing"
+
+
+async def signup(client, ctx):
+    n = ctx.next_id()
+    return await client.post("/auth/signup", json={"username": f"signup-{n}", "password": "Bench@12345", "email": f"signup-{n}@example.com"})
+
+
+async def signin(client, ctx):
+    return await client.post("/auth/signin", json={"username": ctx.user()["Username"], "password": "Bench@12345"})
+
+
+async def create_asset(client, ctx):
+    return await client.post("/asset/", json={"category": "stocks", "title": "New asset", "asset_value": 10.5}, headers=auth_headers(ctx.user()))
+
+
+async def list_assets(client, ctx):
+    return await client.get("/asset/", headers=auth_headers(ctx.user()))
+
+
+async def get_asset(client, ctx):
+    from app.config import DynamoDB_ASSET_DETAILS_TABLE
+    user = ctx.user()
+    asset_id = _first_item_id(ctx, DynamoDB_ASSET_DETAILS_TABLE, "asset_id", user)
+    return await client.get(f"/asset/{asset_id}", headers=auth_headers(user))
+
+
+async def delete_asset(client, ctx):
+    return await client.delete("/asset/does-not-exist", headers=auth_headers(ctx.user()))
+
+
+async def create_liability(client, ctx):
+    return await client.post("/liability/", json={"category": "loan", "title": "New liability", "liability_value": 4.25}, headers=auth_headers(ctx.user()))
+
+
+async def list_liabilities(client, ctx):
+    return await client.get("/liability/", headers=auth_headers(ctx.user()))
+
+
+async def get_liability(client, ctx):
+    from app.config import DynamoDB_LIABILITY_DETAILS_TABLE
+    user = ctx.user()
+    liability_id = _first_item_id(ctx, DynamoDB_LIABILITY_DETAILS_TABLE, "liability_id", user)
+    return await client.get(f"/liability/{liability_id}", headers=auth_headers(user))
+
+
+async def delete_liability(client, ctx):
+    return await client.delete("/liability/does-not-exist", headers=auth_headers(ctx.user()))
+
+
+async def portfolio(client, ctx):
+    return await client.get("/portfolio/", headers=auth_headers(ctx.user()))
+
+
+async def profile(client, ctx):
+    return await client.get("/user/profile", headers=auth_headers(ctx.user()))
+
+
+async def admin_list_users(client, ctx):
+    return await client.get("/admin/users", headers=auth_headers(ctx.admin))
+
+
+SCENARIOS = {
+    "signup": signup,
+    "signin": signin,
+    "asset.create": create_asset,
+    "asset.list": list_assets,
+    "asset.get": get_asset,
+    "asset.delete": delete_asset,
+    "liability.create": create_liability,
+    "liability.list": list_liabilities,
+    "liability.get": get_liability,
+    "liability.delete": delete_liability,
+    "portfolio": portfolio,
+    "user.profile": profile,
+    "admin.users": admin_list_users,
+}
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, ctx: Context, scenario, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await scenario(client, ctx)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run(args) -> dict:
+    from app.main import app
+
+    fake = start_fake_aws(latency=args.latency_ms / 1000)
+    users = [seed_user(fake, f"bench-user-{i}", holdings=args.holdings) for i in range(args.users)]
+    admin = seed_user(fake, "bench-admin", groups=["admin"])
+    ctx = Context(fake, users, admin)
+
+    selected = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in selected:
+            # Warm-up request so one-off costs (JWKS, client creation) are not in the numbers
+            await SCENARIOS[name](client, ctx)
+            results[name] = await run_scenario(client, ctx, SCENARIOS[name], args.requests, args.concurrency)
+    return results
+
+
+def print_report(results: dict, baseline: dict = None):
+    header = f"{'scenario':<20}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    if baseline:
+        header += f"{'Δp50':>9}{'Δrps':>9}"
+    print(header)
+    for name, r in results.items():
+        line = f"{name:<20}{r['rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>8}"
+        if baseline and name in baseline:
+            b = baseline[name]
+            line += f"{(r['p50_ms'] / b['p50_ms'] - 1) * 100:>8.1f}%" if b["p50_ms"] else f"{'':>9}"
+            line += f"{(r['rps'] / b['rps'] - 1) * 100:>8.1f}%" if b["rps"] else f"{'':>9}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency injected into every AWS call")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--holdings", type=int, default=20, help="assets and liabilities seeded per user")
+    parser.add_argument("--scenarios", default="", help="comma separated subset of: " + ",".join(SCENARIOS))
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+        print(f"Saved baseline to {path}")
+
+
+if __name__ == "__main__":
+    main()